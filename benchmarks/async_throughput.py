@@ -0,0 +1,242 @@
+##################################################################
+# Copyright 2018 Open Source Geospatial Foundation and others    #
+# licensed under MIT, Please consult LICENSE.txt for details     #
+##################################################################
+
+"""Throughput and queueing benchmark of asynchronous Execute requests
+
+Submits ``--jobs`` asynchronous (``storeExecuteResponse=true&status=true``)
+Execute requests of a sleeping or CPU burning process to a local
+:class:`pywps.Service` and polls the status documents until all jobs are
+finished. Submit latency, time spent in the job queue and end-to-end latency
+percentiles, throughput and utilization of the ``parallelprocesses`` slots are
+reported. Everything runs offline, the request log is stored in a temporary
+SQLite database.
+
+Example::
+
+    python benchmarks/async_throughput.py --jobs 50 --parallel 4 --duration 0.2
+"""
+
+from __future__ import division, print_function
+
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from pywps import Service, Process, LiteralInput, LiteralOutput  # noqa: E402
+from pywps import configuration, dblog  # noqa: E402
+from pywps.tests import client_for, assert_response_accepted  # noqa: E402
+
+
+def create_sleep():
+
+    def sleep(request, response):
+        time.sleep(request.inputs['seconds'][0].data)
+        response.outputs['finished'].data = True
+        return response
+
+    return Process(handler=sleep,
+                   identifier='sleep',
+                   title='Sleep',
+                   inputs=[LiteralInput('seconds', title='Seconds', data_type='float')],
+                   outputs=[LiteralOutput('finished', title='Finished', data_type='boolean')],
+                   store_supported=True,
+                   status_supported=True)
+
+
+def create_burn():
+
+    def burn(request, response):
+        end = time.time() + request.inputs['seconds'][0].data
+        while time.time() < end:
+            sum(i * i for i in range(1000))
+        response.outputs['finished'].data = True
+        return response
+
+    return Process(handler=burn,
+                   identifier='burn',
+                   title='CPU burn',
+                   inputs=[LiteralInput('seconds', title='Seconds', data_type='float')],
+                   outputs=[LiteralOutput('finished', title='Finished', data_type='boolean')],
+                   store_supported=True,
+                   status_supported=True)
+
+
+def percentile(values, percent):
+    """Return percentile of given values using linear interpolation
+    """
+
+    if not values:
+        return None
+    values = sorted(values)
+    rank = (len(values) - 1) * percent / 100
+    lower = int(rank)
+    upper = min(lower + 1, len(values) - 1)
+    return values[lower] + (values[upper] - values[lower]) * (rank - lower)
+
+
+def summarize(values):
+    return {
+        'min': min(values) if values else None,
+        'p50': percentile(values, 50),
+        'p90': percentile(values, 90),
+        'p99': percentile(values, 99),
+        'max': max(values) if values else None,
+    }
+
+
+def configure(workdir, options):
+    """Point PyWPS to the temporary directory and set up processing
+    """
+
+    configuration.load_configuration([])
+    configuration.CONFIG.set('server', 'outputpath', workdir)
+    configuration.CONFIG.set('server', 'outputurl', 'file://' + workdir)
+    configuration.CONFIG.set('server', 'workdir', workdir)
+    configuration.CONFIG.set('server', 'parallelprocesses', str(options.parallel))
+    configuration.CONFIG.set('server', 'maxprocesses', str(options.jobs))
+    configuration.CONFIG.set('processing', 'mode', options.mode)
+    configuration.CONFIG.set('logging', 'level', 'INFO')
+    configuration.CONFIG.set('logging', 'database',
+                             'sqlite:///' + os.path.join(workdir, 'pywps-logs.sqlite3'))
+
+
+def submit(client, options):
+    """Submit one asynchronous request, return (uuid, submit start, submit latency)
+    or None, if the request was rejected
+    """
+
+    start = time.time()
+    resp = client.get('?service=WPS&request=Execute&version=1.0.0&identifier={}'
+                      '&datainputs=seconds={}&storeExecuteResponse=true&status=true'.format(
+                          options.process, options.duration))
+    latency = time.time() - start
+    try:
+        assert_response_accepted(resp)
+    except AssertionError:
+        return None
+    status_location = resp.xml.attrib['statusLocation']
+    uuid = os.path.splitext(os.path.basename(status_location))[0]
+    return (uuid, start, latency)
+
+
+def wait(workdir, jobs, options):
+    """Poll status documents, return end time of each finished job
+    """
+
+    finished = {}
+    deadline = time.time() + options.timeout
+    while len(finished) < len(jobs) and time.time() < deadline:
+        for (uuid, start, latency) in jobs:
+            if uuid in finished:
+                continue
+            status_file = os.path.join(workdir, uuid + '.xml')
+            try:
+                with open(status_file) as f:
+                    status = f.read()
+            except IOError:
+                continue
+            if 'ProcessSucceeded' in status or 'ProcessFailed' in status:
+                finished[uuid] = (os.path.getmtime(status_file), 'ProcessSucceeded' in status)
+        time.sleep(options.poll_interval)
+    return finished
+
+
+def run(options):
+    workdir = tempfile.mkdtemp(prefix='pywps_benchmark_')
+    try:
+        configure(workdir, options)
+        client = client_for(Service(processes=[create_sleep(), create_burn()]))
+
+        # requests are submitted one after another, the request log is not
+        # thread-safe, the jobs themselves run concurrently
+        started = time.time()
+        jobs = [submit(client, options) for i in range(options.jobs)]
+        submitted = time.time()
+        rejected = len([job for job in jobs if job is None])
+        jobs = [job for job in jobs if job is not None]
+
+        finished = wait(workdir, jobs, options)
+        makespan = max([end for (end, success) in finished.values()] or [time.time()]) - started
+
+        submit_latency = [latency for (uuid, start, latency) in jobs]
+        end_to_end = [finished[uuid][0] - start for (uuid, start, latency) in jobs if uuid in finished]
+        queue = []
+        busy = 0
+        for (uuid, start, latency) in jobs:
+            timings = dblog.get_timings(uuid)
+            if 'queue' in timings:
+                queue.append(timings['queue'])
+            busy += timings.get('process', 0)
+
+        return {
+            'mode': options.mode,
+            'process': options.process,
+            'duration': options.duration,
+            'jobs': options.jobs,
+            'parallelprocesses': options.parallel,
+            'succeeded': len([s for (end, s) in finished.values() if s]),
+            'failed': len([s for (end, s) in finished.values() if not s]),
+            'rejected': rejected,
+            'unfinished': len(jobs) - len(finished),
+            'submit_rate': options.jobs / (submitted - started),
+            'throughput': len(finished) / makespan,
+            'makespan': makespan,
+            'slot_utilization': busy / (options.parallel * makespan),
+            'submit_latency': summarize(submit_latency),
+            'queue': summarize(queue),
+            'end_to_end': summarize(end_to_end),
+        }
+    finally:
+        if not options.keep:
+            shutil.rmtree(workdir, ignore_errors=True)
+        else:
+            print('Outputs and request log kept in {}'.format(workdir), file=sys.stderr)
+
+
+def report(result):
+    print('{jobs} jobs of {process} ({duration}s), mode={mode}, parallelprocesses={parallelprocesses}'.format(
+        **result))
+    print('succeeded={succeeded} failed={failed} rejected={rejected} unfinished={unfinished}'.format(**result))
+    print('submit rate {submit_rate:.1f} jobs/s, throughput {throughput:.2f} jobs/s, '
+          'makespan {makespan:.2f}s, slot utilization {slot_utilization:.0%}'.format(**result))
+    print('{:<16}{:>10}{:>10}{:>10}{:>10}{:>10}'.format('[s]', 'min', 'p50', 'p90', 'p99', 'max'))
+    for name in ['submit_latency', 'queue', 'end_to_end']:
+        stats = result[name]
+        values = ['{:10.3f}'.format(stats[key]) if stats[key] is not None else '{:>10}'.format('-')
+                  for key in ['min', 'p50', 'p90', 'p99', 'max']]
+        print('{:<16}{}'.format(name, ''.join(values)))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--jobs', type=int, default=20, help='number of submitted jobs')
+    parser.add_argument('--parallel', type=int, default=2, help='[server] parallelprocesses')
+    parser.add_argument('--process', choices=['sleep', 'burn'], default='sleep',
+                        help='sleeping or CPU burning process')
+    parser.add_argument('--duration', type=float, default=0.5, help='duration of one job in seconds')
+    parser.add_argument('--mode', choices=['multiprocessing', 'scheduler'], default='multiprocessing',
+                        help='[processing] mode')
+    parser.add_argument('--poll-interval', type=float, default=0.05, help='status polling interval in seconds')
+    parser.add_argument('--timeout', type=float, default=600, help='maximal time to wait for the jobs')
+    parser.add_argument('--json', help='write results to given JSON file')
+    parser.add_argument('--keep', action='store_true', help='keep outputs and the request log')
+    options = parser.parse_args(argv)
+
+    result = run(options)
+    report(result)
+    if options.json:
+        with open(options.json, 'w') as f:
+            json.dump(result, f, indent=2)
+    return 0 if result['succeeded'] == options.jobs else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,51 @@
+##################################################################
+# Copyright 2018 Open Source Geospatial Foundation and others    #
+# licensed under MIT, Please consult LICENSE.txt for details     #
+##################################################################
+
+"""Benchmarks of conversion of many literal values, one by one compared
+with :func:`pywps.inout.literaltypes.convert_values`
+"""
+
+import datetime
+
+import pytest
+
+from pywps.app.Service import Service
+from pywps.inout.literaltypes import convert, convert_values
+
+from conftest import create_echo
+
+pytest.importorskip('pytest_benchmark')
+
+COUNT = 100000
+
+
+def _values(data_type):
+    if data_type == 'dateTime':
+        start = datetime.datetime(2018, 1, 1)
+        return [(start + datetime.timedelta(seconds=i)).isoformat() for i in range(COUNT)]
+    if data_type == 'float':
+        return [str(i / 8.0) for i in range(COUNT)]
+    return [str(i) for i in range(COUNT)]
+
+
+@pytest.mark.parametrize('data_type', ['integer', 'float', 'dateTime'])
+def bench_convert(benchmark, data_type):
+    values = _values(data_type)
+    result = benchmark(lambda: [convert(data_type, value) for value in values])
+    assert len(result) == COUNT
+
+
+@pytest.mark.parametrize('data_type', ['integer', 'float', 'dateTime'])
+def bench_convert_values(benchmark, data_type):
+    values = _values(data_type)
+    result = benchmark(convert_values, data_type, values)
+    assert len(result) == COUNT
+
+
+def bench_create_literal_inputs(benchmark):
+    source = create_echo(max_occurs=COUNT).inputs[0]
+    inputs = [{'identifier': 'literal', 'data': value} for value in _values('integer')]
+    result = benchmark(Service().create_literal_inputs, source, inputs)
+    assert len(result) == COUNT
@@ -0,0 +1,87 @@
+##################################################################
+# Copyright 2018 Open Source Geospatial Foundation and others    #
+# licensed under MIT, Please consult LICENSE.txt for details     #
+##################################################################
+
+"""Benchmarks of the WSGI hot paths of :class:`pywps.Service`
+"""
+
+import uuid
+
+import pytest
+
+from pywps import Service, WPS, OWS
+from pywps.app.WPSRequest import WPSRequest
+from pywps.response import get_response
+from pywps.response.status import STATUS
+from pywps.tests import client_for, assert_response_success
+
+from conftest import create_echo, create_large_output, create_processes
+
+pytest.importorskip('pytest_benchmark')
+
+
+def bench_getcapabilities(benchmark, client):
+    resp = benchmark(client.get, '?service=WPS&request=GetCapabilities')
+    assert resp.status_code == 200
+
+
+def bench_describeprocess_all(benchmark, client):
+    resp = benchmark(client.get, '?service=WPS&version=1.0.0&request=DescribeProcess&identifier=all')
+    assert resp.status_code == 200
+
+
+@pytest.mark.parametrize('count', [10, 100, 1000])
+def bench_execute_literal_inputs(benchmark, count):
+    client = client_for(Service(processes=[create_echo(max_occurs=count)]))
+    request_doc = WPS.Execute(
+        OWS.Identifier('echo'),
+        WPS.DataInputs(*[
+            WPS.Input(OWS.Identifier('literal'), WPS.Data(WPS.LiteralData(str(i))))
+            for i in range(count)
+        ]),
+        version='1.0.0'
+    )
+    resp = benchmark(client.post_xml, doc=request_doc)
+    assert_response_success(resp)
+
+
+@pytest.mark.parametrize('size', [2 ** 20, 2 ** 23], ids=['1MB', '8MB'])
+def bench_execute_complex_input(benchmark, size):
+    client = client_for(Service(processes=[create_echo()]))
+    request_doc = WPS.Execute(
+        OWS.Identifier('echo'),
+        WPS.DataInputs(
+            WPS.Input(OWS.Identifier('complex'),
+                      WPS.Data(WPS.ComplexData('x' * size, mimeType='text/plain')))
+        ),
+        version='1.0.0'
+    )
+    resp = benchmark(client.post_xml, doc=request_doc)
+    assert_response_success(resp)
+
+
+def bench_execute_sync(benchmark):
+    client = client_for(Service(processes=create_processes(1)))
+    resp = benchmark(client.get, '?service=WPS&request=Execute&version=1.0.0&identifier=process_0'
+                                 '&datainputs=literal=42')
+    assert_response_success(resp)
+
+
+@pytest.mark.parametrize('size', [2 ** 20, 2 ** 23], ids=['1MB', '8MB'])
+def bench_execute_large_output(benchmark, size):
+    client = client_for(Service(processes=[create_large_output(size)]))
+    resp = benchmark(client.get, '?service=WPS&request=Execute&version=1.0.0&identifier=large_output')
+    assert_response_success(resp)
+
+
+def bench_update_status(benchmark):
+    (process,) = create_processes(1)
+    process._set_uuid(uuid.uuid1())
+    wps_request = WPSRequest()
+    wps_request.identifier = process.identifier
+    wps_response = get_response('execute')(wps_request, process=process, uuid=process.uuid)
+    wps_response.status = STATUS.STORE_AND_UPDATE_STATUS
+    wps_response.update_status('PyWPS Process started', 0)
+
+    benchmark(wps_response.update_status, 'Working', 50)
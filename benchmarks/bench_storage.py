@@ -0,0 +1,112 @@
+##################################################################
+# Copyright 2018 Open Source Geospatial Foundation and others    #
+# licensed under MIT, Please consult LICENSE.txt for details     #
+##################################################################
+
+"""Benchmarks of storing vector outputs to a local SQLite/SpatiaLite database
+
+The bulk ingest of :meth:`pywps.inout.storage.db.DbStorage.store_vector_output`
+is compared with a plain ``ogr.CopyLayer``, which writes the features one by
+one. Stored rows per second are reported in the ``extra_info`` of the results.
+"""
+
+import pytest
+
+from pywps import configuration
+from pywps.inout.storage.db.sqlite import SQLiteStorage
+
+pytest.importorskip('pytest_benchmark')
+ogr = pytest.importorskip('osgeo.ogr')
+osr = pytest.importorskip('osgeo.osr')
+
+ROUNDS = 3
+
+
+def create_points(file_name, count):
+    """Create GeoPackage with ``count`` points and a few attributes
+    """
+
+    srs = osr.SpatialReference()
+    srs.ImportFromEPSG(4326)
+    dataset = ogr.GetDriverByName('GPKG').CreateDataSource(file_name)
+    layer = dataset.CreateLayer('points', srs, ogr.wkbPoint)
+    layer.CreateField(ogr.FieldDefn('id', ogr.OFTInteger))
+    layer.CreateField(ogr.FieldDefn('name', ogr.OFTString))
+    layer.CreateField(ogr.FieldDefn('value', ogr.OFTReal))
+    layer.StartTransaction()
+    for i in range(count):
+        feature = ogr.Feature(layer.GetLayerDefn())
+        feature.SetField('id', i)
+        feature.SetField('name', 'point {}'.format(i))
+        feature.SetField('value', i / 7.0)
+        feature.SetGeometry(ogr.CreateGeometryFromWkt('POINT ({} {})'.format(i % 360 - 180, i % 180 - 90)))
+        layer.CreateFeature(feature)
+    layer.CommitTransaction()
+    dataset = None
+    return file_name
+
+
+def has_spatialite():
+    # the option is listed, if GDAL is built with SpatiaLite
+    options = ogr.GetDriverByName('SQLite').GetMetadataItem('DMD_CREATIONOPTIONLIST') or ''
+    return 'SPATIALITE' in options
+
+
+@pytest.fixture(scope='module', params=[10000, 100000], ids=lambda count: '{}_features'.format(count))
+def points(request, tmpdir_factory):
+    file_name = str(tmpdir_factory.mktemp('vector').join('points.gpkg'))
+    return (create_points(file_name, request.param), request.param)
+
+
+@pytest.fixture(params=[False, True], ids=['sqlite', 'spatialite'])
+def spatialite(request):
+    if request.param and not has_spatialite():
+        pytest.skip('GDAL is built without SpatiaLite')
+    options = dict(configuration.CONFIG.items('db'))
+    configuration.CONFIG.set('db', 'spatialite', str(request.param).lower())
+    yield request.param
+    for option, value in options.items():
+        configuration.CONFIG.set('db', option, value)
+
+
+def targets(tmpdir):
+    """Return setup function of benchmark rounds, storing each round to new
+    database
+    """
+
+    names = iter(range(ROUNDS + 1))
+
+    def setup():
+        return ((str(tmpdir.join('round_{}.sqlite'.format(next(names)))),), {})
+
+    return setup
+
+
+def bench_store_vector(benchmark, points, spatialite, tmpdir):
+    (file_name, count) = points
+    storage = SQLiteStorage()
+
+    def store(target):
+        storage.target = target
+        storage.store_vector_output(file_name, 'points')
+
+    benchmark.pedantic(store, setup=targets(tmpdir), rounds=ROUNDS)
+    benchmark.extra_info['rows_per_second'] = count / benchmark.stats['mean']
+
+
+def bench_copylayer(benchmark, points, spatialite, tmpdir):
+    """Feature by feature copy, as stored before the bulk ingest
+    """
+
+    (file_name, count) = points
+    options = ['SPATIALITE=YES'] if spatialite else []
+
+    def store(target):
+        dsc_out = ogr.GetDriverByName('SQLite').CreateDataSource(target, options)
+        dsc_in = ogr.Open(file_name)
+        dsc_out.CopyLayer(dsc_in.GetLayer(), 'points', ['OVERWRITE=YES'])
+        dsc_out = None
+        dsc_in = None
+
+    benchmark.pedantic(store, setup=targets(tmpdir), rounds=ROUNDS)
+    benchmark.extra_info['rows_per_second'] = count / benchmark.stats['mean']
@@ -0,0 +1,92 @@
+##################################################################
+# Copyright 2018 Open Source Geospatial Foundation and others    #
+# licensed under MIT, Please consult LICENSE.txt for details     #
+##################################################################
+
+"""Shared processes and fixtures of the PyWPS benchmarks
+"""
+
+import pytest
+
+from pywps import Service, Process, LiteralInput, LiteralOutput, ComplexInput, ComplexOutput, Format
+from pywps import configuration
+from pywps.tests import client_for
+
+
+def create_processes(count):
+    """Create ``count`` processes with a typical set of inputs and outputs
+    """
+
+    def handler(request, response):
+        response.outputs['output'].data = request.inputs['literal'][0].data
+        return response
+
+    return [Process(handler=handler,
+                    identifier='process_{}'.format(i),
+                    title='Process {}'.format(i),
+                    abstract='Benchmark process number {}'.format(i),
+                    inputs=[LiteralInput('literal', 'Literal input', data_type='string'),
+                            ComplexInput('complex', 'Complex input',
+                                         [Format('application/json'), Format('text/plain')],
+                                         min_occurs=0)],
+                    outputs=[LiteralOutput('output', 'Literal output', data_type='string'),
+                             ComplexOutput('complex_output', 'Complex output', [Format('text/plain')])])
+            for i in range(count)]
+
+
+def create_echo(max_occurs=1):
+    """Process echoing number of literal inputs and the size of complex input
+    """
+
+    def handler(request, response):
+        count = len(request.inputs.get('literal', []))
+        size = sum(len(inpt.data) for inpt in request.inputs.get('complex', []))
+        response.outputs['output'].data = '{}:{}'.format(count, size)
+        return response
+
+    return Process(handler=handler,
+                   identifier='echo',
+                   title='Echo',
+                   inputs=[LiteralInput('literal', 'Literal input', data_type='integer',
+                                        min_occurs=0, max_occurs=max_occurs),
+                           ComplexInput('complex', 'Complex input', [Format('text/plain')],
+                                        min_occurs=0)],
+                   outputs=[LiteralOutput('output', 'Output', data_type='string')])
+
+
+def create_large_output(size):
+    """Process returning complex output of ``size`` bytes
+    """
+
+    data = 'x' * size
+
+    def handler(request, response):
+        response.outputs['output'].data = data
+        return response
+
+    return Process(handler=handler,
+                   identifier='large_output',
+                   title='Large output',
+                   outputs=[ComplexOutput('output', 'Output', [Format('text/plain')])])
+
+
+@pytest.fixture(autouse=True)
+def benchmark_config(tmpdir):
+    """Allow large requests and keep the outputs in temporary directory
+    """
+
+    options = dict(configuration.CONFIG.items('server'))
+    configuration.CONFIG.set('server', 'maxrequestsize', '1gb')
+    configuration.CONFIG.set('server', 'outputpath', str(tmpdir))
+    configuration.CONFIG.set('server', 'workdir', str(tmpdir))
+    yield
+    for option, value in options.items():
+        configuration.CONFIG.set('server', option, value)
+
+
+@pytest.fixture(params=[10, 100, 1000], ids=lambda count: '{}_processes'.format(count))
+def client(request):
+    """Client of a service with 10, 100 and 1000 processes
+    """
+
+    return client_for(Service(processes=create_processes(request.param)))
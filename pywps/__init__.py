@@ -61,7 +61,7 @@ OGCUNIT = {
     'unity': 'urn:ogc:def:uom:OGC:1.0:unity'
 }
 
-from pywps.app import Process, Service, WPSRequest
+from pywps.app import OutputService, Process, Service, WPSRequest
 from pywps.app.WPSRequest import get_inputs_from_xml, get_output_from_xml
 from pywps.inout.inputs import LiteralInput, ComplexInput, BoundingBoxInput
 from pywps.inout.outputs import LiteralOutput, ComplexOutput, BoundingBoxOutput
@@ -0,0 +1,94 @@
+##################################################################
+# Copyright 2018 Open Source Geospatial Foundation and others    #
+# licensed under MIT, Please consult LICENSE.txt for details     #
+##################################################################
+
+import datetime
+import logging
+import mimetypes
+import os
+from werkzeug.exceptions import HTTPException, Forbidden, MethodNotAllowed, NotFound
+from werkzeug.wrappers import Request, Response
+from werkzeug.wsgi import wrap_file
+from pywps import compression
+import pywps.configuration as config
+
+LOGGER = logging.getLogger("PYWPS")
+
+
+class OutputService(object):
+
+    """WSGI application serving stored outputs and status documents from
+    ``[server] outputpath``, which is to be mounted at ``[server] outputurl``
+
+    Compressed variants of the files (see :mod:`pywps.compression`) are
+    served with ``Content-Encoding`` to clients accepting them, other clients
+    get the original file or the variant decompressed on the fly.
+
+    :param outputpath: served directory, ``[server] outputpath`` by default
+    """
+
+    def __init__(self, outputpath=None):
+        self.outputpath = outputpath
+
+    @Request.application
+    def __call__(self, http_request):
+        try:
+            if http_request.method not in ('GET', 'HEAD'):
+                raise MethodNotAllowed(['GET', 'HEAD'])
+            return self._serve(http_request)
+        except HTTPException as e:
+            return e
+
+    def _serve(self, http_request):
+        file_name = self._get_file_name(http_request.path)
+        (path, encoding) = compression.find_variant(file_name, http_request.headers.get('Accept-Encoding'))
+        if path is None:
+            raise NotFound()
+
+        (mime_type, file_encoding) = mimetypes.guess_type(file_name)
+        if file_encoding:
+            # compressed file requested directly
+            mime_type = None
+        accepted = encoding in compression.parse_accept_encoding(http_request.headers.get('Accept-Encoding'))
+        stat = os.stat(path)
+
+        if encoding is None or accepted:
+            response = Response(wrap_file(http_request.environ, open(path, 'rb')),
+                                mimetype=mime_type or 'application/octet-stream',
+                                direct_passthrough=True)
+            response.content_length = stat.st_size
+            if encoding is not None:
+                response.content_encoding = encoding
+        else:
+            LOGGER.debug('Decompressing %s for client not accepting %s', path, encoding)
+            response = Response(wrap_file(http_request.environ, compression.open_decoded(path, encoding)),
+                                mimetype=mime_type or 'application/octet-stream',
+                                direct_passthrough=True)
+
+        if path != file_name or self._has_variant(file_name):
+            response.vary.add('Accept-Encoding')
+        response.last_modified = datetime.datetime.utcfromtimestamp(int(stat.st_mtime))
+        response.set_etag('{:x}-{:x}-{}'.format(int(stat.st_mtime), stat.st_size,
+                                                encoding if accepted else 'identity'))
+        return response.make_conditional(http_request)
+
+    def _get_file_name(self, url_path):
+        """Return file name of requested path, making sure it is within the
+        output directory
+        """
+
+        root = os.path.realpath(self.outputpath or config.get_config_value('server', 'outputpath'))
+        parts = [part for part in url_path.split('/') if part]
+        if not parts or any(part.startswith('.') for part in parts):
+            # parent directories and hidden files (e.g. the .cas store)
+            raise Forbidden()
+
+        file_name = os.path.realpath(os.path.join(root, *parts))
+        if not file_name.startswith(root + os.sep):
+            raise Forbidden()
+        return file_name
+
+    def _has_variant(self, file_name):
+        return any(os.path.isfile(file_name + extension)
+                   for extension in compression.EXTENSIONS.values())
@@ -11,7 +11,7 @@ import json
 import shutil
 import tempfile
 
-from pywps import WPS, OWS, E, dblog
+from pywps import WPS, OWS, E, dblog, profiling
 from pywps.response import get_response
 from pywps.response.status import STATUS
 from pywps.app.WPSRequest import WPSRequest
@@ -194,6 +194,7 @@ class Process(object):
 
             # run immedietly
             if running < maxparallel or maxparallel == -1:
+                dblog.start_phase(self.uuid, 'queue')
                 self._run_async(wps_request, wps_response)
 
             # try to store for later usage
@@ -227,6 +228,7 @@ class Process(object):
         if stored < maxprocesses:
             LOGGER.debug("Store process in job queue, uuid=%s", self.uuid)
             dblog.store_process(self.uuid, wps_request)
+            dblog.start_phase(self.uuid, 'queue')
             wps_response.update_status('PyWPS Process stored in job queue', 0)
         else:
             raise ServerBusy('Maximum number of parallel running processes reached. Please try later.')
@@ -234,50 +236,63 @@ class Process(object):
         return wps_response
 
     def _run_process(self, wps_request, wps_response):
-        try:
-            self._set_grass(wps_request)
-            # if required set HOME to the current working directory.
-            if config.get_config_value('server', 'sethomedir') is True:
-                os.environ['HOME'] = self.workdir
-                LOGGER.info('Setting HOME to current working directory: %s', os.environ['HOME'])
-            LOGGER.debug('ProcessID=%s, HOME=%s', self.uuid, os.environ.get('HOME'))
-            wps_response.update_status('PyWPS Process started', 0)
-            wps_response = self.handler(wps_request, wps_response)
-
-            # if (not wps_response.status_percentage) or (wps_response.status_percentage != 100):
-            LOGGER.debug('Updating process status to 100% if everything went correctly')
-            wps_response.update_status('PyWPS Process {} finished'.format(self.title),
-                                       100, STATUS.DONE_STATUS, clean=self.async)
-        except Exception as e:
-            traceback.print_exc()
-            LOGGER.debug('Retrieving file and line number where exception occurred')
-            exc_type, exc_obj, exc_tb = sys.exc_info()
-            found = False
-            while not found:
-                # search for the _handler method
-                m_name = exc_tb.tb_frame.f_code.co_name
-                if m_name == '_handler':
-                    found = True
-                else:
-                    if exc_tb.tb_next is not None:
-                        exc_tb = exc_tb.tb_next
+        headers = None
+        http_request = getattr(wps_request, 'http_request', None)
+        if http_request is not None:
+            headers = http_request.headers
+        if self.async:
+            dblog.end_phase(self.uuid, 'queue')
+        with profiling.get_profiler(self.uuid, self.identifier, headers) as profiler, \
+                profiler.phase('process'):
+            try:
+                self._set_grass(wps_request)
+                # if required set HOME to the current working directory.
+                if config.get_config_value('server', 'sethomedir') is True:
+                    os.environ['HOME'] = self.workdir
+                    LOGGER.info('Setting HOME to current working directory: %s', os.environ['HOME'])
+                LOGGER.debug('ProcessID=%s, HOME=%s', self.uuid, os.environ.get('HOME'))
+                wps_response.update_status('PyWPS Process started', 0)
+                with profiler.phase('handler'):
+                    try:
+                        wps_response = self.handler(wps_request, wps_response)
+                    finally:
+                        self._close_inputs(wps_request)
+
+                # if (not wps_response.status_percentage) or (wps_response.status_percentage != 100):
+                LOGGER.debug('Updating process status to 100% if everything went correctly')
+                wps_response.update_status('PyWPS Process {} finished'.format(self.title),
+                                           100, STATUS.DONE_STATUS, clean=self.async)
+            except Exception as e:
+                traceback.print_exc()
+                LOGGER.debug('Retrieving file and line number where exception occurred')
+                exc_type, exc_obj, exc_tb = sys.exc_info()
+                found = False
+                while not found:
+                    # search for the _handler method
+                    m_name = exc_tb.tb_frame.f_code.co_name
+                    if m_name == '_handler':
+                        found = True
                     else:
-                        # if not found then take the first
-                        exc_tb = sys.exc_info()[2]
-                        break
-            fname = os.path.split(exc_tb.tb_frame.f_code.co_filename)[1]
-            method_name = exc_tb.tb_frame.f_code.co_name
-
-            # update the process status to display process failed
-            msg = 'Process error: %s.%s Line %i %s' % (fname, method_name, exc_tb.tb_lineno, e)
-            LOGGER.error(msg)
-
-            if not wps_response:
-                raise NoApplicableCode('Response is empty. Make sure the _handler method is returning a valid object.')
-            elif wps_request.raw:
-                raise
-            else:
-                wps_response.update_status(msg, -1, status=STATUS.ERROR_STATUS)
+                        if exc_tb.tb_next is not None:
+                            exc_tb = exc_tb.tb_next
+                        else:
+                            # if not found then take the first
+                            exc_tb = sys.exc_info()[2]
+                            break
+                fname = os.path.split(exc_tb.tb_frame.f_code.co_filename)[1]
+                method_name = exc_tb.tb_frame.f_code.co_name
+
+                # update the process status to display process failed
+                msg = 'Process error: %s.%s Line %i %s' % (fname, method_name, exc_tb.tb_lineno, e)
+                LOGGER.error(msg)
+
+                if not wps_response:
+                    raise NoApplicableCode('Response is empty. Make sure the _handler method is '
+                                           'returning a valid object.')
+                elif wps_request.raw:
+                    raise
+                else:
+                    wps_response.update_status(msg, -1, status=STATUS.ERROR_STATUS)
 
         # tr
         stored_request = dblog.get_first_stored()
@@ -289,7 +304,7 @@ class Process(object):
                 new_wps_request = WPSRequest()
                 new_wps_request.json = json.loads(request_json)
                 process_identifier = new_wps_request.identifier
-                process = self.service.prepare_process_for_execution(process_identifier)
+                process = self.service.prepare_process_for_execution(process_identifier, uuid)
                 process._set_uuid(uuid)
                 process.async = True
                 response_cls = get_response("execute")
@@ -302,9 +317,26 @@ class Process(object):
 
         return wps_response
 
+    @staticmethod
+    def _close_inputs(wps_request):
+        """Release resources of the inputs, e.g. datasets opened by the
+        validators
+        """
+        for inputs in wps_request.inputs.values():
+            for inpt in inputs:
+                close = getattr(inpt, 'close', None)
+                if close is not None:
+                    close()
+
     def clean(self):
         """Clean the process working dir and other temporary files
         """
+        # memory maps of the outputs are closed before their files are removed
+        for outpt in self.outputs:
+            close = getattr(outpt, 'close', None)
+            if close is not None:
+                close()
+
         LOGGER.info("Removing temporary working directory: %s" % self.workdir)
         try:
             if os.path.isdir(self.workdir):
@@ -17,7 +17,11 @@ import pywps.configuration as config
 from pywps.exceptions import MissingParameterValue, NoApplicableCode, InvalidParameterValue, FileSizeExceeded, \
     StorageNotSupported, FileURLNotSupported
 from pywps.inout.inputs import ComplexInput, LiteralInput, BoundingBoxInput
+from pywps.inout.outputs import ComplexOutput
+from pywps.inout.literaltypes import convert_values
 from pywps.dblog import log_request, update_response
+from pywps import janitor
+from pywps import profiling
 from pywps import response
 
 from collections import deque, OrderedDict
@@ -27,6 +31,7 @@ import uuid
 import copy
 import requests
 import shutil
+from multiprocessing.pool import ThreadPool
 
 
 LOGGER = logging.getLogger("PYWPS")
@@ -58,6 +63,8 @@ class Service(object):
         else:  # NullHandler | StreamHandler
             LOGGER.addHandler(logging.NullHandler())
 
+        janitor.start()
+
     def get_capabilities(self, wps_request, uuid):
 
         response_cls = response.get_response("capabilities")
@@ -77,11 +84,15 @@ class Service(object):
         :param uuid: string identifier of the request
         """
         self._set_grass()
-        process = self.prepare_process_for_execution(identifier)
+        process = self.prepare_process_for_execution(identifier, uuid)
         return self._parse_and_execute(process, wps_request, uuid)
 
-    def prepare_process_for_execution(self, identifier):
+    def prepare_process_for_execution(self, identifier, uuid=None):
         """Prepare the process identified by ``identifier`` for execution.
+
+        The ``uuid`` of the request is a part of the working directory name,
+        so that the directory of a running request is not removed by
+        :mod:`pywps.janitor`.
         """
         try:
             process = self.processes[identifier]
@@ -93,7 +104,10 @@ class Service(object):
         process = copy.deepcopy(process)
         process.service = self
         workdir = os.path.abspath(config.get_config_value('server', 'workdir'))
-        tempdir = tempfile.mkdtemp(prefix='pywps_process_', dir=workdir)
+        prefix = janitor.WORKDIR_PREFIX
+        if uuid is not None:
+            prefix += '{}_'.format(uuid)
+        tempdir = tempfile.mkdtemp(prefix=prefix, dir=workdir)
         process.set_workdir(tempdir)
         return process
 
@@ -101,30 +115,36 @@ class Service(object):
         """Parse and execute request
         """
 
+        # inputs share the request uuid, so that their phases are measured
+        process._set_uuid(uuid)
+
         LOGGER.debug('Checking if all mandatory inputs have been passed')
         data_inputs = {}
-        for inpt in process.inputs:
-            # Replace the dicts with the dict of Literal/Complex inputs
-            # set the input to the type defined in the process.
-
-            request_inputs = None
-            if inpt.identifier in wps_request.inputs:
-                request_inputs = wps_request.inputs[inpt.identifier]
+        with profiling.phase(uuid, 'inputs'):
+            for inpt in process.inputs:
+                # Replace the dicts with the dict of Literal/Complex inputs
+                # set the input to the type defined in the process.
+
+                request_inputs = None
+                if inpt.identifier in wps_request.inputs:
+                    request_inputs = wps_request.inputs[inpt.identifier]
+
+                if not request_inputs:
+                    if inpt.data_set:
+                        data_inputs[inpt.identifier] = [inpt.clone()]
+                else:
 
-            if not request_inputs:
-                if inpt.data_set:
-                    data_inputs[inpt.identifier] = [inpt.clone()]
-            else:
+                    if isinstance(inpt, ComplexInput):
+                        data_inputs[inpt.identifier] = self.create_complex_inputs(
+                            inpt, request_inputs, defer_validation=True)
+                    elif isinstance(inpt, LiteralInput):
+                        data_inputs[inpt.identifier] = self.create_literal_inputs(
+                            inpt, request_inputs)
+                    elif isinstance(inpt, BoundingBoxInput):
+                        data_inputs[inpt.identifier] = self.create_bbox_inputs(
+                            inpt, request_inputs)
 
-                if isinstance(inpt, ComplexInput):
-                    data_inputs[inpt.identifier] = self.create_complex_inputs(
-                        inpt, request_inputs)
-                elif isinstance(inpt, LiteralInput):
-                    data_inputs[inpt.identifier] = self.create_literal_inputs(
-                        inpt, request_inputs)
-                elif isinstance(inpt, BoundingBoxInput):
-                    data_inputs[inpt.identifier] = self.create_bbox_inputs(
-                        inpt, request_inputs)
+        self._validate_inputs(uuid, data_inputs)
 
         for inpt in process.inputs:
 
@@ -176,6 +196,9 @@ class Service(object):
             for outpt in wps_request.outputs:
                 for proc_outpt in process.outputs:
                     if outpt == proc_outpt.identifier:
+                        if isinstance(proc_outpt, ComplexOutput):
+                            # complex data are sent as they are read
+                            return Response(proc_outpt.iter_chunks())
                         return Response(proc_outpt.data)
 
             # if the specified identifier was not found raise error
@@ -196,37 +219,38 @@ class Service(object):
                 workdir=complexinput.workdir,
                 extension=_extension(complexinput))
 
-            try:
-                reference_file = _openurl(datain)
-                data_size = reference_file.headers.get('Content-Length', 0)
-            except Exception as e:
-                raise NoApplicableCode('File reference error: %s' % e)
-
-            # if the response did not return a 'Content-Length' header then
-            # calculate the size
-            if data_size == 0:
-                LOGGER.debug('no Content-Length, calculating size')
-
-            # check if input file size was not exceeded
-            complexinput.calculate_max_input_size()
-            max_byte_size = complexinput.max_size * 1024 * 1024
-            if int(data_size) > int(max_byte_size):
-                raise FileSizeExceeded('File size for input exceeded.'
-                                       ' Maximum allowed: %i megabytes' %
-                                       complexinput.max_size, complexinput.identifier)
-
-            try:
-                with open(tmp_file, 'wb') as f:
-                    data_size = 0
-                    for chunk in reference_file.iter_content(chunk_size=1024):
-                        data_size += len(chunk)
-                        if int(data_size) > int(max_byte_size):
-                            raise FileSizeExceeded('File size for input exceeded.'
-                                                   ' Maximum allowed: %i megabytes' %
-                                                   complexinput.max_size, complexinput.identifier)
-                        f.write(chunk)
-            except Exception as e:
-                raise NoApplicableCode(e)
+            with profiling.phase(complexinput.uuid, 'fetch'):
+                try:
+                    reference_file = _openurl(datain)
+                    data_size = reference_file.headers.get('Content-Length', 0)
+                except Exception as e:
+                    raise NoApplicableCode('File reference error: %s' % e)
+
+                # if the response did not return a 'Content-Length' header then
+                # calculate the size
+                if data_size == 0:
+                    LOGGER.debug('no Content-Length, calculating size')
+
+                # check if input file size was not exceeded
+                complexinput.calculate_max_input_size()
+                max_byte_size = complexinput.max_size * 1024 * 1024
+                if int(data_size) > int(max_byte_size):
+                    raise FileSizeExceeded('File size for input exceeded.'
+                                           ' Maximum allowed: %i megabytes' %
+                                           complexinput.max_size, complexinput.identifier)
+
+                try:
+                    with open(tmp_file, 'wb') as f:
+                        data_size = 0
+                        for chunk in reference_file.iter_content(chunk_size=1024):
+                            data_size += len(chunk)
+                            if int(data_size) > int(max_byte_size):
+                                raise FileSizeExceeded('File size for input exceeded.'
+                                                       ' Maximum allowed: %i megabytes' %
+                                                       complexinput.max_size, complexinput.identifier)
+                            f.write(chunk)
+                except Exception as e:
+                    raise NoApplicableCode(e)
 
             complexinput.file = tmp_file
             complexinput.url = datain.get('href')
@@ -270,9 +294,11 @@ class Service(object):
         else:
             return data_handler
 
-    def create_complex_inputs(self, source, inputs):
+    def create_complex_inputs(self, source, inputs, defer_validation=False):
         """Create new ComplexInput as clone of original ComplexInput
         because of inputs can be more then one, take it just as Prototype
+        :param defer_validation: inputs are validated later by
+                                 :meth:`_validate_inputs`
         :return collections.deque:
         """
 
@@ -280,6 +306,7 @@ class Service(object):
 
         for inpt in inputs:
             data_input = source.clone()
+            data_input.defer_validation = defer_validation
             frmt = data_input.supported_formats[0]
             if 'mimeType' in inpt:
                 if inpt['mimeType']:
@@ -308,6 +335,46 @@ class Service(object):
             raise MissingParameterValue(description="Given data input is missing", locator=source.identifier)
         return outinputs
 
+    def _validate_inputs(self, uuid, data_inputs):
+        """Validate complex inputs with deferred validation,
+        ``[server] validation_workers`` inputs in parallel
+
+        Inputs are validated once all of them are fetched. The failure of
+        the first invalid input in the request order is reported.
+        """
+
+        inputs = [inpt for identifier in data_inputs for inpt in data_inputs[identifier]
+                  if isinstance(inpt, ComplexInput) and inpt.defer_validation]
+        if not inputs:
+            return
+
+        for inpt in inputs:
+            inpt.defer_validation = False
+
+        workers = min(len(inputs), int(config.get_config_value('server', 'validation_workers') or 1))
+        with profiling.phase(uuid, 'validate'):
+            pool = ThreadPool(workers) if workers > 1 else None
+            try:
+                if pool is None:
+                    for inpt in inputs:
+                        inpt.validate()
+                else:
+                    # results are returned in order, first failure is raised
+                    for _ in pool.imap(lambda inpt: inpt.validate(), inputs):
+                        pass
+            except Exception:
+                # skip validation of remaining inputs, the inputs are closed
+                # once the validations already running are finished
+                if pool is not None:
+                    pool.terminate()
+                    pool.join()
+                for inpt in inputs:
+                    inpt.close()
+                raise
+            if pool is not None:
+                pool.close()
+                pool.join()
+
     def create_literal_inputs(self, source, inputs):
         """ Takes the http_request and parses the input to objects
         :return collections.deque:
@@ -315,7 +382,13 @@ class Service(object):
 
         outinputs = deque(maxlen=source.max_occurs)
 
-        for inpt in inputs:
+        # values of the same data type are converted at once
+        values = None
+        data_types = set(inpt.get('datatype') or source.data_type for inpt in inputs)
+        if len(inputs) > 1 and len(data_types) == 1 and source.data_type:
+            values = convert_values(data_types.pop(), [inpt.get('data') for inpt in inputs])
+
+        for (index, inpt) in enumerate(inputs):
             newinpt = source.clone()
             # set the input to the type defined in the process
             newinpt.uom = inpt.get('uom')
@@ -324,7 +397,10 @@ class Service(object):
                 newinpt.data_type = data_type
 
             # get the value of the field
-            newinpt.data = inpt.get('data')
+            if values is None:
+                newinpt.data = inpt.get('data')
+            else:
+                newinpt._set_converted_data(values[index])
 
             outinputs.append(newinpt)
 
@@ -394,8 +470,10 @@ class Service(object):
             LOGGER.debug('Setting PYWPS_CFG to %s', environ_cfg)
             os.environ['PYWPS_CFG'] = environ_cfg
 
+        profiler = profiling.get_profiler(request_uuid, headers=http_request.headers)
         try:
-            wps_request = WPSRequest(http_request)
+            with profiler.phase('parse'):
+                wps_request = WPSRequest(http_request)
             LOGGER.info('Request: %s', wps_request.operation)
             if wps_request.operation in ['getcapabilities',
                                          'describeprocess',
@@ -410,6 +488,7 @@ class Service(object):
                     response = self.describe(wps_request, request_uuid, wps_request.identifiers)
 
                 elif wps_request.operation == 'execute':
+                    profiler.select(wps_request.identifier)
                     response = self.execute(
                         wps_request.identifier,
                         wps_request,
@@ -439,6 +518,8 @@ class Service(object):
         except Exception as e:
             e = NoApplicableCode("No applicable error code, please check error log", code=500)
             return e
+        finally:
+            profiler.close()
 
 
 def _openurl(inpt):
@@ -3,6 +3,7 @@
 # licensed under MIT, Please consult LICENSE.txt for details     #
 ##################################################################
 
+from pywps.app.OutputService import OutputService  # noqa: F401
 from pywps.app.Process import Process  # noqa: F401
 from pywps.app.Service import Service  # noqa: F401
 from pywps.app.WPSRequest import WPSRequest  # noqa: F401
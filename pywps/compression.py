@@ -0,0 +1,185 @@
+##################################################################
+# Copyright 2018 Open Source Geospatial Foundation and others    #
+# licensed under MIT, Please consult LICENSE.txt for details     #
+##################################################################
+
+"""
+Compression of stored outputs and status documents of PyWPS-4
+
+Text-like outputs are stored with a compressed variant (``<file>.gz`` or
+``<file>.zst``), which is served with ``Content-Encoding`` to clients
+accepting it, see :class:`pywps.app.OutputService`. The policy is configured
+in the ``[compression]`` section and can be overridden per format in
+``[compression:<mime type>]`` sections.
+"""
+
+import fnmatch
+import gzip
+import logging
+import os
+import shutil
+from collections import namedtuple
+
+from pywps import configuration as config
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+LOGGER = logging.getLogger('PYWPS')
+
+# file extensions of the compressed variants by content coding
+EXTENSIONS = {
+    'gzip': '.gz',
+    'zstd': '.zst',
+}
+
+BUFFER_SIZE = 1024 * 1024
+
+Policy = namedtuple('Policy', 'algorithm, level, min_size, keep_original')
+
+
+def get_policy(mime_type):
+    """Return compression policy for given format or None, if outputs of
+    the format are not to be compressed
+
+    :param str mime_type: mime type of the output
+    :rtype: :class:`Policy`
+    """
+
+    if not mime_type:
+        return None
+
+    # parameters, like ``; version=1.0.0``, are ignored
+    mime_type = mime_type.split(';')[0].strip().lower()
+    section = 'compression:{}'.format(mime_type)
+
+    def get_value(option):
+        if config.CONFIG is not None and config.CONFIG.has_section(section) and \
+                config.CONFIG.has_option(section, option):
+            return config.get_config_value(section, option)
+        return config.get_config_value('compression', option)
+
+    if get_value('enabled') is not True:
+        return None
+
+    # formats with own section are compressed regardless of the mimetypes
+    if not config.CONFIG.has_section(section):
+        patterns = [p.strip() for p in config.get_config_value('compression', 'mimetypes').split(',')]
+        if not any(fnmatch.fnmatch(mime_type, p) for p in patterns if p):
+            return None
+
+    algorithm = get_value('algorithm') or 'gzip'
+    if algorithm == 'zstd' and zstandard is None:
+        LOGGER.warning('zstandard package is not installed, using gzip')
+        algorithm = 'gzip'
+    if algorithm not in EXTENSIONS:
+        LOGGER.warning('Unknown compression algorithm %s, using gzip', algorithm)
+        algorithm = 'gzip'
+
+    level = int(get_value('level') or 6)
+    min_size = int(config.get_size_mb(str(get_value('min_size') or '0')) * 1024 * 1024)
+    keep_original = get_value('keep_original') is not False
+    return Policy(algorithm, level, min_size, keep_original)
+
+
+def compress_file(file_name, policy, keep_original=None):
+    """Store compressed variant of given file according to the policy
+
+    :param file_name: file to be compressed
+    :param policy: :class:`Policy` as returned by :func:`get_policy`
+    :param keep_original: override ``policy.keep_original``
+    :returns: file name of the compressed variant or None, if the file was
+              not compressed
+    """
+
+    if policy is None or os.path.getsize(file_name) < policy.min_size:
+        return None
+
+    if keep_original is None:
+        keep_original = policy.keep_original
+
+    compressed = file_name + EXTENSIONS[policy.algorithm]
+    tmp_file = compressed + '.tmp'
+    with open(file_name, 'rb') as src:
+        if policy.algorithm == 'zstd':
+            with open(tmp_file, 'wb') as dst:
+                zstandard.ZstdCompressor(level=policy.level).copy_stream(src, dst)
+        else:
+            with gzip.GzipFile(tmp_file, 'wb', compresslevel=policy.level) as dst:
+                shutil.copyfileobj(src, dst, BUFFER_SIZE)
+    os.rename(tmp_file, compressed)
+    LOGGER.debug('Stored compressed variant %s', compressed)
+
+    if not keep_original:
+        os.remove(file_name)
+    return compressed
+
+
+def find_variant(file_name, accept_encoding=None):
+    """Find stored variant of the file, which should be served
+
+    :param file_name: file name of the uncompressed file
+    :param accept_encoding: value of the ``Accept-Encoding`` HTTP header
+    :returns: (file name, content coding) of acceptable variant,
+              (file name, None) of the original file, or (file name,
+              content coding) of a compressed variant, which has to be
+              decompressed by :func:`open_decoded` or (None, None), if the
+              file does not exist
+    """
+
+    accepted = parse_accept_encoding(accept_encoding)
+    for encoding in ['zstd', 'gzip']:
+        if encoding == 'zstd' and zstandard is None:
+            continue
+        variant = file_name + EXTENSIONS[encoding]
+        if encoding in accepted and os.path.isfile(variant):
+            return (variant, encoding)
+
+    if os.path.isfile(file_name):
+        return (file_name, None)
+
+    for (encoding, extension) in EXTENSIONS.items():
+        if os.path.isfile(file_name + extension):
+            return (file_name + extension, encoding)
+
+    return (None, None)
+
+
+def open_decoded(file_name, encoding):
+    """Open compressed variant for reading of the decompressed content
+    """
+
+    if encoding == 'zstd':
+        if zstandard is None:
+            raise IOError('zstandard package is required to decompress {}'.format(file_name))
+        return zstandard.ZstdDecompressor().stream_reader(open(file_name, 'rb'))
+    return gzip.open(file_name, 'rb')
+
+
+def parse_accept_encoding(accept_encoding):
+    """Return set of content codings accepted according to the
+    ``Accept-Encoding`` HTTP header
+    """
+
+    accepted = set()
+    for item in (accept_encoding or '').split(','):
+        parts = [p.strip() for p in item.split(';')]
+        coding = parts[0].lower()
+        if not coding:
+            continue
+        quality = 1.0
+        for param in parts[1:]:
+            if param.startswith('q='):
+                try:
+                    quality = float(param[2:])
+                except ValueError:
+                    quality = 0
+        if quality > 0:
+            accepted.add(coding)
+    if '*' in accepted:
+        accepted.update(EXTENSIONS.keys())
+    if 'x-gzip' in accepted:
+        accepted.add('gzip')
+    return accepted
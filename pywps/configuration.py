@@ -80,6 +80,11 @@ def load_configuration(cfgfiles=None):
     CONFIG.set('server', 'maxprocesses', '30')
     CONFIG.set('server', 'maxsingleinputsize', '1mb')
     CONFIG.set('server', 'maxrequestsize', '3mb')
+    # limits of zipped inputs (shapefiles) opened by the validators
+    CONFIG.set('server', 'maxzipmembers', '100')
+    CONFIG.set('server', 'maxzipsize', '2gb')
+    # inputs opened by the validators are kept open for the process
+    CONFIG.set('server', 'keep_datasets', 'true')
     CONFIG.set('server', 'temp_path', tempfile.gettempdir())
     CONFIG.set('server', 'processes_path', '')
     outputpath = tempfile.gettempdir()
@@ -92,6 +97,18 @@ def load_configuration(cfgfiles=None):
     # If this flag is enabled it will set the HOME environment
     # for each process to its current workdir (a temp folder).
     CONFIG.set('server', 'sethomedir', 'false')
+    # how are file outputs transferred to outputpath: auto or copy
+    CONFIG.set('server', 'output_transfer', 'auto')
+    # store identical outputs only once in content addressed store
+    CONFIG.set('server', 'output_deduplicate', 'false')
+    # number of reference outputs stored in parallel
+    CONFIG.set('server', 'store_workers', '4')
+    # number of complex inputs validated in parallel
+    CONFIG.set('server', 'validation_workers', '4')
+    # memory objects larger than this are written to a file right away
+    CONFIG.set('server', 'memory_spill_size', '32mb')
+    # size of chunks of streams copied to files
+    CONFIG.set('server', 'io_buffer_size', '1mb')
 
     CONFIG.add_section('processing')
     CONFIG.set('processing', 'mode', 'default')
@@ -104,6 +121,30 @@ def load_configuration(cfgfiles=None):
     CONFIG.set('logging', 'prefix', 'pywps_')
     CONFIG.set('logging', 'format', '%(asctime)s] [%(levelname)s] file=%(pathname)s line=%(lineno)s module=%(module)s function=%(funcName)s %(message)s')  # noqa
 
+    CONFIG.add_section('profiling')
+    CONFIG.set('profiling', 'enabled', 'false')
+    CONFIG.set('profiling', 'sample_rate', '0')
+    CONFIG.set('profiling', 'processes', '')
+    CONFIG.set('profiling', 'header', '')
+    CONFIG.set('profiling', 'tracemalloc', 'false')
+    CONFIG.set('profiling', 'path', '')
+    CONFIG.set('profiling', 'maxprofiles', '100')
+
+    CONFIG.add_section('retention')
+    CONFIG.set('retention', 'max_age', '0')
+    CONFIG.set('retention', 'max_size', '0')
+    CONFIG.set('retention', 'workdir_max_age', '24')
+    CONFIG.set('retention', 'interval', '0')
+
+    CONFIG.add_section('compression')
+    CONFIG.set('compression', 'enabled', 'false')
+    CONFIG.set('compression', 'mimetypes', 'text/*,application/xml,application/json,application/vnd.geo+json,'
+                                           'application/gml+xml,application/x-ogc-*,image/svg+xml')
+    CONFIG.set('compression', 'algorithm', 'gzip')
+    CONFIG.set('compression', 'level', '6')
+    CONFIG.set('compression', 'min_size', '1kb')
+    CONFIG.set('compression', 'keep_original', 'true')
+
     CONFIG.add_section('metadata:main')
     CONFIG.set('metadata:main', 'identification_title', 'PyWPS Processing Service')
     CONFIG.set('metadata:main', 'identification_abstract', 'PyWPS is an implementation of the Web Processing Service standard from the Open Geospatial Consortium. PyWPS is written in Python.')  # noqa
@@ -132,6 +173,41 @@ def load_configuration(cfgfiles=None):
     CONFIG.set('grass', 'gisbase', '')
     
     CONFIG.add_section('db')
+    # features per transaction of vector outputs, 0 for single transaction
+    CONFIG.set('db', 'transaction_size', '0')
+    CONFIG.set('db', 'spatialite', 'false')
+    # tiles of raster outputs, 0 workers for number of processors
+    CONFIG.set('db', 'raster_tile_size', '256')
+    CONFIG.set('db', 'raster_workers', '0')
+
+    CONFIG.add_section('schemas')
+    # directories of local copies of XML schemas, seperated by ':'
+    CONFIG.set('schemas', 'catalog', '')
+    CONFIG.set('schemas', 'cache_path', os.path.join(tempfile.gettempdir(), 'pywps_schemas'))
+    CONFIG.set('schemas', 'download', 'true')
+    # compiled schemas kept in memory
+    CONFIG.set('schemas', 'max_schemas', '32')
+
+    CONFIG.add_section('validation')
+    # budgets of validation of large inputs, 0 for complete validation
+    CONFIG.set('validation', 'sample_size', '0')
+    CONFIG.set('validation', 'sample_features', '0')
+    CONFIG.set('validation', 'sample_blocks', '1')
+    CONFIG.set('validation', 'sample_time', '0')
+
+    CONFIG.add_section('s3')
+    CONFIG.set('s3', 'bucket', '')
+    CONFIG.set('s3', 'prefix', '')
+    CONFIG.set('s3', 'endpoint_url', '')
+    CONFIG.set('s3', 'region', '')
+    CONFIG.set('s3', 'access_key_id', '')
+    CONFIG.set('s3', 'secret_access_key', '')
+    # parts of multipart uploads and number of parts uploaded in parallel
+    CONFIG.set('s3', 'part_size', '8mb')
+    CONFIG.set('s3', 'max_concurrency', '4')
+    # presigned URLs are returned, if public_url is not set
+    CONFIG.set('s3', 'public_url', '')
+    CONFIG.set('s3', 'url_expiration', '86400')
 
 
     if not cfgfiles:
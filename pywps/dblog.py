@@ -16,15 +16,16 @@ import datetime
 import pickle
 import json
 import os
+from collections import OrderedDict
 
 import sqlalchemy
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy import Column, Integer, String, VARCHAR, Float, DateTime, LargeBinary
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy import func
+from sqlalchemy.orm import scoped_session, sessionmaker
 
 LOGGER = logging.getLogger('PYWPS')
 _SESSION_MAKER = None
-_LAST_SESSION = None
 
 
 _tableprefix = configuration.get_config_value('logging', 'prefix')
@@ -55,6 +56,18 @@ class RequestInstance(Base):
     request = Column(LargeBinary, nullable=False)
 
 
+class RequestPhase(Base):
+    __tablename__ = '{}request_phases'.format(_tableprefix)
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    uuid = Column(VARCHAR(255), nullable=False, index=True)
+    phase = Column(VARCHAR(30), nullable=False)
+    pid = Column(Integer, nullable=False)
+    time_start = Column(DateTime(), nullable=False)
+    duration = Column(Float, nullable=True)
+    count = Column(Integer, nullable=False)
+
+
 def log_request(uuid, request):
     """Write OGC WPS request (only the necessary parts) to database logging
     system
@@ -101,6 +114,28 @@ def get_stored():
     return stored
 
 
+def get_request_times():
+    """Returns time of the last update of finished requests and uuids of
+    running requests
+
+    :returns: (dictionary of ``uuid: time_end``, set of running uuids)
+    """
+
+    session = get_session()
+    try:
+        finished = {}
+        running = set()
+        for (uuid, time_end, percent_done) in session.query(
+                ProcessInstance.uuid, ProcessInstance.time_end, ProcessInstance.percent_done):
+            if percent_done is not None and -1 < percent_done < 100:
+                running.add(uuid)
+            elif time_end is not None:
+                finished[uuid] = time_end
+    finally:
+        session.close()
+    return (finished, running)
+
+
 def get_first_stored():
     """Returns running processes ids
     """
@@ -160,19 +195,26 @@ def _get_identifier(request):
 
 def get_session():
     """Get Connection for database
+
+    Each thread has its own session (e.g. the retention sweeper running next
+    to the requests), the previous session of the calling thread is closed.
     """
 
     LOGGER.debug('Initializing database connection')
-    global _SESSION_MAKER
-    global _LAST_SESSION
+    session = _get_session_maker()()
+    session.close()
+    return session
 
-    if _LAST_SESSION:
-        _LAST_SESSION.close()
+
+def _get_session_maker():
+    """Connect to the database and create the tables, return thread local
+    session registry
+    """
+
+    global _SESSION_MAKER
 
     if _SESSION_MAKER:
-        _SESSION_MAKER.close_all()
-        _LAST_SESSION = _SESSION_MAKER()
-        return _LAST_SESSION
+        return _SESSION_MAKER
 
     database = configuration.get_config_value('logging', 'database')
     echo = True
@@ -187,14 +229,13 @@ def get_session():
     except sqlalchemy.exc.SQLAlchemyError as e:
         raise NoApplicableCode("Could not connect to database: {}".format(e.message))
 
-    Session = sessionmaker(bind=engine)
+    Session = scoped_session(sessionmaker(bind=engine))
     ProcessInstance.metadata.create_all(engine)
     RequestInstance.metadata.create_all(engine)
+    RequestPhase.metadata.create_all(engine)
 
     _SESSION_MAKER = Session
-
-    _LAST_SESSION = _SESSION_MAKER()
-    return _LAST_SESSION
+    return _SESSION_MAKER
 
 
 def store_process(uuid, request):
@@ -221,3 +262,92 @@ def remove_stored(uuid):
     session.delete(request)
     session.commit()
     session.close()
+
+
+def store_timings(uuid, timings):
+    """Store durations of request phases
+
+    :param timings: dictionary of ``phase: (time_start, duration, count)``
+    """
+
+    pid = os.getpid()
+    session = get_session()
+    for (phase, (time_start, duration, count)) in timings.items():
+        session.add(RequestPhase(
+            uuid=str(uuid), phase=phase, pid=pid, time_start=time_start,
+            duration=duration, count=count))
+    session.commit()
+    session.close()
+
+
+def start_phase(uuid, phase):
+    """Record start of request phase, which ends in another process (e.g.
+    waiting in the job queue)
+    """
+
+    session = get_session()
+    session.add(RequestPhase(
+        uuid=str(uuid), phase=phase, pid=os.getpid(),
+        time_start=datetime.datetime.now(), count=1))
+    session.commit()
+    session.close()
+
+
+def end_phase(uuid, phase):
+    """Record end of request phase started by :func:`start_phase`
+    """
+
+    session = get_session()
+    phases = session.query(RequestPhase).filter_by(
+        uuid=str(uuid), phase=phase, duration=None)
+    for request_phase in phases:
+        request_phase.duration = (datetime.datetime.now() - request_phase.time_start).total_seconds()
+    session.commit()
+    session.close()
+
+
+def get_timings(uuid):
+    """Returns durations of phases of given request in seconds
+
+    :rtype: :class:`collections.OrderedDict` of ``phase: duration``
+    """
+
+    session = get_session()
+    phases = session.query(RequestPhase).filter_by(uuid=str(uuid)).filter(
+        RequestPhase.duration.isnot(None)).order_by(RequestPhase.time_start)
+
+    timings = OrderedDict()
+    for request_phase in phases:
+        timings[request_phase.phase] = timings.get(request_phase.phase, 0) + request_phase.duration
+    session.close()
+    return timings
+
+
+def get_timings_summary():
+    """Returns statistics of request phases over all logged requests
+
+    Durations of nested phases are included in the outer phases, e.g. the
+    ``process`` phase includes ``handler``.
+
+    :rtype: dictionary of ``phase: {'requests', 'total', 'mean', 'max'}``
+    with durations in seconds
+    """
+
+    session = get_session()
+    rows = session.query(
+        RequestPhase.phase,
+        func.count(func.distinct(RequestPhase.uuid)),
+        func.sum(RequestPhase.duration),
+        func.max(RequestPhase.duration)).filter(
+            RequestPhase.duration.isnot(None)).group_by(RequestPhase.phase)
+
+    summary = {}
+    for (phase, requests, total, maximum) in rows:
+        summary[phase] = {
+            'requests': requests,
+            'total': total,
+            'mean': total / requests,
+            'max': maximum
+        }
+    session.close()
+    return summary
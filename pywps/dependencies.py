@@ -4,7 +4,7 @@
 ##################################################################
 
 try:
-    from osgeo import gdal, ogr
+    from osgeo import gdal, ogr, osr
 except ImportError as err:
     from pywps.exceptions import NoApplicableCode
     raise NoApplicableCode('Complex validation requires GDAL/OGR support')
@@ -5,10 +5,13 @@
 
 from pywps._compat import text_type, StringIO
 import os
+import shutil
 import tempfile
 from pywps.inout.literaltypes import (LITERAL_DATA_TYPES, convert,
                                       make_allowedvalues, is_anyvalue)
 from pywps import OWS, OGCUNIT, NAMESPACES
+from pywps import profiling
+from pywps import configuration as config
 from pywps.validator.mode import MODE
 from pywps.validator.base import emptyvalidator
 from pywps.validator import get_validator
@@ -17,26 +20,126 @@ from pywps.validator.literalvalidator import (validate_anyvalue,
 from pywps.exceptions import InvalidParameterValue
 from pywps._compat import PY2
 import base64
+import codecs
+import io
+import mimetypes
+import mmap
 from collections import namedtuple
 from io import BytesIO
 
 _SOURCE_TYPE = namedtuple('SOURCE_TYPE', 'MEMORY, FILE, STREAM, DATA')
 SOURCE_TYPE = _SOURCE_TYPE(0, 1, 2, 3)
 
+# content of the data detected once per source, encoding is the character
+# encoding of text, None if unknown
+ContentInfo = namedtuple('ContentInfo', ['is_text', 'mime_type', 'encoding'])
+
+
+def _get_content_info(filename=None, sample=None):
+    """Detect whether the file or the sample of data in memory is text,
+    its mime type and encoding
+
+    python-magic is used if available, otherwise the mime type is guessed
+    from the file name and the first 512 bytes of the file are checked for
+    a binary indicator, which won't detect all binary files.
+    """
 
-def _is_textfile(filename):
     try:
-        # use python-magic if available
         import magic
-        is_text = 'text/' in magic.from_file(filename, mime=True)
     except ImportError:
-        # read the first part of the file to check for a binary indicator.
-        # This method won't detect all binary files.
-        blocksize = 512
-        fh = open(filename, 'rb')
-        is_text = b'\x00' not in fh.read(blocksize)
-        fh.close()
-    return is_text
+        magic = None
+
+    if magic is not None:
+        if filename:
+            mime_type = magic.from_file(filename, mime=True)
+            encoding = magic.Magic(mime_encoding=True).from_file(filename)
+        else:
+            mime_type = magic.from_buffer(sample, mime=True)
+            encoding = magic.Magic(mime_encoding=True).from_buffer(sample)
+        is_text = 'text/' in mime_type
+        if not is_text:
+            encoding = None
+    else:
+        mime_type = None
+        if filename:
+            (mime_type, _) = mimetypes.guess_type(filename, strict=False)
+            with open(filename, 'rb') as fh:
+                sample = fh.read(512)
+        sample = sample[:512]
+        is_text = b'\x00' not in sample
+        encoding = None
+        if is_text:
+            try:
+                # the sample may end inside of a multibyte character
+                codecs.getincrementaldecoder('utf-8')().decode(sample)
+                encoding = 'utf-8'
+            except UnicodeDecodeError:
+                pass
+
+    return ContentInfo(is_text, mime_type, encoding)
+
+
+def _is_textfile(filename):
+    return _get_content_info(filename).is_text
+
+
+def _get_buffer_size():
+    """Return size of chunks of copied data, ``[server] io_buffer_size``
+    """
+    return int(config.get_size_mb(config.get_config_value('server', 'io_buffer_size') or '1mb') * 1024 * 1024)
+
+
+def _byte_view(data):
+    """Return :class:`memoryview` of the data as one dimensional array of
+    bytes
+
+    Views of other formats, e.g. of NumPy arrays, count items, not bytes.
+    They are cast without copying the data, if they are contiguous. Python 2
+    views can not be cast, the data are copied, they have to be contiguous.
+    """
+
+    view = memoryview(data)
+    if view.format == 'B' and view.ndim == 1:
+        return view
+    if PY2 or not view.c_contiguous:
+        return memoryview(view.tobytes())
+    return view.cast('B')
+
+
+class _MemoryStream(io.RawIOBase):
+    """Read only stream of data in memory
+
+    The data are accessed through :class:`memoryview`, they are copied only
+    into the buffers of the reader.
+    """
+
+    def __init__(self, data):
+        self._view = _byte_view(data)
+        self._position = 0
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def readinto(self, buff):
+        data = self._view[self._position:self._position + len(buff)]
+        size = len(data)
+        buff[:size] = data
+        self._position += size
+        return size
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_CUR:
+            offset += self._position
+        elif whence == io.SEEK_END:
+            offset += len(self._view)
+        self._position = max(offset, 0)
+        return self._position
+
+    def tell(self):
+        return self._position
 
 
 class IOHandler(object):
@@ -91,19 +194,63 @@ class IOHandler(object):
         self.uuid = None  # request identifier
         self._stream = None
         self.data_set = False
+        self.dataset = None  # GDAL/OGR dataset opened by the validator
+        self.probe = None  # metadata of the data found by the validator
+        self.defer_validation = False  # data are validated by validate() later
+        self._content_info = None
+        self._buffers = []  # memory maps returned by as_buffer()
 
         self.valid_mode = mode
 
+    def __getstate__(self):
+        # opened datasets can not be copied nor pickled
+        state = self.__dict__.copy()
+        state['dataset'] = None
+        state['_buffers'] = []
+        if self.source_type == SOURCE_TYPE.MEMORY:
+            # nor memory views
+            state['source'] = memoryview(self.source).tobytes()
+        return state
+
+    def close(self):
+        """Release resources opened by the validator and memory maps
+        returned by :meth:`as_buffer`
+        """
+        self.dataset = None
+        for buff in self._buffers:
+            try:
+                buff.close()
+            except BufferError:
+                # still viewed, e.g. by NumPy array, released with the view
+                pass
+        self._buffers = []
+
     def _check_valid(self):
-        """Validate this input usig given validator
+        """Validate this input usig given validator, unless the validation
+        is deferred
         """
 
-        validate = self.validator
-        _valid = validate(self, self.valid_mode)
+        self.dataset = None
+        self.probe = None
+        self._content_info = None
+        if self.defer_validation:
+            return
+        with profiling.phase(self.uuid, 'validate'):
+            self.validate()
+
+    def validate(self):
+        """Validate the data using given validator
+
+        :raises: :class:`pywps.exceptions.InvalidParameterValue` located
+                 at the identifier of the input
+        """
+
+        _valid = self.validator(self, self.valid_mode)
         if not _valid:
             self.data_set = False
             raise InvalidParameterValue('Input data not valid using '
-                                        'mode %s' % (self.valid_mode))
+                                        'mode %s' % (self.valid_mode),
+                                        getattr(self, 'identifier', ''))
         self.data_set = True
 
     def set_file(self, filename):
@@ -121,8 +268,25 @@ class IOHandler(object):
         self._workdir = workdirpath
 
     def set_memory_object(self, memory_object):
-        """Set source as in memory object"""
+        """Set source as in memory object, :class:`bytes`,
+        :class:`bytearray` or :class:`memoryview`
+
+        The data are not copied, unless they are not contiguous. They are
+        written to a file, once the file is requested, or right away, if
+        they are larger than the ``[server] memory_spill_size`` configuration
+        option.
+        """
+
         self.source_type = SOURCE_TYPE.MEMORY
+        self.source = _byte_view(memory_object)
+        self._tempfile = None
+
+        spill_size = config.get_size_mb(config.get_config_value('server', 'memory_spill_size') or '0') * 1024 * 1024
+        if spill_size and len(self.source) > spill_size:
+            file_name = self.get_file()
+            self.source_type = SOURCE_TYPE.FILE
+            self.source = file_name
+
         self._check_valid()
 
     def set_stream(self, stream):
@@ -144,11 +308,15 @@ class IOHandler(object):
         self._check_valid()
 
     def get_file(self):
-        """Get source as file name"""
+        """Get source as file name
+
+        Streams are copied to the file in chunks of ``[server] io_buffer_size``
+        bytes.
+        """
         if self.source_type == SOURCE_TYPE.FILE:
             return self.source
 
-        elif self.source_type == SOURCE_TYPE.STREAM or self.source_type == SOURCE_TYPE.DATA:
+        elif self.source_type in (SOURCE_TYPE.STREAM, SOURCE_TYPE.DATA, SOURCE_TYPE.MEMORY):
             if self._tempfile:
                 return self._tempfile
             else:
@@ -157,19 +325,26 @@ class IOHandler(object):
                     suffix = self.data_format.extension
                 (opening, stream_file_name) = tempfile.mkstemp(
                     dir=self.workdir, suffix=suffix)
+
+                data = self.source
+                if self.source_type == SOURCE_TYPE.STREAM:
+                    buffer_size = _get_buffer_size()
+                    # the first chunk tells, whether the stream is binary
+                    data = self.source.read(buffer_size)
+
                 openmode = 'w'
-                if not PY2 and isinstance(self.source, bytes):
+                if self.source_type == SOURCE_TYPE.MEMORY:
+                    openmode += 'b'
+                elif not PY2 and isinstance(data, bytes):
                     # on Python 3 open the file in binary mode if the source is
                     # bytes, which happens when the data was base64-decoded
                     openmode += 'b'
-                stream_file = open(stream_file_name, openmode)
 
-                if self.source_type == SOURCE_TYPE.STREAM:
-                    stream_file.write(self.source.read())
-                else:
-                    stream_file.write(self.source)
+                with os.fdopen(opening, openmode) as stream_file:
+                    stream_file.write(data)
+                    if self.source_type == SOURCE_TYPE.STREAM:
+                        shutil.copyfileobj(self.source, stream_file, buffer_size)
 
-                stream_file.close()
                 self._tempfile = str(stream_file_name)
                 return self._tempfile
 
@@ -179,9 +354,14 @@ class IOHandler(object):
         return self._workdir
 
     def get_memory_object(self):
-        """Get source as memory object"""
-        # TODO: Soeren promissed to implement at WPS Workshop on 23rd of January 2014
-        raise NotImplementedError("setmemory_object not implemented")
+        """Get source as memory object, :class:`memoryview` of the data"""
+        if self.source_type == SOURCE_TYPE.MEMORY:
+            return memoryview(self.source)
+        elif self.source_type == SOURCE_TYPE.DATA and isinstance(self.source, bytes):
+            return memoryview(self.source)
+        else:
+            with open(self.file, 'rb') as fh:
+                return memoryview(fh.read())
 
     def get_stream(self):
         """Get source as stream object"""
@@ -198,6 +378,55 @@ class IOHandler(object):
                 return BytesIO(self.source)
             else:
                 return StringIO(text_type(self.source))
+        elif self.source_type == SOURCE_TYPE.MEMORY:
+            return _MemoryStream(self.source)
+
+    def get_content_info(self):
+        """Return :class:`ContentInfo` of the data, detected once per
+        source
+        """
+
+        if self._content_info is None:
+            if self.source_type == SOURCE_TYPE.MEMORY:
+                self._content_info = _get_content_info(sample=memoryview(self.source)[:512].tobytes())
+            else:
+                file_name = self.file
+                if file_name:
+                    self._content_info = _get_content_info(file_name)
+        return self._content_info
+
+    def as_buffer(self):
+        """Return read only buffer of the data for random access without
+        reading them whole
+
+        Files are memory mapped, the operating system pages them in as they
+        are accessed. The maps are closed by :meth:`close`, once the process
+        finishes. Memory objects are returned as :class:`memoryview`.
+        """
+
+        if self.source_type == SOURCE_TYPE.MEMORY:
+            return memoryview(self.source)
+
+        file_name = self.file
+        if not os.path.getsize(file_name):
+            # empty files can not be mapped
+            return memoryview(b'')
+        with open(file_name, 'rb') as fh:
+            buff = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+        self._buffers.append(buff)
+        return buff
+
+    def as_array(self, dtype='uint8', count=-1, offset=0):
+        """Return read only NumPy array viewing the data returned by
+        :meth:`as_buffer`, requires NumPy
+
+        :param dtype: data type of the array items
+        :param int count: number of items, ``-1`` for all the data
+        :param int offset: offset of the first item in bytes
+        """
+
+        import numpy
+        return numpy.frombuffer(self.as_buffer(), dtype=dtype, count=count, offset=offset)
 
     def _openmode(self):
         openmode = 'r'
@@ -214,7 +443,7 @@ class IOHandler(object):
                     checked = True
             # when we can't guess it from the mime_type, we need to check the file.
             # mimetypes like application/xml and application/json are text files too.
-            if not checked and not _is_textfile(self.source):
+            if not checked and not self.content_info.is_text:
                 openmode += 'b'
         return openmode
 
@@ -229,6 +458,8 @@ class IOHandler(object):
             return self.source.read()
         elif self.source_type == SOURCE_TYPE.DATA:
             return self.source
+        elif self.source_type == SOURCE_TYPE.MEMORY:
+            return memoryview(self.source).tobytes()
 
     @property
     def validator(self):
@@ -243,6 +474,58 @@ class IOHandler(object):
     def get_base64(self):
         return base64.b64encode(self.data)
 
+    def iter_chunks(self, size=None):
+        """Iterate over the data in chunks of bytes, read as they are
+        consumed
+
+        Text is encoded in UTF-8. Stream sources are consumed, unless they
+        were already copied to a file.
+
+        :param int size: size of the chunks, ``[server] io_buffer_size`` by
+                         default
+        """
+
+        size = size or _get_buffer_size()
+        if self.source_type == SOURCE_TYPE.FILE or \
+                (self.source_type == SOURCE_TYPE.STREAM and self._tempfile):
+            with open(self.file, 'rb') as fh:
+                for chunk in iter(lambda: fh.read(size), b''):
+                    yield chunk
+        elif self.source_type == SOURCE_TYPE.STREAM:
+            while True:
+                chunk = self.source.read(size)
+                if not chunk:
+                    break
+                if isinstance(chunk, text_type):
+                    chunk = chunk.encode('utf-8')
+                yield chunk
+        elif self.source_type in (SOURCE_TYPE.DATA, SOURCE_TYPE.MEMORY):
+            data = self.source
+            if self.source_type == SOURCE_TYPE.DATA and not isinstance(data, bytes):
+                data = text_type(data).encode('utf-8')
+            view = _byte_view(data)
+            for start in range(0, len(view), size):
+                yield view[start:start + size].tobytes()
+
+    def iter_base64_chunks(self, size=None):
+        """Iterate over the data encoded in base64 in chunks, which can be
+        concatenated
+
+        :param int size: size of the encoded chunks, rounded down to a
+                         multiple of 4, ``[server] io_buffer_size`` by default
+        """
+
+        size = max((size or _get_buffer_size()) // 4 * 3, 3)
+        rest = b''
+        for chunk in self.iter_chunks(size):
+            chunk = rest + chunk
+            end = len(chunk) // 3 * 3
+            if end:
+                yield base64.b64encode(chunk[:end])
+            rest = chunk[end:]
+        if rest:
+            yield base64.b64encode(rest)
+
     # Properties
     file = property(fget=get_file, fset=set_file)
     memory_object = property(fget=get_memory_object, fset=set_memory_object)
@@ -250,6 +533,7 @@ class IOHandler(object):
     data = property(fget=get_data, fset=set_data)
     base64 = property(fget=get_base64, fset=set_base64)
     workdir = property(fget=get_workdir, fset=set_workdir)
+    content_info = property(fget=get_content_info)
 
     def _set_default_value(self, value, value_type):
         """Set default value based on input data type
@@ -304,6 +588,13 @@ class SimpleHandler(IOHandler):
 
         IOHandler.set_data(self, data)
 
+    def _set_converted_data(self, data):
+        """Set data value already converted into target format, e.g. by
+        :func:`pywps.inout.literaltypes.convert_values`
+        """
+
+        IOHandler.set_data(self, data)
+
     data = property(fget=get_data, fset=set_data)
 
 
@@ -659,6 +950,7 @@ class ComplexOutput(BasicIO, BasicComplex, IOHandler):
         BasicComplex.__init__(self, data_format, supported_formats)
 
         self._storage = None
+        self.url = None  # URL of the stored data
 
     @property
     def storage(self):
@@ -667,12 +959,29 @@ class ComplexOutput(BasicIO, BasicComplex, IOHandler):
     @storage.setter
     def storage(self, storage):
         self._storage = storage
+        self.url = None
+
+    def _check_valid(self):
+        # new data are stored again
+        self.url = None
+        IOHandler._check_valid(self)
+
+    def store(self):
+        """Store data and return URL pointing to them
+
+        The URL is kept in :attr:`url` until the data or the storage are
+        changed.
+        """
+        (outtype, storage, self.url) = self.storage.store(self)
+        return self.url
 
     def get_url(self):
-        """Return URL pointing to data
+        """Return URL pointing to data, data are stored, if not yet
         """
-        (outtype, storage, url) = self.storage.store(self)
-        return url
+        if self.url is None:
+            with profiling.phase(self.uuid, 'store'):
+                self.store()
+        return self.url
 
 
 class UOM(object):
@@ -29,9 +29,10 @@ class DATA_TYPE():
     RASTER = 1
     OTHER = 2
 
+    @staticmethod
     def is_valid_datatype(data_type):
 
-        known_values = [datatype for datatype in DATA_TYPE]
+        known_values = [DATA_TYPE.VECTOR, DATA_TYPE.RASTER, DATA_TYPE.OTHER]
         if data_type not in known_values:
             raise Exception("Unknown data type")
 
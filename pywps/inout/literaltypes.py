@@ -7,7 +7,9 @@
 """
 
 from pywps._compat import urlparse
+import re
 import time
+import six
 from dateutil.parser import parse as date_parser
 import datetime
 from pywps.exceptions import InvalidParameterValue
@@ -125,36 +127,12 @@ def get_converter(convertor):
     """
 
     def decorator_selector(data_type, data):
-        convert = None
-        if data_type in LITERAL_DATA_TYPES:
-            if data_type == 'string':
-                convert = convert_string
-            elif data_type == 'integer':
-                convert = convert_integer
-            elif data_type == 'float':
-                convert = convert_float
-            elif data_type == 'boolean':
-                convert = convert_boolean
-            elif data_type == 'positiveInteger':
-                convert = convert_positiveInteger
-            elif data_type == 'anyURI':
-                convert = convert_anyURI
-            elif data_type == 'time':
-                convert = convert_time
-            elif data_type == 'date':
-                convert = convert_date
-            elif data_type == 'dateTime':
-                convert = convert_datetime
-            elif data_type == 'scale':
-                convert = convert_scale
-            elif data_type == 'angle':
-                convert = convert_angle
-            elif data_type == 'nonNegativeInteger':
-                convert = convert_positiveInteger
-            else:
-                raise InvalidParameterValue(
-                    "Invalid data_type value of LiteralInput " +
-                    "set to '{}'".format(data_type))
+        try:
+            convert = CONVERTERS[data_type]
+        except KeyError:
+            raise InvalidParameterValue(
+                "Invalid data_type value of LiteralInput " +
+                "set to '{}'".format(data_type))
         try:
             return convert(data)
         except ValueError:
@@ -220,7 +198,10 @@ def convert_integer(inpt):
     1
     """
 
-    return int(float(inpt))
+    try:
+        return int(inpt)
+    except ValueError:
+        return int(float(inpt))
 
 
 def convert_string(inpt):
@@ -330,6 +311,72 @@ def convert_angle(inpt):
     return inpt % 360
 
 
+# converters of the LITERAL_DATA_TYPES
+CONVERTERS = {
+    'string': convert_string,
+    'integer': convert_integer,
+    'float': convert_float,
+    'boolean': convert_boolean,
+    'positiveInteger': convert_positiveInteger,
+    'anyURI': convert_anyURI,
+    'time': convert_time,
+    'date': convert_date,
+    'dateTime': convert_datetime,
+    'scale': convert_scale,
+    'angle': convert_angle,
+    'nonNegativeInteger': convert_positiveInteger,
+}
+
+# dates and times without time zone, which NumPy parses the same way as
+# dateutil
+_ISO_DATETIME = re.compile(r'^\d{4}-\d{2}-\d{2}(T\d{2}:\d{2}(:\d{2}(\.\d{1,6})?)?)?$')
+
+
+def convert_values(data_type, values):
+    """Convert list of values to target values at once
+
+    Strings of ``dateTime`` and ``date`` values are parsed by NumPy, if it
+    is installed, other values are converted one by one.
+
+    :returns: list of converted values
+    :raises: :class:`pywps.exceptions.InvalidParameterValue` for the first
+             value, which can not be converted
+    """
+
+    values = list(values)
+    converted = None
+    if data_type in ('dateTime', 'date') and len(values) > 1:
+        converted = _convert_datetimes(values)
+        if converted is not None and data_type == 'date':
+            converted = [value.date() for value in converted]
+    if converted is None:
+        converted = [convert(data_type, value) for value in values]
+    return converted
+
+
+def _convert_datetimes(values):
+    """Parse ISO dates and times by NumPy, ``None`` if NumPy is not
+    available or the values are not plain ISO dates and times
+    """
+
+    try:
+        import numpy
+    except ImportError:
+        return None
+
+    if not all(isinstance(value, six.string_types) and _ISO_DATETIME.match(value) for value in values):
+        return None
+    try:
+        converted = numpy.array(values, dtype='datetime64[us]').tolist()
+    except ValueError:
+        # invalid value is reported by dateutil
+        return None
+    if not all(isinstance(value, datetime.datetime) for value in converted):
+        # years out of range of datetime
+        return None
+    return converted
+
+
 def make_allowedvalues(allowed_values):
     """convert given value list to AllowedValue objects
 
@@ -6,12 +6,12 @@
 from pywps._compat import text_type
 from pywps import E, WPS, OWS, OGCTYPE, NAMESPACES
 from pywps.inout import basic
-from pywps.inout.storage.file import FileStorage
-from pywps.inout.storage.db import DbStorage
+from pywps.inout.storage import get_storage
 from pywps.inout.formats import Format
 from pywps import configuration as config
 from pywps.validator.mode import MODE
 import lxml.etree as etree
+import base64
 import six
 
 
@@ -208,27 +208,17 @@ class ComplexOutput(basic.ComplexOutput):
 
         return doc
 
+    def store(self):
+        if self.storage is None:
+            # backend selected by [server] store_type
+            self.storage = get_storage()
+        return basic.ComplexOutput.store(self)
+
     def _execute_xml_reference(self):
         """Return Reference node
         """
         doc = WPS.Reference()
 
-        store_type = config.get_config_value('server', 'store_type')
-        self.storage = None
-        if store_type == 'db':
-            db_storage_instance = DbStorage()
-            self.storage = db_storage_instance.get_db_type()
-        else:
-            self.storage = FileStorage()
-
-
-        """
-        to be implemented:
-        elif store_type == 's3' and \
-           config.get_config_value('s3', 'bucket_name'):
-            self.storage = S3Storage()
-        """
-
         doc.attrib['{http://www.w3.org/1999/xlink}href'] = self.get_url()
 
         if self.data_format:
@@ -245,19 +235,27 @@ class ComplexOutput(basic.ComplexOutput):
         """
         doc = WPS.Data()
 
-        if self.data is None:
-            complex_doc = WPS.ComplexData()
-        else:
-            complex_doc = WPS.ComplexData()
-            try:
-                data_doc = etree.parse(self.file)
+        data = self.data
+        complex_doc = WPS.ComplexData()
+        if data is not None:
+            data_doc = None
+            content_info = self.content_info
+            if content_info is None or content_info.is_text:
+                try:
+                    # data in memory are not written to a file
+                    data_doc = etree.parse(self.stream if self.source_type == basic.SOURCE_TYPE.MEMORY
+                                           else self.file)
+                except Exception:
+                    pass
+
+            if data_doc is not None:
                 complex_doc.append(data_doc.getroot())
-            except Exception:
-
-                if isinstance(self.data, six.string_types):
-                    complex_doc.text = self.data
-                else:
-                    complex_doc.text = etree.CDATA(self.base64)
+            elif isinstance(data, six.string_types):
+                complex_doc.text = data
+            elif content_info is not None and content_info.is_text and content_info.encoding:
+                complex_doc.text = data.decode(content_info.encoding)
+            else:
+                complex_doc.text = etree.CDATA(base64.b64encode(data))
 
         if self.data_format:
             if self.data_format.mime_type:
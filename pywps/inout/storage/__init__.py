@@ -3,13 +3,74 @@
 # licensed under MIT, Please consult LICENSE.txt for details     #
 ##################################################################
 
+import importlib
 from abc import ABCMeta, abstractmethod
 
+from pywps import configuration as config
+from pywps.exceptions import NoApplicableCode
 
 
 class STORE_TYPE:
     PATH = 0
     DB = 1
+    S3 = 2
+
+
+# storage backends by [server] store_type, classes or factories returning
+# storage instance, given as objects or dotted paths
+STORAGES = {
+    'file': 'pywps.inout.storage.file.FileStorage',
+    'db': 'pywps.inout.storage.db.DbStorage.get_db_type',
+    's3': 'pywps.inout.storage.s3.S3Storage',
+}
+
+
+def register_storage(store_type, factory):
+    """Register storage backend
+
+    :param str store_type: value of ``[server] store_type`` selecting the
+                           backend
+    :param factory: storage class or callable returning
+                    :class:`StorageAbstract` instance, or its dotted path
+    """
+
+    STORAGES[store_type] = factory
+
+
+def get_storage(store_type=None):
+    """Return instance of the storage backend
+
+    :param str store_type: registered backend or dotted path of storage
+                           class, ``[server] store_type`` by default
+    """
+
+    if store_type is None:
+        store_type = config.get_config_value('server', 'store_type') or 'file'
+
+    factory = STORAGES.get(store_type, store_type)
+    if not callable(factory):
+        factory = _import(factory)
+    return factory()
+
+
+def _import(path):
+    """Return object of given dotted path, the longest importable module
+    prefix is imported and the rest are attributes
+    """
+
+    parts = path.split('.')
+    for i in range(len(parts) - 1, 0, -1):
+        try:
+            obj = importlib.import_module('.'.join(parts[:i]))
+        except ImportError:
+            continue
+        try:
+            for name in parts[i:]:
+                obj = getattr(obj, name)
+        except AttributeError:
+            break
+        return obj
+    raise NoApplicableCode('Unknown storage type {}'.format(path))
 
 
 class StorageAbstract(object):
@@ -4,8 +4,12 @@
 ##################################################################
 
 import logging
+import os
+import threading
+from timeit import default_timer
 from abc import ABCMeta, abstractmethod
 from pywps import configuration as config
+from pywps.exceptions import NoApplicableCode
 from pywps.inout.storage import db
 from pywps.inout.formats import DATA_TYPE
 from .. import STORE_TYPE
@@ -15,9 +19,39 @@ import sqlalchemy
 
 LOGGER = logging.getLogger('PYWPS')
 
+# size of chunks written to the database
+CHUNK_SIZE = 1024 * 1024
+
+# engines (connection pools) by (process id, database url)
+_ENGINES = {}
+
+# tables of 'other' outputs by (database url, schema, identifier)
+_TABLES = {}
+
+_LOCK = threading.Lock()
+
+
+def get_engine(url):
+    """Return engine with connection pool for given database
+
+    The engine is created once per process, connections of the parent
+    process are not shared with the forked processes.
+    """
+
+    key = (os.getpid(), url)
+    with _LOCK:
+        engine = _ENGINES.get(key)
+        if engine is None:
+            engine = sqlalchemy.create_engine(url)
+            _ENGINES[key] = engine
+    return engine
+
 
 class DbStorage(StorageAbstract):
 
+    # GDAL driver of vector outputs
+    vector_format = None
+
     def __init__(self):
         # get db_type from configuration 
         try:
@@ -50,6 +84,9 @@ class DbStorage(StorageAbstract):
         """ Creates reference that is returned to the client
         """
 
+        from . import sqlite
+        from . import pg
+
         DATA_TYPE.is_valid_datatype(output.output_format.data_type)
 
         if output.output_format.data_type is DATA_TYPE.VECTOR:
@@ -73,82 +110,170 @@ class DbStorage(StorageAbstract):
 
 
     def store_vector_output(self, file_name, identifier):
-        """ Open output file, connect to SQLite database and copiy data there
-        """ 
-        from osgeo import ogr
+        """ Open output file, connect to the database and copy data there
 
-        if isinstance(self, sqlite.SQLiteStorage):
-            drv = ogr.GetDriverByName("SQLite")
-            dsc_out = drv.CreateDataSource(self.target)
-        elif isinstance(self, pg.PgStorage):
-           dsc_out = ogr.Open("PG:" + self.target)
+        Features are loaded by ``gdal.VectorTranslate`` in transactions of
+        ``[db] transaction_size`` features (``0`` for a single transaction),
+        using the fastest method of the database, and the spatial index is
+        created once all the features are loaded.
+        """
+        from osgeo import gdal, ogr
 
-        # connect to a database and copy output there
         LOGGER.debug("Database: {}".format(self.target))
         dsc_in = ogr.Open(file_name)
         if dsc_in is None:
             raise Exception("Reading data failed.")
+
+        transaction_size = int(config.get_config_value('db', 'transaction_size') or 0)
+        options = gdal.VectorTranslateOptions(
+            format=self.vector_format,
+            accessMode='overwrite',
+            layerName=self.get_vector_layer_name(identifier),
+            datasetCreationOptions=self.get_vector_dataset_options(),
+            layerCreationOptions=self.get_vector_layer_options(),
+            options=['-gt', str(transaction_size) if transaction_size > 0 else 'unlimited'])
+
+        # outputs are stored by several threads, the options are set for the
+        # current thread only
+        config_options = self.get_vector_config_options()
+        previous = dict((key, gdal.GetThreadLocalConfigOption(key, None)) for key in config_options)
+        start = default_timer()
+        try:
+            for (key, value) in config_options.items():
+                gdal.SetThreadLocalConfigOption(key, value)
+            dsc_out = gdal.VectorTranslate(self.get_vector_destination(), dsc_in, options=options)
+        finally:
+            for (key, value) in previous.items():
+                gdal.SetThreadLocalConfigOption(key, value)
+
         if dsc_out is None:
-            raise NoApplicableCode("Could not connect to the database.")
-        layer = dsc_out.CopyLayer(dsc_in.GetLayer(), identifier,
-                                  ['OVERWRITE=YES'])
+            raise NoApplicableCode("Writing output data to the database failed.")
 
+        layer = dsc_out.GetLayerByName(self.get_vector_layer_name(identifier))
         if layer is None:
             raise Exception("Writing output data to the database failed.")
-        
-        dsc_out.Destroy()
-        dsc_in.Destroy()
+        features = layer.GetFeatureCount()
+        if layer.GetGeomType() != ogr.wkbNone:
+            self.create_spatial_index(dsc_out, identifier, layer.GetGeometryColumn())
+
+        layer = None
+        dsc_out = None
+        dsc_in = None
+
+        duration = default_timer() - start
+        LOGGER.info("Stored %d features to %s in %.2f s (%.0f rows/s)",
+                    features, identifier, duration, features / duration if duration else 0)
 
         # returns process identifier (defined within the process)
         return identifier
 
+    def get_vector_destination(self):
+        """ Return GDAL name of the database
+        """
+        raise NotImplementedError
+
+    def get_vector_layer_name(self, identifier):
+        return identifier
+
+    def get_vector_dataset_options(self):
+        return []
+
+    def get_vector_layer_options(self):
+        # the spatial index is created after the data are loaded
+        return ['SPATIAL_INDEX=NO']
+
+    def get_vector_config_options(self):
+        return {}
+
+    def create_spatial_index(self, dataset, identifier, geometry_column):
+        pass
+
 
     def store_raster_output(self, file_name, identifier):
         pass
 
+    def get_raster_tiling(self):
+        """ Return size of raster tiles (blocks) and number of parallel
+        workers writing them, ``[db] raster_tile_size`` and
+        ``[db] raster_workers``
+        """
 
-    def store_other_output(self, file_name, identifier, uuid):
+        import multiprocessing
 
-        from pywps import configuration as config  
-        from sqlalchemy import Column, Integer, String, LargeBinary, DateTime, func, create_engine
-        from sqlalchemy.ext.declarative import declarative_base  
-        from sqlalchemy.orm import sessionmaker
+        tile_size = int(config.get_config_value('db', 'raster_tile_size') or 256)
+        workers = int(config.get_config_value('db', 'raster_workers') or 0)
+        if workers <= 0:
+            workers = multiprocessing.cpu_count()
+        return (tile_size, workers)
 
-        base = declarative_base()
 
-        if isinstance(self, sqlite.SQLiteStorage):
-            engine = sqlalchemy.create_engine("sqlite:///{}".format(self.target))
-        elif isinstance(self, pg.PgStorage):
-            engine = sqlalchemy.create_engine('postgresql://{}:{}@{}:{}/{}'.format(
-            self.dbname,self.password,self.host,self.port,self.user
-                )
-            )   
+    def store_other_output(self, file_name, identifier, uuid):
+        """ Stream output file to the 'other' outputs table of the database
+        """
 
-        # Create table
-        class Other_output(base):  
-            __tablename__ = identifier
-            if isinstance(self, pg.PgStorage):
-                __table_args__ = {'schema' : self.schema_name}
+        engine = get_engine(self.get_engine_url())
+        table = self.get_other_table(engine, identifier)
 
+        with engine.begin() as connection:
+            self.write_other_output(connection, table, file_name, uuid)
 
-            primary_key = Column(Integer, primary_key=True)
-            uuid = Column(String(64))
-            data = Column(LargeBinary)
-            timestamp = Column(DateTime(timezone=True), server_default=func.now())
+        return identifier
 
-        Session = sessionmaker(engine)  
-        session = Session()
+    def get_engine_url(self):
+        """ Return SQLAlchemy URL of the database
+        """
+        raise NotImplementedError
 
-        base.metadata.create_all(engine)
+    def get_other_table(self, engine, identifier):
+        """ Return table of 'other' outputs, created if needed
 
-        # Open file as binary
-        with open(file_name, "rb") as data:
-            out = data.read()
+        Tables are created and mapped once per database and identifier. An
+        existing table is used as it is, it may come from a previous version
+        without the ``part`` column or with another ``data`` column type.
+        """
 
-            # Add data to table
-            output = Other_output(uuid=uuid, data=out)  
-            session.add(output)  
-            session.commit()
+        from sqlalchemy import Column, Integer, String, DateTime, func
+
+        schema = getattr(self, 'schema_name', None) or None
+        key = (str(engine.url), schema, identifier)
+        with _LOCK:
+            table = _TABLES.get(key)
+            if table is None:
+                sqlalchemy.Table(
+                    identifier, sqlalchemy.MetaData(),
+                    Column('primary_key', Integer, primary_key=True),
+                    Column('uuid', String(64)),
+                    Column('part', Integer, nullable=False, server_default='0'),
+                    Column('data', self.data_type()),
+                    Column('timestamp', DateTime(timezone=True), server_default=func.now()),
+                    schema=schema).create(engine, checkfirst=True)
+                table = sqlalchemy.Table(identifier, sqlalchemy.MetaData(), autoload_with=engine, schema=schema)
+                _TABLES[key] = table
+        return table
+
+    def data_type(self):
+        """ Return column type of the stored data
+        """
+        return sqlalchemy.LargeBinary
 
+    def write_other_output(self, connection, table, file_name, uuid):
+        """ Insert output file to the table in rows of :data:`CHUNK_SIZE`
+        bytes, numbered by the ``part`` column
 
-        return identifier
\ No newline at end of file
+        Tables without the ``part`` column get the whole file in one row.
+        """
+
+        with open(file_name, "rb") as data:
+            if 'part' not in table.c:
+                LOGGER.warning('Table %s has no part column, reading whole %s to memory', table.name, file_name)
+                connection.execute(table.insert().values(uuid=str(uuid), data=data.read()))
+                return
+
+            part = 0
+            chunk = data.read(CHUNK_SIZE)
+            while True:
+                connection.execute(table.insert().values(uuid=str(uuid), part=part, data=chunk))
+                chunk = data.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                part += 1
@@ -3,18 +3,24 @@
 # licensed under MIT, Please consult LICENSE.txt for details     #
 ##################################################################
 
+import binascii
 import logging
+import struct
+import sys
+from timeit import default_timer
 from pywps import configuration as config
 from pywps.exceptions import NoApplicableCode
 from .. import STORE_TYPE
 from pywps.inout.formats import DATA_TYPE
-from . import DbStorage
+from . import DbStorage, CHUNK_SIZE, get_engine
 import sqlalchemy
 
 LOGGER = logging.getLogger('PYWPS')
 
 class PgStorage(DbStorage):
 
+    vector_format = "PostgreSQL"
+
     def __init__(self):
         # TODO: more databases in config file
         # create connection string
@@ -36,34 +42,117 @@ class PgStorage(DbStorage):
 
 
     def store_raster_output(self, file_name, identifier):
+        """ Store raster to PostGIS raster table in tiles of
+        ``[db] raster_tile_size`` pixels
+
+        Rows of tiles are read and written by ``[db] raster_workers``
+        threads, each using its own connection. The table is created, if it
+        does not exist, otherwise the tiles are appended.
+        """
+
+        from osgeo import gdal
+        from multiprocessing.pool import ThreadPool
+
+        dataset = gdal.Open(file_name)
+        if dataset is None:
+            raise NoApplicableCode("Reading raster output {} failed: {}".format(
+                file_name, gdal.GetLastErrorMsg()))
+        (width, height) = (dataset.RasterXSize, dataset.RasterYSize)
+        srid = _get_srid(dataset)
+        dataset = None
 
-        from subprocess import call, run, Popen, PIPE
+        (tile_size, workers) = self.get_raster_tiling()
+        table = '"{}"'.format(identifier)
+        if self.schema_name:
+            table = '"{}".{}'.format(self.schema_name, table)
+
+        engine = get_engine(self.get_engine_url())
+        with engine.begin() as connection:
+            connection.execute('CREATE TABLE IF NOT EXISTS {} (rid serial PRIMARY KEY, rast raster)'.format(table))
+        insert = sqlalchemy.text('INSERT INTO {} (rast) VALUES (CAST(:rast AS raster))'.format(table))
+
+        def store_row(yoff):
+            row = gdal.Open(file_name)
+            if row is None:
+                raise NoApplicableCode("Reading raster output {} failed: {}".format(
+                    file_name, gdal.GetLastErrorMsg()))
+            ysize = min(tile_size, height - yoff)
+            tiles = [{'rast': _get_raster_wkb(row, xoff, yoff, min(tile_size, width - xoff), ysize, srid)}
+                     for xoff in range(0, width, tile_size)]
+            with engine.begin() as connection:
+                connection.execute(insert, tiles)
+            return len(tiles)
+
+        start = default_timer()
+        pool = ThreadPool(min(workers, max(1, (height + tile_size - 1) // tile_size)))
+        try:
+            # the first exception of the workers is raised here
+            tiles = sum(pool.map(store_row, range(0, height, tile_size)))
+        except sqlalchemy.exc.SQLAlchemyError as e:
+            raise NoApplicableCode("Writing raster output {} to the database failed: {}".format(identifier, e))
+        finally:
+            pool.close()
+            pool.join()
 
-        # Convert raster to an SQL query
-        command1 = ["raster2pgsql", "-a", file_name, self.schema_name +  "." + identifier]
-        p = Popen(command1,stdout=PIPE)
-        # Apply the SQL query
-        command2 = ["psql", "-h", "localhost", "-p", "5432", "-d", self.dbname]
-        run(command2,stdin=p.stdout)
+        with engine.begin() as connection:
+            connection.execute('CREATE INDEX IF NOT EXISTS "{}_convexhull_idx" ON {} '
+                               'USING GIST (ST_ConvexHull(rast))'.format(identifier, table))
 
+        duration = default_timer() - start
+        LOGGER.info("Stored %d tiles of raster %s in %.2f s (%.0f tiles/s)",
+                    tiles, identifier, duration, tiles / duration if duration else 0)
 
         return identifier
 
 
-    def initdb(self):
+    def get_vector_destination(self):
 
-        from sqlalchemy.schema import CreateSchema
+        return "PG:" + self.target
 
-        dbsettings = "db"
-        connstr = 'postgresql://{}:{}@{}:{}/{}'.format(
-            config.get_config_value(dbsettings, "user"),
-            config.get_config_value(dbsettings, "password"),
-            config.get_config_value(dbsettings, "host"),
-            config.get_config_value(dbsettings, "port"),
-            config.get_config_value(dbsettings, "dbname")
+
+    def get_vector_layer_name(self, identifier):
+
+        if self.schema_name:
+            return '{}.{}'.format(self.schema_name, identifier)
+        return identifier
+
+
+    def get_vector_layer_options(self):
+
+        from osgeo import gdal
+
+        # NONE replaced NO in GDAL 2.4
+        if int(gdal.VersionInfo()) >= 2040000:
+            return ['SPATIAL_INDEX=NONE']
+        return ['SPATIAL_INDEX=NO']
+
+
+    def get_vector_config_options(self):
+
+        # load new tables by COPY instead of INSERT statements
+        return {'PG_USE_COPY': 'YES'}
+
+
+    def create_spatial_index(self, dataset, identifier, geometry_column):
+
+        table = '"{}"'.format(identifier)
+        if self.schema_name:
+            table = '"{}".{}'.format(self.schema_name, table)
+        dataset.ExecuteSQL('CREATE INDEX ON {} USING GIST ("{}")'.format(table, geometry_column))
+
+
+    def get_engine_url(self):
+
+        return 'postgresql://{}:{}@{}:{}/{}'.format(
+            self.user, self.password, self.host, self.port, self.dbname
         )
 
-        engine = sqlalchemy.create_engine(connstr)
+
+    def initdb(self):
+
+        from sqlalchemy.schema import CreateSchema
+
+        engine = get_engine(self.get_engine_url())
         schema_name = config.get_config_value('db', 'schema_name')
 
         #Create schema; if it already exists, skip this
@@ -71,4 +160,119 @@ class PgStorage(DbStorage):
             engine.execute(CreateSchema(schema_name))
         # programming error - schema already exists)
         except sqlalchemy.exc.ProgrammingError:
-            pass
\ No newline at end of file
+            pass
+
+
+    def data_type(self):
+
+        from sqlalchemy.dialects.postgresql import OID
+
+        # the data are stored as large object, the table refers to it
+        return OID
+
+
+    def write_other_output(self, connection, table, file_name, uuid):
+        """ Write output file as PostgreSQL large object in chunks
+
+        The ``data`` column holds the large object OID, the content can be
+        read by ``lo_get(data)`` or the large object API. Tables with a
+        ``bytea`` column, created by previous versions, get the file in
+        rows of bytes.
+        """
+
+        from sqlalchemy.dialects.postgresql import OID
+
+        if not isinstance(table.c.data.type, OID):
+            return super(PgStorage, self).write_other_output(connection, table, file_name, uuid)
+
+        dbapi_connection = connection.connection
+        lobject = dbapi_connection.lobject(0, 'wb')
+        try:
+            with open(file_name, "rb") as data:
+                for chunk in iter(lambda: data.read(CHUNK_SIZE), b''):
+                    lobject.write(chunk)
+        finally:
+            lobject.close()
+
+        values = {'uuid': str(uuid), 'data': lobject.oid}
+        if 'part' in table.c:
+            values['part'] = 0
+        connection.execute(table.insert().values(**values))
+
+
+# PostGIS raster pixel types and struct formats by GDAL data type name
+_PIXEL_TYPES = {
+    'Byte': (4, 'B'),
+    'Int16': (5, 'h'),
+    'UInt16': (6, 'H'),
+    'Int32': (7, 'i'),
+    'UInt32': (8, 'I'),
+    'Float32': (10, 'f'),
+    'Float64': (11, 'd'),
+}
+
+
+def _get_srid(dataset):
+    """ Return EPSG code of the raster, 0 if unknown
+    """
+
+    from osgeo import osr
+
+    projection = dataset.GetProjection()
+    if not projection:
+        return 0
+    srs = osr.SpatialReference()
+    srs.ImportFromWkt(projection)
+    srs.AutoIdentifyEPSG()
+    code = srs.GetAuthorityCode(None)
+    return int(code) if code else 0
+
+
+def _get_raster_wkb(dataset, xoff, yoff, xsize, ysize, srid):
+    """ Return hex encoded PostGIS raster WKB of given window of the dataset
+
+    See ``raster/doc/RFC2-WellKnownBinaryFormat`` of PostGIS.
+    """
+
+    from osgeo import gdal
+
+    (byte_order, endian) = ('<', 1) if sys.byteorder == 'little' else ('>', 0)
+    transform = dataset.GetGeoTransform()
+    parts = [struct.pack(
+        byte_order + 'BHHddddddiHH', endian, 0, dataset.RasterCount,
+        transform[1], transform[5],
+        transform[0] + xoff * transform[1] + yoff * transform[2],
+        transform[3] + xoff * transform[4] + yoff * transform[5],
+        transform[2], transform[4], srid, xsize, ysize)]
+
+    for number in range(1, dataset.RasterCount + 1):
+        band = dataset.GetRasterBand(number)
+        type_name = gdal.GetDataTypeName(band.DataType)
+        if type_name not in _PIXEL_TYPES:
+            raise NoApplicableCode("Raster data type {} is not supported by PostGIS".format(type_name))
+        (pixel_type, pixel_format) = _PIXEL_TYPES[type_name]
+        parts.append(_get_band_header(byte_order, pixel_type, pixel_format, band.GetNoDataValue()))
+        # pixels in native byte order, row by row
+        data = band.ReadRaster(xoff, yoff, xsize, ysize)
+        if data is None:
+            raise NoApplicableCode("Reading band {} of raster output failed: {}".format(
+                number, gdal.GetLastErrorMsg()))
+        parts.append(data)
+
+    return binascii.hexlify(b''.join(parts)).decode('ascii')
+
+
+def _get_band_header(byte_order, pixel_type, pixel_format, nodata):
+    """ Return flags and nodata value of a band of PostGIS raster WKB
+
+    Nodata value, which cannot be represented by the pixel type, is omitted.
+    """
+
+    if nodata is not None:
+        try:
+            if pixel_format not in 'fd':
+                nodata = int(nodata)
+            return struct.pack(byte_order + 'B' + pixel_format, pixel_type | 0x40, nodata)
+        except (ValueError, OverflowError, struct.error):
+            LOGGER.warning("Nodata value %s does not fit the raster data type, omitted", nodata)
+    return struct.pack(byte_order + 'B' + pixel_format, pixel_type, 0)
@@ -4,11 +4,15 @@
 ##################################################################
 
 import logging
+import os
+import sqlite3
+from timeit import default_timer
+import sqlalchemy
 from pywps import configuration as config
 from .. import STORE_TYPE
 from pywps.inout.formats import DATA_TYPE
 from pywps.exceptions import NoApplicableCode
-from . import DbStorage
+from . import DbStorage, CHUNK_SIZE
 
 
 LOGGER = logging.getLogger('PYWPS')
@@ -16,16 +20,102 @@ LOGGER = logging.getLogger('PYWPS')
 
 class SQLiteStorage(DbStorage):
 
+    vector_format = "SQLite"
+
     def __init__(self):
 
         self.target = config.get_config_value("db", "dblocation")
+        self.spatialite = config.get_config_value("db", "spatialite") is True
 
 
     def store_raster_output(self, file_name, identifier):
+        """ Store raster to Rasterlite table in tiles of
+        ``[db] raster_tile_size`` pixels
+        """
+
+        from osgeo import gdal
+
+        (tile_size, _) = self.get_raster_tiling()
+        options = gdal.TranslateOptions(
+            format="Rasterlite",
+            creationOptions=['BLOCKXSIZE={}'.format(tile_size), 'BLOCKYSIZE={}'.format(tile_size)])
 
-        from subprocess import call
+        start = default_timer()
+        dataset = gdal.Translate("RASTERLITE:{},table={}".format(self.target, identifier), file_name,
+                                 options=options)
 
-        call(["gdal_translate", "-of", "Rasterlite", file_name, "RASTERLITE:" + self.target + ",table=" + identifier])
+        if dataset is None:
+            raise NoApplicableCode("Writing raster output {} to the database failed: {}".format(
+                identifier, gdal.GetLastErrorMsg()))
+        dataset = None
+
+        LOGGER.info("Stored raster %s in %.2f s", identifier, default_timer() - start)
 
         # returns process identifier (defined within the process)
         return identifier
+
+
+    def get_vector_destination(self):
+
+        return self.target
+
+
+    def get_vector_dataset_options(self):
+
+        if self.spatialite:
+            return ['SPATIALITE=YES']
+        return []
+
+
+    def create_spatial_index(self, dataset, identifier, geometry_column):
+
+        # spatial index is supported by SpatiaLite databases only
+        if self.spatialite:
+            result = dataset.ExecuteSQL("SELECT CreateSpatialIndex('{}', '{}')".format(identifier, geometry_column))
+            if result is not None:
+                dataset.ReleaseResultSet(result)
+
+
+    def get_engine_url(self):
+
+        return "sqlite:///{}".format(self.target)
+
+
+    def write_other_output(self, connection, table, file_name, uuid):
+        """ Insert output file using incremental BLOB I/O
+
+        Space for the output is allocated by ``zeroblob()`` and the file is
+        written in chunks, only one chunk is held in memory. Outputs larger
+        than the maximal SQLite BLOB size are split to several rows of the
+        same uuid, numbered by the ``part`` column. Without
+        :meth:`sqlite3.Connection.blobopen` (Python < 3.11) the file is
+        inserted in rows of one chunk.
+        """
+
+        dbapi_connection = connection.connection
+        if not hasattr(dbapi_connection, 'blobopen') or 'part' not in table.c:
+            return super(SQLiteStorage, self).write_other_output(connection, table, file_name, uuid)
+
+        # leave space for the other columns of the row
+        max_size = dbapi_connection.getlimit(sqlite3.SQLITE_LIMIT_LENGTH) - CHUNK_SIZE
+        remaining = os.path.getsize(file_name)
+
+        with open(file_name, "rb") as data:
+            part = 0
+            while True:
+                size = min(remaining, max_size)
+                result = connection.execute(table.insert().values(uuid=str(uuid), part=part,
+                                                                  data=sqlalchemy.func.zeroblob(size)))
+                rowid = result.inserted_primary_key[0]
+                with dbapi_connection.blobopen(table.name, 'data', rowid) as blob:
+                    written = 0
+                    while written < size:
+                        chunk = data.read(min(CHUNK_SIZE, size - written))
+                        if not chunk:
+                            raise NoApplicableCode('Output {} changed while being stored'.format(file_name))
+                        blob.write(chunk)
+                        written += len(chunk)
+                remaining -= size
+                if remaining <= 0:
+                    break
+                part += 1
@@ -3,15 +3,43 @@
 # licensed under MIT, Please consult LICENSE.txt for details     #
 ##################################################################
 
+import errno
+import hashlib
 import logging
+import math
 import os
+import shutil
+import sys
+import tempfile
+import time
+from collections import OrderedDict
 from pywps._compat import urljoin
 from pywps.exceptions import NotEnoughStorage
 from pywps import configuration as config
+from pywps import compression
 from . import StorageAbstract, STORE_TYPE
 
+try:
+    import fcntl
+except ImportError:
+    # not available on Windows
+    fcntl = None
+
 LOGGER = logging.getLogger('PYWPS')
 
+# ioctl request number of cloning a file, see ioctl_ficlone(2)
+FICLONE = 0x40049409
+
+# size of chunks for copying outputs
+COPY_BUFFER_SIZE = 1024 * 1024
+
+# directory of the content addressed outputs in outputpath
+CAS_DIRECTORY = '.cas'
+
+# digests of recently stored files by (path, device, inode, size, mtime)
+_DIGESTS = OrderedDict()
+_MAX_DIGESTS = 1000
+
 
 
 class FileStorage(StorageAbstract):
@@ -44,31 +72,24 @@ class FileStorage(StorageAbstract):
         """
         self.target = config.get_config_value('server', 'outputpath')
         self.output_url = config.get_config_value('server', 'outputurl')
+        self.transfer = config.get_config_value('server', 'output_transfer') or 'auto'
+        self.deduplicate = config.get_config_value('server', 'output_deduplicate') is True
 
     def store(self, output):
-        import math
-        import shutil
-        import tempfile
-        import uuid 
+        import uuid
 
         file_name = output.file
         request_uuid = output.uuid or uuid.uuid1()
 
-        file_block_size = os.stat(file_name).st_blksize
-        # get_free_space delivers the numer of free blocks, not the available size!
-        avail_size = get_free_space(self.target) * file_block_size
-        file_size = os.stat(file_name).st_size
-
-        # calculate space used according to block size
-        actual_file_size = math.ceil(file_size / float(file_block_size)) * file_block_size
-
-        if avail_size < actual_file_size:
-            raise NotEnoughStorage('Not enough space in {} to store {}'.format(self.target, file_name))
-
         # create a target folder for each request
         target = os.path.join(self.target, str(request_uuid))
         if not os.path.exists(target):
-            os.makedirs(target)
+            try:
+                os.makedirs(target)
+            except OSError:
+                # created by another output meanwhile
+                if not os.path.isdir(target):
+                    raise
 
         # build output name
         (prefix, suffix) = os.path.splitext(file_name)
@@ -76,14 +97,30 @@ class FileStorage(StorageAbstract):
             suffix = output.data_format.extension
         (file_dir, file_name) = os.path.split(prefix)
         output_name = file_name + suffix
-        # build tempfile in case of duplicates
-        if os.path.exists(os.path.join(target, output_name)):
-            output_name = tempfile.mkstemp(suffix=suffix, prefix=file_name + '_',
-                                           dir=target)[1]
-
         full_output_name = os.path.join(target, output_name)
-        LOGGER.info('Storing file output to %s', full_output_name)
-        shutil.copy2(output.file, full_output_name)
+
+        data_format = getattr(output, 'data_format', None)
+        policy = compression.get_policy(data_format.mime_type if data_format else None)
+
+        if os.path.exists(full_output_name) and self._is_stored(output.file, full_output_name) or \
+                self._is_compressed(output.file, full_output_name, policy):
+            # the output is stored again, when the response is updated
+            LOGGER.debug('File output %s already stored', full_output_name)
+        else:
+            # outputs of the same name may be stored in parallel
+            full_output_name = _reserve(target, file_name, suffix, policy)
+            output_name = os.path.basename(full_output_name)
+            LOGGER.info('Storing file output to %s', full_output_name)
+            try:
+                if self.deduplicate and hasattr(os, 'link'):
+                    self._store_blob(output.file, full_output_name)
+                else:
+                    self._transfer(output.file, full_output_name)
+            except Exception:
+                os.remove(full_output_name)
+                raise
+            if policy is not None:
+                self._compress(output.file, full_output_name, policy)
 
         just_file_name = os.path.basename(output_name)
 
@@ -95,6 +132,325 @@ class FileStorage(StorageAbstract):
 
         return (STORE_TYPE.PATH, output_name, url)
 
+    def _transfer(self, source, destination):
+        """Transfer file to the output directory
+
+        Unless ``[server] output_transfer`` is set to ``copy``, the file is
+        hard linked on the same file system (the process working directory is
+        removed afterwards, so this is effectively a move, while the output
+        still can be read from its original location) or cloned using reflink.
+        Otherwise, it is copied using ``copy_file_range`` or in chunks.
+
+        :returns: name of the used method
+        """
+
+        if self.transfer != 'copy':
+            if _link(source, destination):
+                return 'link'
+            if _reflink(source, destination):
+                return 'reflink'
+
+        self._check_free_space(source)
+        if _copy_range(source, destination):
+            method = 'copy_file_range'
+        else:
+            _copy_chunked(source, destination)
+            method = 'copy'
+        shutil.copystat(source, destination)
+        return method
+
+    def _store_blob(self, source, destination):
+        """Store file in the content addressed store and link it to the
+        destination
+
+        The file is hashed while it is being copied (or read after it was
+        cloned) to ``outputpath/.cas/<digest[:2]>/<digest>``. Identical
+        outputs are stored only once, the number of hard links of the blob
+        counts the requests referring to it. The source is never hard linked,
+        the blob shared by requests would change with the working file.
+        """
+
+        cas = os.path.join(self.target, CAS_DIRECTORY)
+        tmp_dir = os.path.join(cas, 'tmp')
+        if not os.path.isdir(tmp_dir):
+            os.makedirs(tmp_dir)
+        (fd, tmp_file) = tempfile.mkstemp(dir=tmp_dir)
+        os.close(fd)
+
+        try:
+            if self.transfer != 'copy' and _reflink(source, tmp_file):
+                digest = _hash_file(tmp_file)
+            else:
+                self._check_free_space(source)
+                digest = _copy_chunked(source, tmp_file, hashlib.sha256())
+                shutil.copystat(source, tmp_file)
+
+            blob = self._blob(digest)
+            if not os.path.isdir(os.path.dirname(blob)):
+                os.makedirs(os.path.dirname(blob))
+            if os.path.exists(blob):
+                LOGGER.debug('Output %s already stored as %s', source, blob)
+                # protect the blob from garbage collection until it is linked
+                os.utime(blob, None)
+                os.remove(tmp_file)
+            else:
+                os.rename(tmp_file, blob)
+        except Exception:
+            if os.path.exists(tmp_file):
+                os.remove(tmp_file)
+            raise
+
+        _replace_with_link(blob, destination)
+        _remember_digest(source, digest)
+        return digest
+
+    def _blob(self, digest):
+        return os.path.join(self.target, CAS_DIRECTORY, digest[:2], digest)
+
+    def _is_stored(self, source, stored):
+        """Return True, if stored file is a link or a copy of the source file
+        """
+
+        if _same_inode(source, stored):
+            return True
+        if self.deduplicate:
+            digest = _DIGESTS.get(_file_key(source))
+            return digest is not None and _same_inode(self._blob(digest), stored)
+        # copies are compared by content, the modification time is not kept
+        # exactly by all file systems, other outputs of the same name and
+        # size are not taken for this one
+        if os.path.getsize(source) != os.path.getsize(stored):
+            return False
+        return _get_digest(source) == _get_digest(stored)
+
+    def _compress(self, source, stored, policy):
+        """Store compressed variant of the stored output
+
+        The variant gets the modification time of the source file, so it can
+        be recognized by :meth:`_is_compressed`, if the original is removed.
+        """
+
+        compressed = compression.compress_file(stored, policy)
+        if compressed is not None:
+            source_stat = os.stat(source)
+            os.utime(compressed, (source_stat.st_atime, source_stat.st_mtime))
+        return compressed
+
+    def _is_compressed(self, source, stored, policy):
+        """Return True, if only the compressed variant of the source file is
+        stored
+        """
+
+        if policy is None or policy.keep_original or os.path.exists(stored):
+            return False
+        compressed = stored + compression.EXTENSIONS[policy.algorithm]
+        return os.path.exists(compressed) and \
+            int(os.stat(source).st_mtime) == int(os.stat(compressed).st_mtime)
+
+    def _check_free_space(self, file_name):
+        """Raise :class:`NotEnoughStorage`, if the file does not fit to
+        the output directory
+        """
+
+        file_block_size = os.stat(file_name).st_blksize
+        # get_free_space delivers the numer of free blocks, not the available size!
+        avail_size = get_free_space(self.target) * file_block_size
+        file_size = os.stat(file_name).st_size
+
+        # calculate space used according to block size
+        actual_file_size = math.ceil(file_size / float(file_block_size)) * file_block_size
+
+        if avail_size < actual_file_size:
+            raise NotEnoughStorage('Not enough space in {} to store {}'.format(self.target, file_name))
+
+
+def remove_unreferenced_blobs(outputpath=None, min_age=60):
+    """Remove outputs from the content addressed store, which are not
+    referred by any request any more
+
+    :param outputpath: output directory, ``[server] outputpath`` by default
+    :param min_age: keep blobs and temporary files modified in last
+                    ``min_age`` seconds, which may be being stored
+    :returns: number of removed blobs
+    """
+
+    cas = os.path.join(outputpath or config.get_config_value('server', 'outputpath'), CAS_DIRECTORY)
+    if not os.path.isdir(cas):
+        return 0
+
+    removed = 0
+    threshold = time.time() - min_age
+    for directory in os.listdir(cas):
+        if not os.path.isdir(os.path.join(cas, directory)):
+            continue
+        for name in os.listdir(os.path.join(cas, directory)):
+            blob = os.path.join(cas, directory, name)
+            try:
+                stat = os.stat(blob)
+                if stat.st_mtime > threshold:
+                    continue
+                if directory == 'tmp' or stat.st_nlink <= 1:
+                    LOGGER.debug('Removing unreferenced output %s', blob)
+                    os.remove(blob)
+                    removed += 1
+            except OSError as e:
+                LOGGER.warning('Could not remove output %s: %s', blob, e)
+    return removed
+
+
+def _same_inode(first, second):
+    first_stat = os.stat(first)
+    second_stat = os.stat(second)
+    # st_ino is 0 on Windows with Python 2
+    return bool(first_stat.st_ino) and \
+        (first_stat.st_dev, first_stat.st_ino) == (second_stat.st_dev, second_stat.st_ino)
+
+
+def _file_key(file_name):
+    stat = os.stat(file_name)
+    return (os.path.abspath(file_name), stat.st_dev, stat.st_ino, stat.st_size, stat.st_mtime)
+
+
+def _remember_digest(file_name, digest):
+    _DIGESTS[_file_key(file_name)] = digest
+    while len(_DIGESTS) > _MAX_DIGESTS:
+        _DIGESTS.popitem(last=False)
+
+
+def _get_digest(file_name):
+    """Return SHA-256 digest of given file, remembered until the file is
+    modified
+    """
+
+    digest = _DIGESTS.get(_file_key(file_name))
+    if digest is None:
+        digest = _hash_file(file_name)
+        _remember_digest(file_name, digest)
+    return digest
+
+
+def _hash_file(file_name):
+    """Return SHA-256 digest of given file
+    """
+
+    digest = hashlib.sha256()
+    with open(file_name, 'rb') as f:
+        for chunk in iter(lambda: f.read(COPY_BUFFER_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _reserve(target, name, suffix, policy=None):
+    """Create empty file for the output in the target directory and return
+    its path
+
+    The file is named ``<name><suffix>``, unless a file of this name or its
+    compressed variant exists, then a unique name is generated.
+    """
+
+    path = os.path.join(target, name + suffix)
+    if policy is None or not os.path.exists(path + compression.EXTENSIONS[policy.algorithm]):
+        try:
+            os.close(os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+            return path
+        except OSError as e:
+            if e.errno != errno.EEXIST:
+                raise
+    (fd, path) = tempfile.mkstemp(suffix=suffix, prefix=name + '_', dir=target)
+    os.close(fd)
+    return path
+
+
+def _link(source, destination):
+    """Hard link source to destination, if they are on the same device
+    """
+
+    if not hasattr(os, 'link'):
+        return False
+    try:
+        if os.stat(source).st_dev != os.stat(os.path.dirname(destination)).st_dev:
+            return False
+        _replace_with_link(source, destination)
+    except OSError as e:
+        LOGGER.debug('Could not link %s: %s', source, e)
+        return False
+    return True
+
+
+def _replace_with_link(source, destination):
+    """Replace destination by a hard link of source
+
+    The link is created under a temporary name and renamed, so the
+    destination is replaced atomically and never removed meanwhile.
+    """
+
+    (fd, tmp_file) = tempfile.mkstemp(prefix='.link_', dir=os.path.dirname(destination))
+    os.close(fd)
+    os.remove(tmp_file)
+    try:
+        os.link(source, tmp_file)
+        os.rename(tmp_file, destination)
+    except OSError:
+        if os.path.exists(tmp_file):
+            os.remove(tmp_file)
+        raise
+
+
+def _reflink(source, destination):
+    """Clone source to destination using the ``FICLONE`` ioctl (copy on write
+    file systems like Btrfs or XFS)
+    """
+
+    if fcntl is None or not sys.platform.startswith('linux'):
+        return False
+    try:
+        with open(source, 'rb') as src, open(destination, 'wb') as dst:
+            fcntl.ioctl(dst.fileno(), FICLONE, src.fileno())
+    except (IOError, OSError) as e:
+        LOGGER.debug('Could not reflink %s: %s', source, e)
+        return False
+    shutil.copystat(source, destination)
+    return True
+
+
+def _copy_range(source, destination):
+    """Copy source to destination in kernel using ``copy_file_range``
+    (Python 3.8 or newer)
+    """
+
+    if not hasattr(os, 'copy_file_range'):
+        return False
+    try:
+        with open(source, 'rb') as src, open(destination, 'wb') as dst:
+            size = os.fstat(src.fileno()).st_size
+            offset = 0
+            while offset < size:
+                copied = os.copy_file_range(src.fileno(), dst.fileno(), size - offset, offset, offset)
+                if copied == 0:
+                    break
+                offset += copied
+    except OSError as e:
+        LOGGER.debug('Could not copy %s using copy_file_range: %s', source, e)
+        return False
+    return offset == size
+
+
+def _copy_chunked(source, destination, digest=None):
+    """Copy source to destination in chunks of :data:`COPY_BUFFER_SIZE`
+
+    :param digest: :mod:`hashlib` object updated with the copied data
+    :returns: hex digest, if ``digest`` was given
+    """
+
+    with open(source, 'rb') as src, open(destination, 'wb') as dst:
+        if digest is None:
+            shutil.copyfileobj(src, dst, COPY_BUFFER_SIZE)
+            return None
+        for chunk in iter(lambda: src.read(COPY_BUFFER_SIZE), b''):
+            digest.update(chunk)
+            dst.write(chunk)
+    return digest.hexdigest()
+
 
 def get_free_space(folder):
     """ Return folder/drive free space (in bytes)
@@ -0,0 +1,97 @@
+##################################################################
+# Copyright 2018 Open Source Geospatial Foundation and others    #
+# licensed under MIT, Please consult LICENSE.txt for details     #
+##################################################################
+
+import logging
+import os
+import uuid
+from timeit import default_timer
+from pywps._compat import urljoin
+from pywps import configuration as config
+from pywps.exceptions import NoApplicableCode
+from . import StorageAbstract, STORE_TYPE
+
+LOGGER = logging.getLogger('PYWPS')
+
+
+class S3Storage(StorageAbstract):
+    """Storage of outputs in S3 compatible object store (AWS S3, MinIO, Ceph)
+
+    Outputs are streamed from the working directory as multipart uploads of
+    ``[s3] part_size`` parts, ``[s3] max_concurrency`` parts being uploaded
+    in parallel. The object key is ``<prefix><uuid>/<file name>``. Requires
+    the ``boto3`` package.
+    """
+
+    def __init__(self):
+        try:
+            import boto3
+            from boto3.s3.transfer import TransferConfig
+        except ImportError:
+            raise NoApplicableCode('S3 storage requires the boto3 package')
+
+        self.bucket = config.get_config_value('s3', 'bucket')
+        if not self.bucket:
+            raise NoApplicableCode('S3 bucket is not configured')
+        self.prefix = config.get_config_value('s3', 'prefix')
+        self.public_url = config.get_config_value('s3', 'public_url')
+        self.url_expiration = int(config.get_config_value('s3', 'url_expiration') or 0)
+
+        part_size = int(config.get_size_mb(config.get_config_value('s3', 'part_size') or '8mb') * 1024 * 1024)
+        self.transfer_config = TransferConfig(
+            multipart_threshold=part_size,
+            multipart_chunksize=part_size,
+            max_concurrency=int(config.get_config_value('s3', 'max_concurrency') or 4),
+            use_threads=True)
+
+        self.client = boto3.client(
+            's3',
+            endpoint_url=config.get_config_value('s3', 'endpoint_url') or None,
+            region_name=config.get_config_value('s3', 'region') or None,
+            # credentials default to the environment and the boto3 configuration
+            aws_access_key_id=config.get_config_value('s3', 'access_key_id') or None,
+            aws_secret_access_key=config.get_config_value('s3', 'secret_access_key') or None)
+
+        # results by (file, size, modification time), the output is stored
+        # again, when the response is updated
+        self._stored = {}
+
+    def store(self, output):
+        stat = os.stat(output.file)
+        file_key = (output.file, stat.st_size, stat.st_mtime)
+        if file_key in self._stored:
+            return self._stored[file_key]
+
+        request_uuid = output.uuid or uuid.uuid1()
+        file_name = os.path.basename(output.file)
+        key = '{}{}/{}'.format(self.prefix, request_uuid, file_name)
+
+        extra_args = {}
+        data_format = getattr(output, 'data_format', None)
+        if data_format and data_format.mime_type:
+            extra_args['ContentType'] = data_format.mime_type
+
+        start = default_timer()
+        try:
+            self.client.upload_file(output.file, self.bucket, key, ExtraArgs=extra_args,
+                                    Config=self.transfer_config)
+        except Exception as e:
+            raise NoApplicableCode('Storing output {} to S3 failed: {}'.format(file_name, e))
+        LOGGER.info('Uploaded %s to s3://%s/%s in %.2f s', output.file, self.bucket, key, default_timer() - start)
+
+        self._stored[file_key] = (STORE_TYPE.S3, key, self.get_url(key))
+        return self._stored[file_key]
+
+    def get_url(self, key):
+        """Return URL of stored object
+
+        Objects are referred under ``[s3] public_url``, if configured,
+        otherwise presigned URLs valid for ``[s3] url_expiration`` seconds
+        are returned.
+        """
+
+        if self.public_url:
+            return urljoin(self.public_url.rstrip('/') + '/', key)
+        return self.client.generate_presigned_url(
+            'get_object', Params={'Bucket': self.bucket, 'Key': key}, ExpiresIn=self.url_expiration)
@@ -0,0 +1,310 @@
+##################################################################
+# Copyright 2018 Open Source Geospatial Foundation and others    #
+# licensed under MIT, Please consult LICENSE.txt for details     #
+##################################################################
+
+"""
+Retention of outputs of PyWPS-4
+
+Removes ``outputpath/<uuid>/`` output directories and ``<uuid>.xml`` status
+documents (and their compressed variants) of finished requests older than
+``[retention] max_age`` and, oldest first, those exceeding the
+``[retention] max_size`` quota. Working directories of crashed processes
+(``pywps_process_*`` in ``[server] workdir``) are removed after
+``[retention] workdir_max_age``. Outputs and working directories of requests
+running or accepted according to the request log are kept.
+
+The sweep runs either from the ``pywps-janitor`` command line tool, or in a
+thread of the :class:`pywps.Service`, if ``[retention] interval`` is set.
+"""
+
+import logging
+import os
+import shutil
+import threading
+import time
+import uuid
+from collections import namedtuple
+
+from pywps import compression
+from pywps import configuration as config
+from pywps import dblog
+from pywps.inout.storage.file import remove_unreferenced_blobs
+
+try:
+    from os import scandir
+except ImportError:
+    # Python 2
+    try:
+        from scandir import scandir
+    except ImportError:
+        scandir = None
+
+LOGGER = logging.getLogger('PYWPS')
+
+WORKDIR_PREFIX = 'pywps_process_'
+
+_THREAD = None
+
+Job = namedtuple('Job', 'uuid, time, paths')
+
+
+def sweep(max_age=None, max_size=None, workdir_max_age=None, dry_run=False):
+    """Remove old outputs, status documents and working directories
+
+    Parameters not given are taken from the ``[retention]`` configuration
+    section, ``0`` disables given limit.
+
+    :param float max_age: maximal age of request outputs in hours
+    :param max_size: maximal total size of outputs (e.g. ``10gb``)
+    :param float workdir_max_age: maximal age of working directories in hours
+    :param bool dry_run: only report, what would be removed
+    :returns: dictionary with numbers of removed ``requests``,
+              ``workdirs``, ``blobs`` and ``freed`` bytes
+    """
+
+    if max_age is None:
+        max_age = float(config.get_config_value('retention', 'max_age') or 0)
+    if max_size is None:
+        max_size = config.get_config_value('retention', 'max_size') or '0'
+    if workdir_max_age is None:
+        workdir_max_age = float(config.get_config_value('retention', 'workdir_max_age') or 0)
+    max_bytes = config.get_size_mb(str(max_size)) * 1024 * 1024
+
+    now = time.time()
+    outputpath = config.get_config_value('server', 'outputpath')
+    result = {'requests': 0, 'workdirs': 0, 'blobs': 0, 'freed': 0}
+
+    (finished, running) = _get_request_times()
+    jobs = _get_jobs(outputpath, finished, running)
+    # oldest first
+    jobs.sort(key=lambda job: job.time)
+
+    sizes = {}
+    if max_bytes > 0:
+        for job in jobs:
+            sizes[job.uuid] = sum(_size(path) for path in job.paths)
+    total = sum(sizes.values())
+
+    for job in jobs:
+        expired = max_age > 0 and job.time < now - max_age * 3600
+        over_quota = max_bytes > 0 and total > max_bytes
+        if not (expired or over_quota):
+            # the rest is younger and fits the quota
+            break
+        LOGGER.info('Removing outputs of request %s (%s)', job.uuid, 'expired' if expired else 'over quota')
+        if max_bytes > 0:
+            freed = sizes[job.uuid]
+        else:
+            freed = sum(_size(path) for path in job.paths)
+        if not dry_run:
+            for path in job.paths:
+                _remove(path)
+        total -= freed
+        result['requests'] += 1
+        result['freed'] += freed
+
+    if workdir_max_age > 0:
+        workdir = config.get_config_value('server', 'workdir')
+        for path in _get_stale_workdirs(workdir, now - workdir_max_age * 3600, running):
+            LOGGER.info('Removing abandoned working directory %s', path)
+            result['freed'] += _size(path)
+            if not dry_run:
+                _remove(path)
+            result['workdirs'] += 1
+
+    if not dry_run:
+        result['blobs'] = remove_unreferenced_blobs(outputpath)
+
+    LOGGER.info('Retention sweep finished: %s', result)
+    return result
+
+
+def _get_request_times():
+    """Return times of finished requests and uuids of running requests from
+    the request log, nothing if it cannot be read
+    """
+
+    try:
+        return dblog.get_request_times()
+    except Exception as e:
+        LOGGER.warning('Could not read the request log: %s', e)
+        return ({}, set())
+
+
+def _get_jobs(outputpath, finished, running):
+    """Return finished requests having outputs or status document in
+    outputpath
+
+    The time of the request is taken from the request log, the modification
+    time of the entries is used for requests not found in the log. Only the
+    top level of outputpath is listed.
+    """
+
+    paths = {}
+    mtimes = {}
+    for entry in _scandir(outputpath):
+        (name, ext) = os.path.splitext(entry.name)
+        if ext in compression.EXTENSIONS.values():
+            # compressed variant of the status document
+            (name, ext) = os.path.splitext(name)
+        if entry.is_dir():
+            if ext:
+                continue
+        elif ext != '.xml':
+            continue
+        if not _is_uuid(name):
+            # not a PyWPS output, outputpath can be shared
+            continue
+        paths.setdefault(name, []).append(entry.path)
+        mtimes[name] = max(mtimes.get(name, 0), entry.stat().st_mtime)
+
+    jobs = []
+    for (name, job_paths) in paths.items():
+        if name in running:
+            continue
+        job_time = mtimes[name]
+        if name in finished:
+            job_time = time.mktime(finished[name].timetuple())
+        jobs.append(Job(name, job_time, job_paths))
+    return jobs
+
+
+def _get_stale_workdirs(workdir, threshold, running=()):
+    """Return working directories of processes not modified since threshold
+
+    Directories are named ``pywps_process_<uuid>_*`` after their request,
+    those of ``running`` requests are not returned.
+    """
+
+    stale = []
+    for entry in _scandir(workdir):
+        if not entry.name.startswith(WORKDIR_PREFIX) or not entry.is_dir():
+            continue
+        if entry.name[len(WORKDIR_PREFIX):].split('_')[0] in running:
+            continue
+        # files written by running process update only the first level
+        mtime = entry.stat().st_mtime
+        for child in _scandir(entry.path):
+            mtime = max(mtime, child.stat(follow_symlinks=False).st_mtime)
+        if mtime < threshold:
+            stale.append(entry.path)
+    return stale
+
+
+def _is_uuid(name):
+    try:
+        uuid.UUID(name)
+    except ValueError:
+        return False
+    return True
+
+
+def _size(path):
+    """Return size of file or directory tree in bytes
+    """
+
+    if not os.path.isdir(path) or os.path.islink(path):
+        return os.lstat(path).st_size
+
+    size = 0
+    for entry in _scandir(path):
+        if entry.is_dir(follow_symlinks=False):
+            size += _size(entry.path)
+        else:
+            size += entry.stat(follow_symlinks=False).st_size
+    return size
+
+
+def _remove(path):
+    try:
+        if os.path.isdir(path) and not os.path.islink(path):
+            shutil.rmtree(path)
+        else:
+            os.remove(path)
+    except OSError as e:
+        LOGGER.warning('Could not remove %s: %s', path, e)
+
+
+def _scandir(path):
+    """Return directory entries of path, nothing if it does not exist
+    """
+
+    if not os.path.isdir(path):
+        return []
+    if scandir is not None:
+        return list(scandir(path))
+    return [_DirEntry(path, name) for name in os.listdir(path)]
+
+
+class _DirEntry(object):
+    """Minimal :func:`os.scandir` entry for Python 2 without the scandir
+    package
+    """
+
+    def __init__(self, directory, name):
+        self.name = name
+        self.path = os.path.join(directory, name)
+
+    def is_dir(self, follow_symlinks=True):
+        if not follow_symlinks and os.path.islink(self.path):
+            return False
+        return os.path.isdir(self.path)
+
+    def stat(self, follow_symlinks=True):
+        if follow_symlinks:
+            return os.stat(self.path)
+        return os.lstat(self.path)
+
+
+def start(interval=None):
+    """Start sweeping thread, if ``[retention] interval`` (in minutes) is set
+
+    Only one thread is started per process.
+    """
+
+    global _THREAD
+
+    if interval is None:
+        interval = float(config.get_config_value('retention', 'interval') or 0)
+    if interval <= 0 or (_THREAD is not None and _THREAD.is_alive()):
+        return _THREAD
+
+    def run():
+        while True:
+            time.sleep(interval * 60)
+            try:
+                sweep()
+            except Exception as e:
+                LOGGER.error('Retention sweep failed: %s', e)
+
+    _THREAD = threading.Thread(target=run, name='pywps-janitor')
+    _THREAD.daemon = True
+    _THREAD.start()
+    LOGGER.info('Retention sweep started, running every %s minutes', interval)
+    return _THREAD
+
+
+def main(argv=None):
+    """Run retention sweep from command line
+    """
+
+    import argparse
+    parser = argparse.ArgumentParser(prog='pywps-janitor',
+                                     description='Remove old outputs and working directories of PyWPS')
+    parser.add_argument('-c', '--config', help='Path to pywps configuration.')
+    parser.add_argument('--max-age', type=float, help='maximal age of outputs in hours')
+    parser.add_argument('--max-size', help='maximal total size of outputs, e.g. 10gb')
+    parser.add_argument('--workdir-max-age', type=float, help='maximal age of working directories in hours')
+    parser.add_argument('-n', '--dry-run', action='store_true', help='only report what would be removed')
+    args = parser.parse_args(argv)
+
+    if args.config:
+        config.load_configuration(args.config)
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+
+    result = sweep(max_age=args.max_age, max_size=args.max_size,
+                   workdir_max_age=args.workdir_max_age, dry_run=args.dry_run)
+    print('{} {} requests, {} working directories, {} blobs, {} bytes'.format(
+        'Would remove' if args.dry_run else 'Removed',
+        result['requests'], result['workdirs'], result['blobs'], result['freed']))
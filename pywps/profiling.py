@@ -0,0 +1,293 @@
+##################################################################
+# Copyright 2018 Open Source Geospatial Foundation and others    #
+# licensed under MIT, Please consult LICENSE.txt for details     #
+##################################################################
+
+"""
+Per-request profiling of PyWPS-4
+
+Duration of each request phase (request parsing, input creation, reference
+fetching, validation, queueing, handler run, output storage, response
+serialization) of Execute requests is measured and stored in the logging
+database.
+
+Selected requests have their phases additionally wrapped in :mod:`cProfile`
+and optionally :mod:`tracemalloc`. Results are written as ``<phase>.pstats``
+and ``<phase>.tracemalloc`` files, see the ``[profiling]`` configuration
+section.
+"""
+
+import cProfile
+import datetime
+import logging
+import os
+import shutil
+import threading
+import zlib
+from collections import OrderedDict
+from contextlib import contextmanager
+from timeit import default_timer
+
+from pywps import configuration as config
+from pywps import dblog
+
+try:
+    import tracemalloc
+except ImportError:
+    # not available on Python 2
+    tracemalloc = None
+
+LOGGER = logging.getLogger('PYWPS')
+
+_TRUE_VALUES = ('1', 'true', 'yes', 'on')
+
+# profilers of requests being handled by this process, by request uuid
+_PROFILERS = {}
+
+
+class Profiler(object):
+    """Profiler of one request
+
+    Durations of the phases are collected in :attr:`timings`, as
+    ``phase: (time_start, duration, count)``, and stored in the logging
+    database, once the profiler is closed. Only timings of Execute requests
+    (with a process identifier) are stored, other requests are not slowed
+    down by writing to the database.
+
+    :param uuid: request identifier
+    :param bool enabled: profile the phases of this request
+    """
+
+    def __init__(self, uuid, enabled=False):
+        self.uuid = uuid
+        self.enabled = enabled
+        self.execute = False
+        self.tracemalloc = config.get_config_value('profiling', 'tracemalloc') is True
+        self.timings = OrderedDict()
+        self.pid = os.getpid()
+        self._running = False
+        self._users = 0
+        self._lock = threading.Lock()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def select(self, identifier=None, headers=None):
+        """Enable profiling, if the request is selected for it
+
+        Requests of a process ``identifier`` are Execute requests, their
+        timings are stored.
+        """
+
+        if identifier:
+            self.execute = True
+        if not self.enabled:
+            self.enabled = _is_selected(self.uuid, identifier, headers)
+
+    def close(self):
+        """Release the profiler and store collected timings, once the last
+        user of the profiler releases it
+        """
+
+        self._users -= 1
+        if self._users > 0:
+            return
+
+        if _PROFILERS.get(str(self.uuid)) is self:
+            del _PROFILERS[str(self.uuid)]
+
+        if self.timings and self.execute:
+            try:
+                dblog.store_timings(self.uuid, self.timings)
+            except Exception as e:
+                LOGGER.warning('Could not store phase timings: %s', e)
+            self.timings = OrderedDict()
+
+    @property
+    def directory(self):
+        """Directory where the profiles of this request are stored
+        """
+        return os.path.join(_get_path(), str(self.uuid))
+
+    @contextmanager
+    def phase(self, name):
+        """Measure and profile the code running within the context
+
+        Phases can be nested and repeated, durations of repeated phases are
+        summed up. Phases nested in an already profiled phase are not profiled
+        on their own, they are part of the outer phase profile.
+
+        :param str name: name of the phase, used as file name
+        """
+
+        time_start = datetime.datetime.now()
+        start = default_timer()
+        try:
+            if not self.enabled or self._running:
+                yield
+            else:
+                with self._profile(name):
+                    yield
+        finally:
+            self._add_timing(name, time_start, default_timer() - start)
+
+    def _add_timing(self, name, time_start, duration):
+        with self._lock:
+            if name in self.timings:
+                (time_start, total, count) = self.timings[name]
+                self.timings[name] = (time_start, total + duration, count + 1)
+            else:
+                self.timings[name] = (time_start, duration, 1)
+
+    @contextmanager
+    def _profile(self, name):
+        """Profile the code running within the context
+        """
+
+        self._running = True
+        trace = self.tracemalloc and tracemalloc is not None
+        started_tracing = trace and not tracemalloc.is_tracing()
+        if started_tracing:
+            tracemalloc.start()
+        profile = cProfile.Profile()
+        profile.enable()
+        try:
+            yield
+        finally:
+            profile.disable()
+            snapshot = None
+            if trace:
+                snapshot = tracemalloc.take_snapshot()
+                if started_tracing:
+                    tracemalloc.stop()
+            self._running = False
+            try:
+                self._dump(name, profile, snapshot)
+            except Exception as e:
+                LOGGER.warning('Could not write profile of %s phase: %s', name, e)
+
+    def _dump(self, name, profile, snapshot=None):
+        """Write profile statistics and allocation snapshot of given phase
+        """
+
+        directory = self.directory
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+
+        stats_file = os.path.join(directory, '{}.pstats'.format(name))
+        profile.dump_stats(stats_file)
+        LOGGER.info('Profile of %s phase written to %s', name, stats_file)
+
+        if snapshot is not None:
+            snapshot_file = os.path.join(directory, '{}.tracemalloc'.format(name))
+            snapshot.dump(snapshot_file)
+            LOGGER.info('Allocation snapshot of %s phase written to %s', name, snapshot_file)
+
+        _apply_retention(_get_path())
+
+
+def get_profiler(uuid, identifier=None, headers=None):
+    """Return profiler for given request
+
+    The profiler of the request is shared within one process, each call has
+    to be paired with :meth:`Profiler.close` (or used as context manager).
+
+    The request is profiled if profiling is enabled and either the
+    configured header is set, the process ``identifier`` is listed in
+    ``[profiling] processes`` or the request is sampled.
+
+    :param uuid: request identifier
+    :param str identifier: process identifier, if known
+    :param headers: HTTP request headers, if available
+    :rtype: :class:`Profiler`
+    """
+
+    profiler = _PROFILERS.get(str(uuid))
+    if profiler is None or profiler.pid != os.getpid():
+        # new request or a request inherited from the parent process
+        profiler = Profiler(uuid)
+        _PROFILERS[str(uuid)] = profiler
+    profiler.select(identifier, headers)
+    profiler._users += 1
+    return profiler
+
+
+def phase(uuid, name):
+    """Return context measuring given phase of request ``uuid``
+
+    Nothing is measured, if there is no profiler for the request in this
+    process.
+    """
+
+    profiler = _PROFILERS.get(str(uuid))
+    if profiler is None or profiler.pid != os.getpid():
+        return _no_phase()
+    return profiler.phase(name)
+
+
+@contextmanager
+def _no_phase():
+    yield
+
+
+def _get_path():
+    """Return directory of request profiles
+
+    Profiles contain source paths of the server, so they are never stored in
+    the ``outputpath`` served to the clients, but in the working directory,
+    unless ``[profiling] path`` is configured.
+    """
+
+    path = config.get_config_value('profiling', 'path')
+    if not path:
+        path = os.path.join(config.get_config_value('server', 'workdir'), 'pywps_profiles')
+    return path
+
+
+def _is_selected(uuid, identifier=None, headers=None):
+    """Decide, whether given request is to be profiled
+
+    Sampling is based on the request uuid, so all phases of a request (also
+    those running in another process) get the same decision.
+    """
+
+    if config.get_config_value('profiling', 'enabled') is not True:
+        return False
+
+    header = config.get_config_value('profiling', 'header')
+    if header and headers is not None:
+        if str(headers.get(header, '')).lower() in _TRUE_VALUES:
+            return True
+
+    if identifier:
+        processes = config.get_config_value('profiling', 'processes')
+        if identifier in [p.strip() for p in processes.split(',')]:
+            return True
+
+    sample_rate = float(config.get_config_value('profiling', 'sample_rate') or 0)
+    if sample_rate <= 0:
+        return False
+    bucket = (zlib.crc32(str(uuid).encode('utf-8')) & 0xffffffff) % 10000
+    return bucket < sample_rate * 10000
+
+
+def _apply_retention(path):
+    """Remove the oldest request profiles, keeping ``[profiling] maxprofiles``
+    """
+
+    maxprofiles = int(config.get_config_value('profiling', 'maxprofiles') or 0)
+    if maxprofiles <= 0:
+        return
+
+    profiles = [os.path.join(path, name) for name in os.listdir(path)]
+    profiles = [p for p in profiles if os.path.isdir(p)]
+    if len(profiles) <= maxprofiles:
+        return
+
+    profiles.sort(key=os.path.getmtime)
+    for directory in profiles[:len(profiles) - maxprofiles]:
+        LOGGER.debug('Removing old profile %s', directory)
+        shutil.rmtree(directory, ignore_errors=True)
@@ -7,13 +7,15 @@ import logging
 import os
 from lxml import etree
 import time
+from multiprocessing.pool import ThreadPool
 from werkzeug.wrappers import Request
 from werkzeug.exceptions import HTTPException
-from pywps import WPS, OWS
+from pywps import WPS, OWS, compression, profiling
 from pywps.app.basic import xml_response
 from pywps.exceptions import NoApplicableCode
 import pywps.configuration as config
 from pywps.dblog import update_response
+from pywps.inout.outputs import ComplexOutput
 
 from pywps.response.status import STATUS
 from pywps.response import WPSResponse
@@ -79,6 +81,16 @@ class ExecuteResponse(WPSResponse):
                     f.flush()
                     os.fsync(f.fileno())
 
+                if self.status >= STATUS.DONE_STATUS:
+                    # final document does not change any more, clients
+                    # accepting it get the compressed variant
+                    try:
+                        compression.compress_file(self.process.status_location,
+                                                  compression.get_policy('text/xml'),
+                                                  keep_original=True)
+                    except (IOError, OSError) as e:
+                        LOGGER.warning('Compressing of the response document failed: %s', e)
+
                 if self.status >= STATUS.DONE_STATUS and clean:
                     self.process.clean()
 
@@ -199,22 +211,53 @@ class ExecuteResponse(WPSResponse):
                 output_definitions = [self.outputs[o].execute_xml_lineage() for o in self.outputs]
                 doc.append(WPS.OutputDefinitions(*output_definitions))
 
+            self._store_outputs()
+
             # Process outputs XML
             output_elements = [self.outputs[o].execute_xml() for o in self.outputs]
             doc.append(WPS.ProcessOutputs(*output_elements))
         return doc
 
+    def _store_outputs(self):
+        """Store reference outputs not stored yet, ``[server] store_workers``
+        outputs in parallel
+        """
+
+        outputs = [output for output in self.outputs.values()
+                   if isinstance(output, ComplexOutput) and output.as_reference and output.url is None]
+        if not outputs:
+            return
+
+        workers = min(len(outputs), int(config.get_config_value('server', 'store_workers') or 1))
+        with profiling.phase(self.uuid, 'store'):
+            if workers <= 1:
+                for output in outputs:
+                    output.store()
+                return
+
+            pool = ThreadPool(workers)
+            try:
+                pool.map(lambda output: output.store(), outputs)
+            finally:
+                pool.close()
+                pool.join()
+
     @Request.application
     def __call__(self, request):
-        doc = None
-        try:
-            doc = self._construct_doc()
-        except HTTPException as httpexp:
-            raise httpexp
-        except Exception as exp:
-            raise NoApplicableCode(exp)
-
-        if self.status >= STATUS.DONE_STATUS:
-            self.process.clean()
-
-        return xml_response(doc)
+        with profiling.get_profiler(self.uuid, self.process.identifier, request.headers) as profiler:
+            doc = None
+            try:
+                if self.status == STATUS.DONE_STATUS:
+                    # outputs are stored before, not within the serialize phase
+                    self._store_outputs()
+                with profiler.phase('serialize'):
+                    doc = self._construct_doc()
+            except HTTPException as httpexp:
+                raise httpexp
+            except Exception as exp:
+                raise NoApplicableCode(exp)
+
+            if self.status >= STATUS.DONE_STATUS:
+                self.process.clean()
+
+            return xml_response(doc)
@@ -0,0 +1,207 @@
+##################################################################
+# Copyright 2018 Open Source Geospatial Foundation and others    #
+# licensed under MIT, Please consult LICENSE.txt for details     #
+##################################################################
+
+"""Catalog of XML schemas used for validation of XML inputs
+
+Schemas are looked up by their URL in local directories, where they are
+stored as ``<host>/<path>``, e.g. ``schemas.opengis.net/gml/3.1.1/base/gml.xsd``.
+The ``[schemas] catalog`` directories are searched first, then the schemas
+bundled with PyWPS and the ``[schemas] cache_path`` directory, where
+downloaded schemas are stored. Schemas imported or included by other
+schemas are resolved the same way.
+
+Compiled schemas are kept in memory, ``[schemas] max_schemas`` least
+recently used ones.
+"""
+
+import logging
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+
+from lxml import etree
+
+from pywps import configuration as config
+from pywps._compat import urlparse, urlopen
+
+LOGGER = logging.getLogger('PYWPS')
+
+# compiled schemas by URL, least recently used first
+_SCHEMAS = OrderedDict()
+
+_LOCK = threading.Lock()
+
+
+def get_catalog_dirs():
+    """Return directories of local schema copies, in order of precedence
+    """
+
+    dirs = [path for path in config.get_config_value('schemas', 'catalog').split(':') if path]
+    dirs.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.path.pardir, 'schemas'))
+    cache_path = config.get_config_value('schemas', 'cache_path')
+    if cache_path:
+        dirs.append(cache_path)
+    return dirs
+
+
+def _catalog_path(directory, url):
+    """Return path of the schema in the catalog directory, ``None`` for
+    URLs pointing out of it
+    """
+
+    parsed = urlparse(url)
+    path = os.path.normpath(os.path.join(directory, parsed.netloc, parsed.path.lstrip('/')))
+    if not path.startswith(os.path.join(os.path.normpath(directory), '')):
+        return None
+    return path
+
+
+def find_schema(url):
+    """Return path of local copy of the schema, downloaded into the
+    ``[schemas] cache_path`` directory if needed and allowed by
+    ``[schemas] download``
+
+    :param str url: URL of the schema
+    :returns: path or ``None``, if there is no local copy
+    """
+
+    parsed = urlparse(url)
+    if parsed.scheme in ('', 'file'):
+        return parsed.path if os.path.isfile(parsed.path) else None
+
+    for directory in get_catalog_dirs():
+        path = _catalog_path(directory, url)
+        if path and os.path.isfile(path):
+            return path
+
+    cache_path = config.get_config_value('schemas', 'cache_path')
+    if cache_path and config.get_config_value('schemas', 'download'):
+        return _download(url, cache_path)
+    return None
+
+
+def _download(url, cache_path):
+    """Download schema into the cache directory
+    """
+
+    path = _catalog_path(cache_path, url)
+    if path is None:
+        return None
+
+    LOGGER.info('Downloading schema %s', url)
+    try:
+        data = urlopen(url, timeout=30).read()
+    except Exception as e:
+        LOGGER.warning('Downloading schema %s failed: %s', url, e)
+        return None
+
+    directory = os.path.dirname(path)
+    if not os.path.isdir(directory):
+        try:
+            os.makedirs(directory)
+        except OSError:
+            # created by another process meanwhile
+            if not os.path.isdir(directory):
+                raise
+
+    # schema appears in the cache complete
+    (handle, temp_path) = tempfile.mkstemp(dir=directory, prefix='.')
+    with os.fdopen(handle, 'wb') as f:
+        f.write(data)
+    os.rename(temp_path, path)
+    return path
+
+
+class CatalogResolver(etree.Resolver):
+    """Resolver of imported and included schemas using the catalog
+
+    Local copies are read under their original URL, so that their relative
+    imports and includes are resolved by the catalog as well.
+    """
+
+    def resolve(self, url, pubid, context):
+        if urlparse(url).scheme in ('', 'file'):
+            return None
+        path = find_schema(url)
+        if path is None:
+            # lxml does not access network itself
+            return None
+        # base URL of files is not kept by some lxml versions
+        with open(path, 'rb') as f:
+            return self.resolve_string(f.read(), context, base_url=url)
+
+
+def get_schema(url):
+    """Return compiled schema of given URL
+
+    :param str url: URL or path of the schema
+    :rtype: :class:`lxml.etree.XMLSchema`
+    """
+
+    with _LOCK:
+        schema = _SCHEMAS.pop(url, None)
+        if schema is not None:
+            _SCHEMAS[url] = schema
+            return schema
+
+    path = find_schema(url)
+    if path is None:
+        raise IOError('Schema {} not found in the catalog'.format(url))
+
+    parser = etree.XMLParser()
+    parser.resolvers.add(CatalogResolver())
+    with open(path, 'rb') as f:
+        schema = etree.XMLSchema(etree.parse(f, parser, base_url=url))
+
+    max_schemas = int(config.get_config_value('schemas', 'max_schemas') or 0)
+    with _LOCK:
+        _SCHEMAS[url] = schema
+        while len(_SCHEMAS) > max(max_schemas, 1):
+            _SCHEMAS.popitem(last=False)
+    return schema
+
+
+def clear_schemas():
+    """Remove compiled schemas from memory
+    """
+
+    with _LOCK:
+        _SCHEMAS.clear()
+
+
+def validate(file_name, schema, budget=None):
+    """Validate XML file against schema, while it is parsed
+
+    Parsed elements are released, so large documents are validated in
+    bounded memory. The validation stops at the first error.
+
+    :param str file_name: XML file
+    :param schema: :class:`lxml.etree.XMLSchema`
+    :param budget: :class:`pywps.validator.sampling.ValidationBudget`, only
+                   the first members of the root element (e.g. features)
+                   are validated, until the budget is exhausted
+    :returns: ``True`` if the file is valid
+    """
+
+    members = 0
+    try:
+        with open(file_name, 'rb') as f:
+            for (event, element) in etree.iterparse(f, events=('end',), schema=schema):
+                element.clear()
+                parent = element.getparent()
+                if parent is not None:
+                    while element.getprevious() is not None:
+                        del parent[0]
+                    if parent.getparent() is None:
+                        members += 1
+                        if budget is not None and budget.exhausted(f.tell(), features=members):
+                            break
+    except etree.XMLSyntaxError as e:
+        LOGGER.info('XML not valid: %s', e)
+        return False
+    if budget is not None:
+        budget.log('{} members'.format(members))
+    return True
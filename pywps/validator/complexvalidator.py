@@ -9,13 +9,39 @@
 
 import logging
 
+from pywps._compat import PY2
 from pywps.validator.mode import MODE
+from pywps.validator.sampling import ValidationBudget
 from pywps.inout.formats import FORMATS
 import mimetypes
 import os
+import threading
+from collections import namedtuple
 
 LOGGER = logging.getLogger('PYWPS')
 
+GEOJSON_SCHEMA_URL = 'http://json-schema.org/geojson/'
+
+# GeoJSON schema documents, loaded once per process
+_GEOJSON_SCHEMAS = {}
+
+# registry of the GeoJSON schemas for jsonschema 4.18 and newer, False for
+# older versions, once known
+_GEOJSON_REGISTRY = None
+
+# compiled GeoJSON validators by definition, shared by the threads
+_GEOJSON_VALIDATORS = {}
+
+# compiled GeoJSON validators of each thread for jsonschema older than 4.18,
+# their resolvers are not thread safe
+_LEGACY_GEOJSON_VALIDATORS = threading.local()
+
+_LOCK = threading.RLock()
+
+# metadata of the input data found by the validators, extent is
+# (minx, miny, maxx, maxy), size is (width, height) of raster in pixels
+Probe = namedtuple('Probe', ['driver', 'layers', 'features', 'extent', 'size', 'bands', 'crs'])
+
 
 def validategml(data_input, mode):
     """GML validation function
@@ -34,7 +60,9 @@ def validategml(data_input, mode):
         `GDAL/OGR <http://gdal.org/>`_ is used for getting the propper format.
     `MODE.VERYSTRICT`
         the :class:`lxml.etree` is used along with given input `schema` and the
-        GML file is properly validated against given schema.
+        GML file is properly validated against given schema. Schemas are
+        resolved by :mod:`pywps.validator.catalog`. Features of large files
+        are sampled according to :mod:`pywps.validator.sampling`.
     """
 
     LOGGER.info('validating GML; Mode: %s', mode)
@@ -45,8 +73,7 @@ def validategml(data_input, mode):
 
     if mode >= MODE.SIMPLE:
 
-        name = data_input.file
-        (mtype, encoding) = mimetypes.guess_type(name, strict=False)
+        mtype = _get_mime_type(data_input)
         passed = data_input.data_format.mime_type in {mtype, FORMATS.GML.mime_type}
 
     if mode >= MODE.STRICT:
@@ -55,24 +82,18 @@ def validategml(data_input, mode):
         data_source = ogr.Open(data_input.file)
         if data_source:
             passed = (data_source.GetDriver().GetName() == "GML")
+            if passed:
+                _keep_dataset(data_input, data_source, probe_vector)
         else:
             passed = False
 
     if mode >= MODE.VERYSTRICT:
 
-        from lxml import etree
-
-        from pywps._compat import PY2
-        if PY2:
-            from urllib2 import urlopen
-        else:
-            from urllib.request import urlopen
+        from pywps.validator import catalog
 
         try:
-            schema_url = data_input.data_format.schema
-            gmlschema_doc = etree.parse(urlopen(schema_url))
-            gmlschema = etree.XMLSchema(gmlschema_doc)
-            passed = gmlschema.validate(etree.parse(data_input.stream))
+            gmlschema = catalog.get_schema(data_input.data_format.schema)
+            passed = catalog.validate(data_input.file, gmlschema, ValidationBudget(data_input.file))
         except Exception as e:
             LOGGER.warning(e)
             passed = False
@@ -105,8 +126,7 @@ def validategeojson(data_input, mode):
 
     if mode >= MODE.SIMPLE:
 
-        name = data_input.file
-        (mtype, encoding) = mimetypes.guess_type(name, strict=False)
+        mtype = _get_mime_type(data_input)
         passed = data_input.data_format.mime_type in {mtype, FORMATS.GEOJSON.mime_type}
 
     if mode >= MODE.STRICT:
@@ -115,54 +135,241 @@ def validategeojson(data_input, mode):
         data_source = ogr.Open(data_input.file)
         if data_source:
             passed = (data_source.GetDriver().GetName() == "GeoJSON")
+            if passed:
+                _keep_dataset(data_input, data_source, probe_vector)
         else:
             passed = False
 
     if mode >= MODE.VERYSTRICT:
 
-        import jsonschema
-        import json
+        passed = _validate_geojson_schema(data_input.file)
 
-        # this code comes from
-        # https://github.com/om-henners/GeoJSON_Validation/blob/master/geojsonvalidation/geojson_validation.py
-        schema_home = os.path.join(_get_schemas_home(), "geojson")
-        base_schema = os.path.join(schema_home, "geojson.json")
+    return passed
 
-        with open(base_schema) as fh:
-            geojson_base = json.load(fh)
 
-        with open(os.path.join(schema_home, "crs.json")) as fh:
-            crs_json = json.load(fh)
+def _get_mime_type(data_input):
+    """Return mime type of the input data, detected once per input by
+    :class:`pywps.inout.basic.IOHandler`, or guessed from the file name
+    """
 
-        with open(os.path.join(schema_home, "bbox.json")) as fh:
-            bbox_json = json.load(fh)
+    content_info = getattr(data_input, 'content_info', None)
+    if content_info is not None:
+        return content_info.mime_type
+    (mtype, encoding) = mimetypes.guess_type(data_input.file, strict=False)
+    return mtype
 
-        with open(os.path.join(schema_home, "geometry.json")) as fh:
-            geometry_json = json.load(fh)
 
-        cached_json = {
-            "http://json-schema.org/geojson/crs.json": crs_json,
-            "http://json-schema.org/geojson/bbox.json": bbox_json,
-            "http://json-schema.org/geojson/geometry.json": geometry_json
-        }
+def _get_geojson_schemas():
+    """Return GeoJSON schema documents by their URL
+    """
 
-        resolver = jsonschema.RefResolver(
-            "http://json-schema.org/geojson/geojson.json",
-            geojson_base, store=cached_json)
+    import json
 
-        validator = jsonschema.Draft4Validator(geojson_base, resolver=resolver)
-        try:
-            validator.validate(json.loads(data_input.stream.read()))
-            passed = True
-        except jsonschema.ValidationError:
-            passed = False
+    with _LOCK:
+        if not _GEOJSON_SCHEMAS:
+            # this code comes from
+            # https://github.com/om-henners/GeoJSON_Validation/blob/master/geojsonvalidation/geojson_validation.py
+            schema_home = os.path.join(_get_schemas_home(), "geojson")
+            for name in ["geojson.json", "crs.json", "bbox.json", "geometry.json"]:
+                with open(os.path.join(schema_home, name)) as fh:
+                    _GEOJSON_SCHEMAS[GEOJSON_SCHEMA_URL + name] = json.load(fh)
+    return _GEOJSON_SCHEMAS
 
-    return passed
+
+def _get_geojson_registry():
+    """Return :mod:`referencing` registry of the GeoJSON schemas, ``None``
+    if jsonschema resolves references by the legacy ``RefResolver``
+    (jsonschema older than 4.18)
+    """
+
+    import jsonschema
+
+    global _GEOJSON_REGISTRY
+
+    with _LOCK:
+        if _GEOJSON_REGISTRY is None:
+            _GEOJSON_REGISTRY = False
+            try:
+                import referencing
+                import referencing.jsonschema
+            except ImportError:
+                referencing = None
+            if referencing is not None:
+                registry = referencing.Registry().with_resources(
+                    (url, referencing.jsonschema.DRAFT4.create_resource(document))
+                    for (url, document) in _get_geojson_schemas().items())
+                try:
+                    jsonschema.Draft4Validator({}, registry=registry)
+                    _GEOJSON_REGISTRY = registry
+                except TypeError:
+                    # referencing installed next to older jsonschema
+                    pass
+    return _GEOJSON_REGISTRY or None
+
+
+def _get_geojson_validator(definition=None):
+    """Return cached validator of GeoJSON objects
+
+    Validators resolving references by the :mod:`referencing` registry are
+    built once and shared by all threads, legacy resolvers of jsonschema
+    older than 4.18 are not thread safe, their validators are built for
+    each thread.
+
+    :param str definition: validate objects against given definition of the
+                           GeoJSON schema, e.g. ``feature``, instead of the
+                           whole schema
+    """
+
+    import jsonschema
+
+    base_url = GEOJSON_SCHEMA_URL + "geojson.json"
+    if definition:
+        # referred, so that references within the definition are resolved
+        # against the whole schema
+        schema = {"$ref": "{}#/definitions/{}".format(base_url, definition)}
+    else:
+        schema = _get_geojson_schemas()[base_url]
+
+    registry = _get_geojson_registry()
+    if registry is not None:
+        with _LOCK:
+            if definition not in _GEOJSON_VALIDATORS:
+                _GEOJSON_VALIDATORS[definition] = jsonschema.Draft4Validator(schema, registry=registry)
+            return _GEOJSON_VALIDATORS[definition]
+
+    validators = getattr(_LEGACY_GEOJSON_VALIDATORS, 'validators', None)
+    if validators is None:
+        validators = _LEGACY_GEOJSON_VALIDATORS.validators = {}
+    if definition not in validators:
+        schemas = _get_geojson_schemas()
+        resolver = jsonschema.RefResolver.from_schema(schemas[base_url], store=schemas)
+        validators[definition] = jsonschema.Draft4Validator(schema, resolver=resolver)
+    return validators[definition]
+
+
+def _get_geojson_schema_errors():
+    """Return exceptions raised for unresolvable references or invalid
+    GeoJSON schema
+    """
+
+    import jsonschema
+
+    if _get_geojson_registry() is not None:
+        from referencing.exceptions import Unresolvable
+        return (Unresolvable, jsonschema.SchemaError)
+    return (jsonschema.RefResolutionError, jsonschema.SchemaError)
+
+
+def _validate_geojson_schema(file_name):
+    """Validate GeoJSON file against the GeoJSON schema
+
+    Features of FeatureCollections are read and validated one by one, if the
+    `ijson <https://pypi.org/project/ijson/>`_ package is installed, so that
+    large collections are validated in bounded memory. The validation stops
+    at the first invalid feature, or once the validation budget (see
+    :mod:`pywps.validator.sampling`) is exhausted.
+    """
+
+    import jsonschema
+    import json
+
+    try:
+        import ijson
+    except ImportError:
+        ijson = None
+
+    schema_errors = _get_geojson_schema_errors()
+
+    try:
+        if ijson is not None:
+            with open(file_name, 'rb') as fh:
+                try:
+                    passed = _validate_geojson_stream(ijson, fh, ValidationBudget(file_name))
+                except ijson.JSONError as e:
+                    LOGGER.info('GeoJSON not valid: %s', e)
+                    return False
+            if passed is not None:
+                return passed
+
+        with open(file_name, 'rb') as fh:
+            document = json.loads(fh.read().decode('utf-8'))
+        _get_geojson_validator().validate(document)
+        return True
+    except jsonschema.ValidationError as e:
+        LOGGER.info('GeoJSON not valid: %s', e.message)
+    except schema_errors as e:
+        LOGGER.error('GeoJSON schema error: %s', e)
+    except ValueError as e:
+        LOGGER.info('GeoJSON not valid: %s', e)
+    return False
+
+
+def _validate_geojson_stream(ijson, stream, budget=None):
+    """Validate FeatureCollection feature by feature
+
+    Members of the collection are built from the parser events, except of
+    the features, which are validated, as soon as they are read, and
+    discarded. ``None`` is returned, if the document is not
+    FeatureCollection, or its ``type`` does not precede the features.
+    Features following the first ones fitting into the ``budget`` are not
+    read.
+    """
+
+    feature_validator = _get_geojson_validator('feature')
+    collection = {}
+    builder = None
+    key = None
+    features = 0
+
+    for (prefix, event, value) in ijson.parse(stream):
+        if builder is not None:
+            builder.event(event, value)
+            if prefix == key and event in ('end_map', 'end_array'):
+                collection[key] = builder.value
+                builder = None
+            elif prefix == 'features.item' and event in ('end_map', 'end_array'):
+                feature_validator.validate(builder.value)
+                builder = None
+                features += 1
+        elif prefix == 'features' and event == 'start_array':
+            if collection.get('type') != 'FeatureCollection':
+                return None
+            collection['features'] = []
+        elif prefix == 'features.item':
+            if budget is not None and budget.exhausted(stream.tell(), features=features):
+                break
+            if event in ('start_map', 'start_array'):
+                builder = ijson.ObjectBuilder()
+                builder.event(event, value)
+            else:
+                feature_validator.validate(value)
+                features += 1
+        elif prefix == '' or prefix == 'features':
+            continue
+        else:
+            # top level member
+            key = prefix
+            if event in ('start_map', 'start_array'):
+                builder = ijson.ObjectBuilder()
+                builder.event(event, value)
+            else:
+                collection[key] = value
+
+    if 'features' not in collection:
+        return None
+    _get_geojson_validator().validate(collection)
+    if budget is not None:
+        budget.log('{} features'.format(features))
+    return True
 
 
 def validateshapefile(data_input, mode):
     """ESRI Shapefile validation example
 
+    In the `MODE.STRICT` mode, the shapefile is opened by OGR directly in
+    the zip file, using the ``/vsizip/`` virtual file system, nothing is
+    extracted. The opened data source is kept as ``data_input.dataset`` for
+    the process.
     """
 
     LOGGER.info('validating Shapefile; Mode: %s', mode)
@@ -173,35 +380,68 @@ def validateshapefile(data_input, mode):
 
     if mode >= MODE.SIMPLE:
 
-        name = data_input.file
-        (mtype, encoding) = mimetypes.guess_type(name, strict=False)
+        mtype = _get_mime_type(data_input)
         passed = data_input.data_format.mime_type in {mtype, FORMATS.SHP.mime_type}
 
     if mode >= MODE.STRICT:
 
         from pywps.dependencies import ogr
 
-        import zipfile
-        z = zipfile.ZipFile(data_input.file)
-        shape_name = None
-        for name in z.namelist():
-            z.extract(name, data_input.tempdir)
-            if os.path.splitext(name)[1].lower() == '.shp':
-                shape_name = name
-
-        if shape_name:
-            data_source = ogr.Open(os.path.join(data_input.tempdir, shape_name))
+        data_source = None
+        members = _get_zip_members(data_input.file)
+        shape_names = [name for name in members or [] if os.path.splitext(name)[1].lower() == '.shp']
+        if shape_names:
+            # explicit form, the file name may lack the .zip extension
+            data_source = ogr.Open('/vsizip/{{{}}}/{}'.format(os.path.abspath(data_input.file), shape_names[0]))
 
         if data_source:
             passed = (data_source.GetDriver().GetName() == "ESRI Shapefile")
+            if passed:
+                _keep_dataset(data_input, data_source, probe_vector)
         else:
             passed = False
 
     return passed
 
 
+def _get_zip_members(file_name):
+    """Return names of files in zip file, ``None`` if it is not a zip file
+    or it exceeds the ``[server] maxzipmembers`` and ``[server] maxzipsize``
+    limits
+
+    Only the central directory of the zip file is read.
+    """
+
+    import zipfile
+    from pywps import configuration as config
+
+    try:
+        with zipfile.ZipFile(file_name) as z:
+            members = z.infolist()
+    except (zipfile.BadZipfile, IOError) as e:
+        LOGGER.info('Reading zip file failed: %s', e)
+        return None
+
+    max_members = int(config.get_config_value('server', 'maxzipmembers') or 0)
+    if max_members and len(members) > max_members:
+        LOGGER.info('Zip file of %d files exceeds the limit of %d files', len(members), max_members)
+        return None
+
+    max_size = config.get_size_mb(config.get_config_value('server', 'maxzipsize') or '0') * 1024 * 1024
+    size = sum(member.file_size for member in members)
+    if max_size and size > max_size:
+        LOGGER.info('Zip file of %d bytes exceeds the limit of %d bytes', size, max_size)
+        return None
+
+    return [member.filename for member in members]
+
+
 def validategeotiff(data_input, mode):
     """GeoTIFF validation example
+
+    In the `MODE.VERYSTRICT` mode, blocks of all bands are read, random ones
+    within the validation budget of large rasters (see
+    :mod:`pywps.validator.sampling`, the first block only by default).
     """
 
     LOGGER.info('Validating Shapefile; Mode: %s', mode)
@@ -212,8 +452,7 @@ def validategeotiff(data_input, mode):
 
     if mode >= MODE.SIMPLE:
 
-        name = data_input.file
-        (mtype, encoding) = mimetypes.guess_type(name, strict=False)
+        mtype = _get_mime_type(data_input)
         passed = data_input.data_format.mime_type in {mtype, FORMATS.GEOTIFF.mime_type}
 
     if mode >= MODE.STRICT:
@@ -222,12 +461,154 @@ def validategeotiff(data_input, mode):
         data_source = gdal.Open(data_input.file)
         if data_source:
             passed = (data_source.GetDriver().ShortName == "GTiff")
+            if passed:
+                _keep_dataset(data_input, data_source, probe_raster)
         else:
             passed = False
 
+    if mode >= MODE.VERYSTRICT and passed:
+
+        passed = _validate_raster_blocks(data_source, ValidationBudget(data_input.file))
+
     return passed
 
 
+def _validate_raster_blocks(dataset, budget):
+    """Read blocks of all raster bands
+
+    The first block is read always, the others in random order, until the
+    budget is exhausted.
+    """
+
+    import random
+
+    bands = []
+    for number in range(1, dataset.RasterCount + 1):
+        band = dataset.GetRasterBand(number)
+        (block_width, block_height) = band.GetBlockSize()
+        columns = (band.XSize + block_width - 1) // block_width
+        rows = (band.YSize + block_height - 1) // block_height
+        bands.append((band, block_width, block_height, columns, columns * rows))
+
+    # no list of all the blocks is built on Python 2
+    blocks_range = xrange if PY2 else range  # noqa: F821
+
+    total = sum(band[4] for band in bands)
+    order = blocks_range(total)
+    if budget.limited and total > 1:
+        order = [0] + random.sample(blocks_range(1, total), total - 1 if not budget.max_blocks
+                                    else min(total - 1, budget.max_blocks - 1))
+
+    size = 0
+    blocks = 0
+    for index in order:
+        if budget.exhausted(size, blocks=blocks):
+            break
+        for (band, block_width, block_height, columns, count) in bands:
+            if index < count:
+                break
+            index -= count
+        (xoff, yoff) = ((index % columns) * block_width, (index // columns) * block_height)
+        try:
+            data = band.ReadRaster(xoff, yoff, min(block_width, band.XSize - xoff),
+                                   min(block_height, band.YSize - yoff))
+        except RuntimeError as e:
+            LOGGER.info('Reading raster block failed: %s', e)
+            data = None
+        if data is None:
+            return False
+        size += len(data)
+        blocks += 1
+
+    if len(order) < total:
+        budget.sampled = True
+    budget.log('{} of {} blocks'.format(blocks, total))
+    return True
+
+
+def _keep_dataset(data_input, dataset, probe):
+    """Attach probe of the opened dataset to the input as ``probe``, and
+    the dataset itself as ``dataset``, if ``[server] keep_datasets`` is set,
+    so that the process does not open and scan the data again
+    """
+
+    from pywps import configuration as config
+
+    try:
+        data_input.probe = probe(dataset)
+    except Exception as e:
+        LOGGER.warning('Probing of input data failed: %s', e)
+    if config.get_config_value('server', 'keep_datasets'):
+        data_input.dataset = dataset
+
+
+def probe_vector(data_source):
+    """Return :class:`Probe` of OGR data source
+
+    Features are counted and the extent is computed over all layers.
+    """
+
+    from pywps.dependencies import ogr
+
+    features = 0
+    extent = None
+    crs = None
+    for index in range(data_source.GetLayerCount()):
+        layer = data_source.GetLayer(index)
+        features += max(layer.GetFeatureCount(), 0)
+        if layer.GetGeomType() == ogr.wkbNone:
+            continue
+        if crs is None:
+            crs = _get_crs_name(layer.GetSpatialRef())
+        try:
+            (minx, maxx, miny, maxy) = layer.GetExtent()
+        except RuntimeError:
+            # layer without features
+            continue
+        if extent is None:
+            extent = (minx, miny, maxx, maxy)
+        else:
+            extent = (min(extent[0], minx), min(extent[1], miny), max(extent[2], maxx), max(extent[3], maxy))
+
+    return Probe(driver=data_source.GetDriver().GetName(), layers=data_source.GetLayerCount(),
+                 features=features, extent=extent, size=None, bands=None, crs=crs)
+
+
+def probe_raster(dataset):
+    """Return :class:`Probe` of GDAL raster dataset
+    """
+
+    from pywps.dependencies import osr
+
+    (width, height) = (dataset.RasterXSize, dataset.RasterYSize)
+    (x0, dx, rx, y0, ry, dy) = dataset.GetGeoTransform()
+    xs = [x0, x0 + dx * width, x0 + rx * height, x0 + dx * width + rx * height]
+    ys = [y0, y0 + ry * width, y0 + dy * height, y0 + ry * width + dy * height]
+
+    crs = None
+    if dataset.GetProjection():
+        crs = _get_crs_name(osr.SpatialReference(wkt=dataset.GetProjection()))
+
+    return Probe(driver=dataset.GetDriver().ShortName, layers=0, features=None,
+                 extent=(min(xs), min(ys), max(xs), max(ys)), size=(width, height),
+                 bands=dataset.RasterCount, crs=crs)
+
+
+def _get_crs_name(srs):
+    """Return ``<authority>:<code>`` of spatial reference, its WKT, if it
+    is not identified
+    """
+
+    if srs is None:
+        return None
+    srs = srs.Clone()
+    srs.AutoIdentifyEPSG()
+    (authority, code) = (srs.GetAuthorityName(None), srs.GetAuthorityCode(None))
+    if authority and code:
+        return '{}:{}'.format(authority, code)
+    return srs.ExportToWkt()
+
+
 def _get_schemas_home():
     """Get path to schemas directory
     """
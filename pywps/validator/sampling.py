@@ -0,0 +1,69 @@
+##################################################################
+# Copyright 2018 Open Source Geospatial Foundation and others    #
+# licensed under MIT, Please consult LICENSE.txt for details     #
+##################################################################
+
+"""Budgets of sampled validation of large complex inputs
+
+Validators, whose cost is proportional to the size of the input, stop once
+they read ``[validation] sample_size`` bytes, ``[validation] sample_features``
+features of vector data or ``[validation] sample_blocks`` blocks of raster
+data, or once they run ``[validation] sample_time`` seconds. The header
+and the first part of the data are always validated, raster blocks are
+picked randomly. Zero values mean no limit. Only the first block of
+rasters is read by default, other inputs are validated completely.
+"""
+
+import logging
+from timeit import default_timer
+
+from pywps import configuration as config
+
+LOGGER = logging.getLogger('PYWPS')
+
+
+class ValidationBudget(object):
+    """Limits of validation of one input, read from the ``[validation]``
+    configuration section
+
+    :param str name: name of the validated input, used in the log
+    """
+
+    def __init__(self, name=''):
+        self.name = name
+        max_size = config.get_size_mb(config.get_config_value('validation', 'sample_size') or '0')
+        self.max_size = int(max_size * 1024 * 1024)
+        self.max_features = int(config.get_config_value('validation', 'sample_features') or 0)
+        self.max_blocks = int(config.get_config_value('validation', 'sample_blocks') or 0)
+        self.max_time = float(config.get_config_value('validation', 'sample_time') or 0)
+        self.start = default_timer()
+        self.sampled = False
+
+    @property
+    def limited(self):
+        """``True`` if any of the limits is set
+        """
+        return bool(self.max_size or self.max_features or self.max_blocks or self.max_time)
+
+    def exhausted(self, size=0, features=0, blocks=0):
+        """Return ``True``, if the validation should stop before reading
+        next part of the data, the validation is sampled then
+
+        :param int size: number of bytes read so far
+        :param int features: number of features validated so far
+        :param int blocks: number of raster blocks validated so far
+        """
+
+        if (self.max_size and size >= self.max_size) or \
+                (self.max_features and features >= self.max_features) or \
+                (self.max_blocks and blocks >= self.max_blocks) or \
+                (self.max_time and default_timer() - self.start >= self.max_time):
+            self.sampled = True
+        return self.sampled
+
+    def log(self, description):
+        """Log, whether the validation was complete or sampled
+        """
+
+        LOGGER.info('Validation of %s %s (%s in %.2f s)', self.name,
+                    'sampled' if self.sampled else 'complete', description, default_timer() - self.start)
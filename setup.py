@@ -59,7 +59,8 @@ CONFIG = {
     'scripts': [],
     'entry_points': {
         'console_scripts': [
-            'joblauncher=pywps.processing.job:launcher', ]},
+            'joblauncher=pywps.processing.job:launcher',
+            'pywps-janitor=pywps.janitor:main', ]},
 }
 
 setup(**CONFIG)
@@ -19,8 +19,12 @@ from tests import test_dblog
 from tests import test_wpsrequest
 from tests import test_service
 from tests import test_processing
+from tests import test_profiling
+from tests import test_janitor
+from tests import test_compression
 from tests.validator import test_complexvalidators
 from tests.validator import test_literalvalidators
+from tests.validator import test_catalog
 
 
 def load_tests(loader=None, tests=None, pattern=None):
@@ -36,11 +40,15 @@ def load_tests(loader=None, tests=None, pattern=None):
         test_literaltypes.load_tests(),
         test_complexvalidators.load_tests(),
         test_literalvalidators.load_tests(),
+        test_catalog.load_tests(),
         test_formats.load_tests(),
         test_dblog.load_tests(),
         test_wpsrequest.load_tests(),
         test_service.load_tests(),
         test_processing.load_tests(),
+        test_profiling.load_tests(),
+        test_janitor.load_tests(),
+        test_compression.load_tests(),
     ])
 
 if __name__ == "__main__":
@@ -0,0 +1,133 @@
+##################################################################
+# Copyright 2018 Open Source Geospatial Foundation and others    #
+# licensed under MIT, Please consult LICENSE.txt for details     #
+##################################################################
+
+"""Unit tests for compressed outputs
+"""
+
+import gzip
+import io
+import os
+import shutil
+import tempfile
+import unittest
+import uuid
+
+from werkzeug.test import Client
+from werkzeug.wrappers import BaseResponse
+
+from pywps import ComplexOutput, FORMATS, OutputService
+from pywps import compression
+from pywps import configuration
+from pywps.inout.storage.file import FileStorage
+
+CONTENT = '<gml:FeatureCollection/>\n' * 1000
+
+
+class CompressionTest(unittest.TestCase):
+    """Compression test cases"""
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.outputpath = os.path.join(self.tmp_dir, 'outputs')
+        os.makedirs(self.outputpath)
+        self.server = dict(configuration.CONFIG.items('server'))
+        self.compression = dict(configuration.CONFIG.items('compression'))
+        configuration.CONFIG.set('server', 'outputpath', self.outputpath)
+        configuration.CONFIG.set('compression', 'enabled', 'true')
+
+    def tearDown(self):
+        for option, value in self.server.items():
+            configuration.CONFIG.set('server', option, value)
+        for option, value in self.compression.items():
+            configuration.CONFIG.set('compression', option, value)
+        if configuration.CONFIG.has_section('compression:text/csv'):
+            configuration.CONFIG.remove_section('compression:text/csv')
+        shutil.rmtree(self.tmp_dir)
+
+    def _store(self):
+        output = ComplexOutput('vector', 'Vector output', supported_formats=[FORMATS.GML])
+        output.uuid = uuid.uuid1()
+        output.file = os.path.join(self.tmp_dir, 'output.gml')
+        with open(output.file, 'w') as f:
+            f.write(CONTENT)
+        (_, output_name, _) = FileStorage().store(output)
+        (_, output_name, _) = FileStorage().store(output)
+        return os.path.join(self.outputpath, str(output.uuid), output_name)
+
+    def test_policy(self):
+        policy = compression.get_policy('application/gml+xml')
+        self.assertEqual(policy.algorithm, 'gzip')
+        self.assertEqual(policy.min_size, 1024)
+        self.assertIsNone(compression.get_policy('image/tiff'))
+        self.assertIsNotNone(compression.get_policy('application/x-ogc-wfs; version=1.0.0'))
+
+        configuration.CONFIG.add_section('compression:text/csv')
+        configuration.CONFIG.set('compression:text/csv', 'level', '9')
+        configuration.CONFIG.set('compression:text/csv', 'min_size', '1mb')
+        policy = compression.get_policy('text/csv')
+        self.assertEqual((policy.level, policy.min_size), (9, 1024 * 1024))
+
+        configuration.CONFIG.set('compression:text/csv', 'enabled', 'false')
+        self.assertIsNone(compression.get_policy('text/csv'))
+        configuration.CONFIG.set('compression', 'enabled', 'false')
+        self.assertIsNone(compression.get_policy('application/gml+xml'))
+
+    def test_store(self):
+        stored = self._store()
+        self.assertTrue(os.path.exists(stored))
+        with gzip.open(stored + '.gz', 'rb') as f:
+            self.assertEqual(f.read().decode('utf-8'), CONTENT)
+
+    def test_store_compressed_only(self):
+        configuration.CONFIG.set('compression', 'keep_original', 'false')
+        stored = self._store()
+        self.assertFalse(os.path.exists(stored))
+        self.assertTrue(os.path.exists(stored + '.gz'))
+        # stored only once
+        self.assertEqual(len(os.listdir(os.path.dirname(stored))), 1)
+
+    def test_min_size(self):
+        configuration.CONFIG.set('compression', 'min_size', '1mb')
+        stored = self._store()
+        self.assertFalse(os.path.exists(stored + '.gz'))
+
+    def test_accept_encoding(self):
+        self.assertEqual(compression.parse_accept_encoding('gzip;q=0.5, br'), set(['gzip', 'br']))
+        self.assertEqual(compression.parse_accept_encoding('gzip;q=0, identity'), set(['identity']))
+        self.assertIn('gzip', compression.parse_accept_encoding('*'))
+        self.assertEqual(compression.parse_accept_encoding(None), set())
+
+    def test_output_service(self):
+        configuration.CONFIG.set('compression', 'keep_original', 'false')
+        stored = self._store()
+        client = Client(OutputService(), BaseResponse)
+        url = os.path.relpath(stored, self.outputpath).replace(os.sep, '/')
+
+        resp = client.get(url, headers={'Accept-Encoding': 'gzip, deflate'})
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp.headers['Content-Encoding'], 'gzip')
+        self.assertIn('Accept-Encoding', resp.headers['Vary'])
+        self.assertEqual(gzip.GzipFile(fileobj=io.BytesIO(resp.data)).read().decode('utf-8'),
+                         CONTENT)
+
+        resp = client.get(url)
+        self.assertEqual(resp.status_code, 200)
+        self.assertNotIn('Content-Encoding', resp.headers)
+        self.assertEqual(resp.data.decode('utf-8'), CONTENT)
+
+        self.assertEqual(client.get('missing.gml').status_code, 404)
+        self.assertEqual(client.get('../outputs/' + url).status_code, 403)
+        self.assertEqual(client.get('.cas/foo').status_code, 403)
+
+
+def load_tests(loader=None, tests=None, pattern=None):
+    """Load local tests
+    """
+    if not loader:
+        loader = unittest.TestLoader()
+    suite_list = [
+        loader.loadTestsFromTestCase(CompressionTest)
+    ]
+    return unittest.TestSuite(suite_list)
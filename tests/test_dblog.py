@@ -6,9 +6,12 @@
 """Unit tests for dblog
 """
 
+import datetime
+import threading
 import unittest
 
 from pywps import configuration
+from pywps import dblog
 from pywps.dblog import get_session
 from pywps.dblog import ProcessInstance
 
@@ -44,6 +47,46 @@ class DBLogTest(unittest.TestCase):
         self.assertEqual(null_percent.count(), 0,
                          'There are no unfinished processes')
 
+    def test_timings(self):
+        time_start = datetime.datetime.now()
+        dblog.store_timings('timings-test', {'parse': (time_start, 0.5, 1),
+                                             'validate': (time_start, 0.25, 2)})
+        dblog.start_phase('timings-test', 'queue')
+        self.assertNotIn('queue', dblog.get_timings('timings-test'))
+        dblog.end_phase('timings-test', 'queue')
+
+        timings = dblog.get_timings('timings-test')
+        self.assertEqual(timings['parse'], 0.5)
+        self.assertEqual(timings['validate'], 0.25)
+        self.assertTrue(timings['queue'] >= 0)
+
+        summary = dblog.get_timings_summary()
+        self.assertTrue(summary['parse']['requests'] >= 1)
+        self.assertTrue(summary['parse']['max'] >= 0.5)
+
+    def test_thread_sessions(self):
+        """Sessions of other threads are not closed"""
+        opened = threading.Event()
+        checked = threading.Event()
+        pending = []
+
+        def add_instance():
+            session = get_session()
+            instance = ProcessInstance(uuid='thread-session')
+            session.add(instance)
+            opened.set()
+            checked.wait(10)
+            pending.append(instance in session)
+            session.close()
+
+        thread = threading.Thread(target=add_instance)
+        thread.start()
+        opened.wait(10)
+        get_session()
+        checked.set()
+        thread.join()
+        self.assertEqual(pending, [True])
+
 def load_tests(loader=None, tests=None, pattern=None):
     """Load local tests
     """
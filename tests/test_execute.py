@@ -8,6 +8,8 @@ import lxml.etree
 import json
 import tempfile
 import os.path
+import threading
+import time
 from pywps import Service, Process, LiteralOutput, LiteralInput,\
     BoundingBoxOutput, BoundingBoxInput, Format, ComplexInput, ComplexOutput
 from pywps.validator.base import emptyvalidator
@@ -18,6 +20,8 @@ from pywps import E, WPS, OWS
 from pywps.app.basic import xpath_ns
 from pywps._compat import text_type
 from pywps.tests import client_for, assert_response_success
+from pywps import configuration
+from pywps.inout.storage import StorageAbstract, STORE_TYPE, STORAGES, register_storage
 
 from pywps._compat import PY2
 from pywps._compat import StringIO
@@ -91,6 +95,85 @@ def create_complex_proces():
              ])
 
 
+def create_reference_process():
+    def reference_process(request, response):
+        for identifier in ['first', 'second', 'third']:
+            response.outputs[identifier].data = identifier
+        return response
+
+    return Process(handler=reference_process,
+            identifier='reference_process',
+            title='Reference outputs process',
+            outputs=[ComplexOutput(identifier, identifier.title(),
+                                   supported_formats=[Format('text/plain')])
+                     for identifier in ['first', 'second', 'third']],
+            store_supported=True)
+
+
+class SlowStorage(StorageAbstract):
+    """Storage recording stored outputs and number of concurrent stores
+    """
+
+    lock = threading.Lock()
+    stored = []
+    running = 0
+    max_running = 0
+
+    def store(self, output):
+        with self.lock:
+            SlowStorage.stored.append(output.identifier)
+            SlowStorage.running += 1
+            SlowStorage.max_running = max(SlowStorage.max_running, SlowStorage.running)
+        time.sleep(0.2)
+        with self.lock:
+            SlowStorage.running -= 1
+        return (STORE_TYPE.PATH, output.identifier, 'http://storage/' + output.identifier)
+
+
+class SlowValidator(object):
+    """Validator recording number of concurrent validations and inputs
+    closed while being validated, data 'invalid' are found not valid at once
+    """
+
+    lock = threading.Lock()
+    running = 0
+    max_running = 0
+    closed_running = 0
+    validated = []
+
+    @classmethod
+    def validate(cls, data_input, mode):
+        if data_input.data == 'invalid':
+            return False
+        with cls.lock:
+            cls.running += 1
+            cls.max_running = max(cls.max_running, cls.running)
+        # dataset opened by the validator, released when the input is closed
+        dataset = data_input.dataset = object()
+        time.sleep(0.2)
+        with cls.lock:
+            cls.running -= 1
+            if data_input.dataset is not dataset:
+                cls.closed_running += 1
+            cls.validated.append(data_input)
+        return True
+
+
+def create_validated_process():
+    def validated_process(request, response):
+        response.outputs['count'].data = sum(len(request.inputs[identifier]) for identifier in request.inputs)
+        return response
+
+    frmt = Format('text/plain', validate=SlowValidator.validate)
+    return Process(handler=validated_process,
+            identifier='validated_process',
+            title='Validated inputs process',
+            inputs=[ComplexInput(identifier, identifier.title(), supported_formats=[frmt],
+                                 min_occurs=0, max_occurs=10)
+                    for identifier in ['first', 'second']],
+            outputs=[LiteralOutput('count', 'Number of inputs', data_type='integer')])
+
+
 def get_output(doc):
     output = {}
     for output_el in xpath_ns(doc, '/wps:ExecuteResponse'
@@ -182,6 +265,17 @@ class ExecuteTest(unittest.TestCase):
         response = service.execute('my_complex_process', request, 'fakeuuid')
         self.assertEqual(response.outputs['complex'].data, 'DEFAULT COMPLEX DATA')
 
+    def test_raw_complex_output(self):
+        client = client_for(Service(processes=[create_complex_proces()]))
+        request_doc = WPS.Execute(
+            OWS.Identifier('my_complex_process'),
+            WPS.ResponseForm(WPS.RawDataOutput(OWS.Identifier('complex'))),
+            version='1.0.0'
+        )
+        resp = client.post_xml(doc=request_doc)
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp.get_data(), b'DEFAULT COMPLEX DATA')
+
     def test_missing_process_error(self):
         client = client_for(Service(processes=[create_ultimate_question()]))
         resp = client.get('?Request=Execute&identifier=foo')
@@ -250,6 +344,134 @@ class ExecuteTest(unittest.TestCase):
             './wps:Data/ows:BoundingBox/ows:LowerCorner')[0].text)
 
 
+class ExecuteReferenceOutputTest(unittest.TestCase):
+    """Storing of reference outputs"""
+
+    def setUp(self):
+        self.store_type = configuration.get_config_value('server', 'store_type')
+        self.store_workers = configuration.get_config_value('server', 'store_workers')
+        self.storages = dict(STORAGES)
+        register_storage('slow', SlowStorage)
+        configuration.CONFIG.set('server', 'store_type', 'slow')
+        SlowStorage.stored = []
+        SlowStorage.max_running = 0
+
+    def tearDown(self):
+        configuration.CONFIG.set('server', 'store_type', self.store_type)
+        configuration.CONFIG.set('server', 'store_workers', self.store_workers)
+        STORAGES.clear()
+        STORAGES.update(self.storages)
+
+    def test_outputs_stored_in_parallel(self):
+        client = client_for(Service(processes=[create_reference_process()]))
+        request_doc = WPS.Execute(
+            OWS.Identifier('reference_process'),
+            WPS.ResponseForm(
+                WPS.ResponseDocument(*[
+                    WPS.Output(OWS.Identifier(identifier), asReference='true')
+                    for identifier in ['first', 'second', 'third']
+                ])
+            ),
+            version='1.0.0'
+        )
+        resp = client.post_xml(doc=request_doc)
+        assert_response_success(resp)
+
+        references = xpath_ns(resp.xml, '/wps:ExecuteResponse/wps:ProcessOutputs'
+                                        '/wps:Output/wps:Reference')
+        self.assertEqual(
+            sorted(ref.attrib['{http://www.w3.org/1999/xlink}href'] for ref in references),
+            ['http://storage/first', 'http://storage/second', 'http://storage/third'])
+        # each output is stored once, although the document is built repeatedly
+        self.assertEqual(sorted(SlowStorage.stored), ['first', 'second', 'third'])
+        self.assertGreater(SlowStorage.max_running, 1)
+
+    def test_outputs_stored_serially(self):
+        configuration.CONFIG.set('server', 'store_workers', '1')
+        client = client_for(Service(processes=[create_reference_process()]))
+        request_doc = WPS.Execute(
+            OWS.Identifier('reference_process'),
+            WPS.ResponseForm(
+                WPS.ResponseDocument(
+                    WPS.Output(OWS.Identifier('first'), asReference='true'),
+                    WPS.Output(OWS.Identifier('second'), asReference='true')
+                )
+            ),
+            version='1.0.0'
+        )
+        resp = client.post_xml(doc=request_doc)
+        assert_response_success(resp)
+        self.assertEqual(sorted(SlowStorage.stored), ['first', 'second'])
+        self.assertEqual(SlowStorage.max_running, 1)
+
+
+class ExecuteInputValidationTest(unittest.TestCase):
+    """Validation of complex inputs"""
+
+    def setUp(self):
+        self.validation_workers = configuration.get_config_value('server', 'validation_workers')
+        SlowValidator.max_running = 0
+        SlowValidator.closed_running = 0
+        SlowValidator.validated = []
+
+    def tearDown(self):
+        configuration.CONFIG.set('server', 'validation_workers', self.validation_workers)
+
+    def execute(self, inputs):
+        service = Service(processes=[create_validated_process()])
+
+        class FakeRequest():
+            identifier = 'validated_process'
+            service = 'wps'
+            operation = 'execute'
+            version = '1.0.0'
+            raw = False
+            outputs = {}
+            store_execute = False
+            lineage = False
+
+        request = FakeRequest()
+        request.inputs = dict(
+            (identifier, [{'identifier': identifier, 'data': data} for data in inputs[identifier]])
+            for identifier in inputs)
+        return service.execute('validated_process', request, 'fakeuuid')
+
+    def test_inputs_validated_in_parallel(self):
+        response = self.execute({'first': ['a', 'b', 'c'], 'second': ['d']})
+        self.assertEqual(response.outputs['count'].data, 4)
+        self.assertGreater(SlowValidator.max_running, 1)
+
+    def test_inputs_validated_serially(self):
+        configuration.CONFIG.set('server', 'validation_workers', '1')
+        response = self.execute({'first': ['a', 'b'], 'second': ['c']})
+        self.assertEqual(response.outputs['count'].data, 3)
+        self.assertEqual(SlowValidator.max_running, 1)
+
+    def test_invalid_input(self):
+        with self.assertRaises(InvalidParameterValue) as context:
+            self.execute({'first': ['a', 'b'], 'second': ['c', 'invalid', 'invalid']})
+        self.assertEqual(context.exception.locator, 'second')
+
+    def test_invalid_input_first(self):
+        """Inputs are closed once the running validations are finished
+        """
+        with self.assertRaises(InvalidParameterValue) as context:
+            self.execute({'first': ['invalid', 'a', 'b', 'c', 'd', 'e']})
+        self.assertEqual(context.exception.locator, 'first')
+        self.assertEqual(SlowValidator.running, 0)
+        self.assertEqual(SlowValidator.closed_running, 0)
+
+    def test_invalid_input_serially(self):
+        """Inputs validated before the invalid one are closed
+        """
+        configuration.CONFIG.set('server', 'validation_workers', '1')
+        with self.assertRaises(InvalidParameterValue):
+            self.execute({'first': ['a', 'b', 'invalid']})
+        self.assertEqual(len(SlowValidator.validated), 2)
+        for data_input in SlowValidator.validated:
+            self.assertIsNone(data_input.dataset)
+
+
 class ExecuteXmlParserTest(unittest.TestCase):
     """Tests for Execute request XML Parser
     """
@@ -424,6 +646,8 @@ def load_tests(loader=None, tests=None, pattern=None):
         loader = unittest.TestLoader()
     suite_list = [
         loader.loadTestsFromTestCase(ExecuteTest),
+        loader.loadTestsFromTestCase(ExecuteReferenceOutputTest),
+        loader.loadTestsFromTestCase(ExecuteInputValidationTest),
         loader.loadTestsFromTestCase(ExecuteXmlParserTest),
     ]
     return unittest.TestSuite(suite_list)
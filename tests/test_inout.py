@@ -5,27 +5,58 @@
 # licensed under MIT, Please consult LICENSE.txt for details     #
 ##################################################################
 
+import base64
+import copy
 import os
+import pickle
 import tempfile
+import threading
 import datetime
 import unittest
 from pywps import Format
 from pywps.validator import get_validator
 from pywps import NAMESPACES
+from pywps import configuration
 from pywps.inout.basic import IOHandler, SOURCE_TYPE, SimpleHandler, BBoxInput, BBoxOutput, \
     ComplexInput, ComplexOutput, LiteralOutput, LiteralInput, _is_textfile
 from pywps.inout import BoundingBoxInput as BoundingBoxInputXML
 from pywps.inout.literaltypes import convert, AllowedValue
-from pywps._compat import StringIO, text_type
+from pywps._compat import StringIO, text_type, PY2
+from io import BytesIO
 from pywps.validator.base import emptyvalidator
 from pywps.exceptions import InvalidParameterValue
 from pywps.validator.mode import MODE
 
 from lxml import etree
 
+# set to run tests writing files of several GB
+LARGE_TESTS = os.environ.get('PYWPS_LARGE_TESTS')
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
 DATA_DIR = os.path.join(os.path.abspath(os.path.dirname(__file__)), 'data')
 
 
+class SyntheticStream(object):
+    """Binary stream of given size, recording the largest read
+    """
+
+    def __init__(self, size):
+        self.remaining = size
+        self.max_read = 0
+
+    def read(self, size=-1):
+        if size is None or size < 0:
+            raise AssertionError('Whole stream read at once')
+        self.max_read = max(self.max_read, size)
+        size = min(size, self.remaining)
+        self.remaining -= size
+        return b'\x00' * size
+
+
 def get_data_format(mime_type):
     return Format(mime_type=mime_type,
     validate=get_validator(mime_type))
@@ -102,6 +133,80 @@ class IOHandlerTest(unittest.TestCase):
         self.iohandler.stream = source
         self._test_outout(SOURCE_TYPE.STREAM)
 
+    def test_as_buffer(self):
+        """Files are memory mapped, memory objects viewed"""
+        (fd, tmp_file) = tempfile.mkstemp(dir=self.iohandler.workdir)
+        with os.fdopen(fd, 'wb') as file_handler:
+            file_handler.write(bytearray(range(256)))
+        self.iohandler.file = tmp_file
+
+        buff = self.iohandler.as_buffer()
+        self.assertEqual(len(buff), 256)
+        self.assertEqual(buff[16:18], b'\x10\x11')
+        self.assertEqual(copy.deepcopy(self.iohandler)._buffers, [])
+
+        self.iohandler.close()
+        # mmap of Python 2 has no closed attribute
+        self.assertRaises(ValueError, buff.read, 1)
+
+        self.iohandler.memory_object = b'memory'
+        self.assertEqual(self.iohandler.as_buffer()[:3].tobytes(), b'mem')
+
+    @unittest.skipIf(numpy is None, 'NumPy not installed')
+    def test_as_array(self):
+        (fd, tmp_file) = tempfile.mkstemp(dir=self.iohandler.workdir)
+        with os.fdopen(fd, 'wb') as file_handler:
+            file_handler.write(numpy.arange(100, dtype='int32').tobytes())
+        self.iohandler.file = tmp_file
+
+        array = self.iohandler.as_array('int32', offset=40)
+        self.assertEqual(len(array), 90)
+        self.assertEqual(array[0], 10)
+        self.assertFalse(array.flags.writeable)
+
+    def test_iter_chunks(self):
+        """Data of all sources are iterated in chunks"""
+        value = b'0123456789' * 10
+        (fd, tmp_file) = tempfile.mkstemp(dir=self.iohandler.workdir)
+        with os.fdopen(fd, 'wb') as file_handler:
+            file_handler.write(value)
+
+        for (setter, source) in [('file', tmp_file), ('data', value), ('memory_object', value),
+                                 ('stream', BytesIO(value)), ('data', value.decode()),
+                                 ('stream', StringIO(value.decode()))]:
+            setattr(self.iohandler, setter, source)
+            chunks = list(self.iohandler.iter_chunks(32))
+            self.assertEqual([len(chunk) for chunk in chunks], [32, 32, 32, 4], setter)
+            self.assertEqual(b''.join(chunks), value, setter)
+
+            if setter == 'stream':
+                setattr(self.iohandler, setter, source)
+                source.seek(0)
+            chunks = list(self.iohandler.iter_base64_chunks(30))
+            self.assertTrue(all(len(chunk) <= 28 and len(chunk) % 4 == 0 for chunk in chunks), setter)
+            self.assertEqual(b''.join(chunks), base64.b64encode(value), setter)
+
+    def test_stream_to_file(self):
+        """Streams are copied to file in bounded memory"""
+        self._stream_to_file(8 * 1024 ** 2 + 1)
+
+    @unittest.skipUnless(LARGE_TESTS, 'set PYWPS_LARGE_TESTS to write a 2 GB file')
+    def test_stream_to_file_large(self):
+        """Streams larger than 2 GB are copied to file in bounded memory"""
+        self._stream_to_file(2 * 1024 ** 3 + 1)
+
+    def _stream_to_file(self, size):
+        source = SyntheticStream(size)
+        self.iohandler.stream = source
+        file_path = self.iohandler.file
+        try:
+            self.assertEqual(os.path.getsize(file_path), size)
+            self.assertEqual(source.max_read, 1024 * 1024)
+            with open(file_path, 'rb') as file_handler:
+                self.assertEqual(file_handler.read(4), b'\x00' * 4)
+        finally:
+            os.remove(file_path)
+
     def test_file(self):
         """Test file input IOHandler"""
         (fd, tmp_file) = tempfile.mkstemp()
@@ -124,8 +229,64 @@ class IOHandlerTest(unittest.TestCase):
         self.assertTrue(os.path.isdir(self.iohandler.workdir))
 
     def test_memory(self):
-        """Test data input IOHandler"""
-        self.skipTest('Memory object not implemented')
+        """Test memory object IOHandler"""
+        value = bytearray(b'memory data')
+        self.iohandler.memory_object = value
+        self.assertEqual(self.iohandler.source_type, SOURCE_TYPE.MEMORY,
+                         'Source type properly set')
+        self.assertEqual(b'memory data', self.iohandler.data, 'Data obtained')
+        self.assertEqual(b'memory data', self.iohandler.memory_object.tobytes(),
+                         'Memory object obtained')
+
+        # the data are not copied
+        value[:6] = b'MEMORY'
+        stream = self.iohandler.stream
+        self.assertEqual(b'MEMORY', stream.read(6))
+        stream.seek(0)
+        self.assertEqual(b'MEMORY data', stream.read(), 'Stream obtained')
+        self.assertTrue(self.iohandler.content_info.is_text)
+
+        with open(self.iohandler.file, 'rb') as file_handler:
+            self.assertEqual(b'MEMORY data', file_handler.read(), 'File obtained')
+        self.assertEqual(self.iohandler.source_type, SOURCE_TYPE.MEMORY)
+        self.assertEqual(b'MEMORY data', pickle.loads(pickle.dumps(self.iohandler)).data)
+
+    def test_memory_spill(self):
+        """Large memory objects are written to a file right away"""
+        spill_size = configuration.get_config_value('server', 'memory_spill_size')
+        configuration.CONFIG.set('server', 'memory_spill_size', '1kb')
+        try:
+            self.iohandler.memory_object = b'\x00' * 2048
+        finally:
+            configuration.CONFIG.set('server', 'memory_spill_size', spill_size)
+
+        self.assertEqual(self.iohandler.source_type, SOURCE_TYPE.FILE)
+        self.assertEqual(b'\x00' * 2048, self.iohandler.data)
+
+    @unittest.skipIf(numpy is None, 'NumPy not installed')
+    def test_memory_items(self):
+        """Memory objects of items larger than a byte are accessed by bytes"""
+        value = numpy.arange(1000, dtype='float64')
+        raw = value.tobytes()
+        self.iohandler.memory_object = value
+        self.assertEqual(raw, self.iohandler.data)
+        self.assertEqual(raw, self.iohandler.stream.read())
+        self.assertEqual(raw, b''.join(self.iohandler.iter_chunks(1000)))
+        with open(self.iohandler.file, 'rb') as file_handler:
+            self.assertEqual(raw, file_handler.read())
+
+        if not PY2:
+            # not contiguous views are copied
+            self.iohandler.memory_object = value[::2]
+            self.assertEqual(value[::2].tobytes(), self.iohandler.data)
+
+        spill_size = configuration.get_config_value('server', 'memory_spill_size')
+        configuration.CONFIG.set('server', 'memory_spill_size', '4kb')
+        try:
+            self.iohandler.memory_object = value
+        finally:
+            configuration.CONFIG.set('server', 'memory_spill_size', spill_size)
+        self.assertEqual(self.iohandler.source_type, SOURCE_TYPE.FILE)
 
     def test_data_bytes(self):
         self._value = b'aa'
@@ -147,6 +308,24 @@ class IOHandlerTest(unittest.TestCase):
         self.iohandler.stream.close()
         self.assertEqual(self._value, stream_data, 'Stream obtained')
 
+    def test_dataset(self):
+        """Dataset opened by the validator is not copied and is released
+        """
+        self.iohandler.data = self._value
+        # stands for an OGR data source, which can not be copied
+        self.iohandler.dataset = threading.Lock()
+
+        self.assertIsNone(copy.deepcopy(self.iohandler).dataset)
+        self.assertIsNone(pickle.loads(pickle.dumps(self.iohandler)).dataset)
+        self.assertIsNotNone(self.iohandler.dataset)
+
+        self.iohandler.close()
+        self.assertIsNone(self.iohandler.dataset)
+
+        self.iohandler.dataset = threading.Lock()
+        self.iohandler.data = 'new data'
+        self.assertIsNone(self.iohandler.dataset)
+
     def test_is_textfile(self):
         geotiff = os.path.join(DATA_DIR, 'geotiff', 'dem.tiff')
         self.assertFalse(_is_textfile(geotiff))
@@ -155,6 +334,17 @@ class IOHandlerTest(unittest.TestCase):
         geojson = os.path.join(DATA_DIR, 'json', 'point.geojson')
         self.assertTrue(_is_textfile(geojson))
 
+    def test_content_info(self):
+        self.iohandler.file = os.path.join(DATA_DIR, 'gml', 'point.gml')
+        content_info = self.iohandler.content_info
+        self.assertTrue(content_info.is_text)
+        self.assertIs(self.iohandler.content_info, content_info)
+
+        self.iohandler.file = os.path.join(DATA_DIR, 'geotiff', 'dem.tiff')
+        self.assertFalse(self.iohandler.content_info.is_text)
+        self.assertTrue(self.iohandler.content_info.mime_type.startswith('image/tiff'))
+        self.assertIsNone(self.iohandler.content_info.encoding)
+
 
 class ComplexInputTest(unittest.TestCase):
     """ComplexInput test cases"""
@@ -0,0 +1,121 @@
+##################################################################
+# Copyright 2018 Open Source Geospatial Foundation and others    #
+# licensed under MIT, Please consult LICENSE.txt for details     #
+##################################################################
+
+"""Unit tests for retention of outputs
+"""
+
+import os
+import shutil
+import tempfile
+import time
+import unittest
+import uuid
+
+from pywps import configuration
+from pywps import janitor
+
+
+class JanitorTest(unittest.TestCase):
+    """Retention test cases"""
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.outputpath = os.path.join(self.tmp_dir, 'outputs')
+        self.workdir = os.path.join(self.tmp_dir, 'workdir')
+        os.makedirs(self.outputpath)
+        os.makedirs(self.workdir)
+        self.options = dict(configuration.CONFIG.items('server'))
+        configuration.CONFIG.set('server', 'outputpath', self.outputpath)
+        configuration.CONFIG.set('server', 'workdir', self.workdir)
+
+    def tearDown(self):
+        for option, value in self.options.items():
+            configuration.CONFIG.set('server', option, value)
+        shutil.rmtree(self.tmp_dir)
+
+    def _create_output(self, age, size=10):
+        """Create outputs and status document of request ``age`` hours old
+        """
+        request_uuid = str(uuid.uuid1())
+        mtime = time.time() - age * 3600
+        directory = os.path.join(self.outputpath, request_uuid)
+        os.makedirs(directory)
+        output = os.path.join(directory, 'output.txt')
+        with open(output, 'w') as f:
+            f.write('x' * size)
+        status = os.path.join(self.outputpath, request_uuid + '.xml')
+        with open(status, 'w') as f:
+            f.write('<status/>')
+        for path in [output, directory, status]:
+            os.utime(path, (mtime, mtime))
+        return request_uuid
+
+    def _exists(self, request_uuid):
+        return os.path.exists(os.path.join(self.outputpath, request_uuid))
+
+    def test_max_age(self):
+        old = self._create_output(age=48)
+        new = self._create_output(age=1)
+        os.makedirs(os.path.join(self.outputpath, 'foo'))
+
+        result = janitor.sweep(max_age=24, max_size=0, workdir_max_age=0, dry_run=True)
+        self.assertEqual(result['requests'], 1)
+        self.assertTrue(self._exists(old))
+
+        result = janitor.sweep(max_age=24, max_size=0, workdir_max_age=0)
+        self.assertEqual(result['requests'], 1)
+        self.assertFalse(self._exists(old))
+        self.assertFalse(os.path.exists(os.path.join(self.outputpath, old + '.xml')))
+        self.assertTrue(self._exists(new))
+        self.assertTrue(os.path.exists(os.path.join(self.outputpath, 'foo')))
+
+    def test_max_size(self):
+        oldest = self._create_output(age=3, size=600 * 1024)
+        older = self._create_output(age=2, size=600 * 1024)
+        new = self._create_output(age=1, size=600 * 1024)
+
+        janitor.sweep(max_age=0, max_size='1mb', workdir_max_age=0)
+        self.assertFalse(self._exists(oldest))
+        self.assertFalse(self._exists(older))
+        self.assertTrue(self._exists(new))
+
+    def test_workdirs(self):
+        stale = tempfile.mkdtemp(prefix=janitor.WORKDIR_PREFIX, dir=self.workdir)
+        active = tempfile.mkdtemp(prefix=janitor.WORKDIR_PREFIX, dir=self.workdir)
+        other = tempfile.mkdtemp(dir=self.workdir)
+        mtime = time.time() - 48 * 3600
+        for path in [stale, active, other]:
+            os.utime(path, (mtime, mtime))
+        with open(os.path.join(active, 'output.txt'), 'w') as f:
+            f.write('running')
+
+        result = janitor.sweep(max_age=0, max_size=0, workdir_max_age=24)
+        self.assertEqual(result['workdirs'], 1)
+        self.assertFalse(os.path.exists(stale))
+        self.assertTrue(os.path.exists(active))
+        self.assertTrue(os.path.exists(other))
+
+    def test_running_workdirs(self):
+        running = str(uuid.uuid1())
+        finished = str(uuid.uuid1())
+        paths = [tempfile.mkdtemp(prefix='{}{}_'.format(janitor.WORKDIR_PREFIX, request_uuid), dir=self.workdir)
+                 for request_uuid in [running, finished]]
+        mtime = time.time() - 48 * 3600
+        for path in paths:
+            os.utime(path, (mtime, mtime))
+
+        stale = janitor._get_stale_workdirs(self.workdir, time.time() - 24 * 3600, {running})
+        self.assertEqual(stale, paths[1:])
+
+
+def load_tests(loader=None, tests=None, pattern=None):
+    """Load local tests
+    """
+    if not loader:
+        loader = unittest.TestLoader()
+    suite_list = [
+        loader.loadTestsFromTestCase(JanitorTest)
+    ]
+    return unittest.TestSuite(suite_list)
@@ -8,6 +8,7 @@
 import unittest
 import datetime
 from pywps.inout.literaltypes import *
+from pywps.exceptions import InvalidParameterValue
 
 class ConvertorTest(unittest.TestCase):
     """IOHandler test cases"""
@@ -73,6 +74,31 @@ class ConvertorTest(unittest.TestCase):
             convert_datetime(datetime.datetime(2016, 9, 22, 6)),
             datetime.datetime))
 
+    def test_convert(self):
+        """Test conversion by data type"""
+        self.assertEqual(convert('nonNegativeInteger', '12345678901234567890'), 12345678901234567890)
+        self.assertEqual(convert('angle', '-90'), 270.0)
+        self.assertEqual(set(CONVERTERS), set(LITERAL_DATA_TYPES))
+        with self.assertRaises(InvalidParameterValue):
+            convert('integer', 'a')
+        with self.assertRaises(InvalidParameterValue):
+            convert('unknown', '1')
+
+    def test_convert_values(self):
+        """Test conversion of many values"""
+        self.assertEqual(convert_values('integer', ['1', '2.0', 3]), [1, 2, 3])
+        self.assertEqual(convert_values('dateTime', ['2016-09-22T12:00:00', '2016-09-22T12:00:00.5', '2016-09-23']),
+                         [datetime.datetime(2016, 9, 22, 12), datetime.datetime(2016, 9, 22, 12, 0, 0, 500000),
+                          datetime.datetime(2016, 9, 23)])
+        self.assertEqual(convert_values('dateTime', ['2016-09-22T12:00:00Z', '2016-09-22T12:00:00']),
+                         [convert_datetime('2016-09-22T12:00:00Z'), datetime.datetime(2016, 9, 22, 12)])
+        self.assertEqual(convert_values('date', ['2011-07-21', '2011-07-22']),
+                         [datetime.date(2011, 7, 21), datetime.date(2011, 7, 22)])
+        with self.assertRaises(InvalidParameterValue):
+            convert_values('dateTime', ['2016-09-22T12:00:00', '2016-02-30T12:00:00'])
+        with self.assertRaises(InvalidParameterValue):
+            convert_values('positiveInteger', ['1', '-1'])
+
 
 def load_tests(loader=None, tests=None, pattern=None):
     if not loader:
@@ -0,0 +1,155 @@
+##################################################################
+# Copyright 2018 Open Source Geospatial Foundation and others    #
+# licensed under MIT, Please consult LICENSE.txt for details     #
+##################################################################
+
+"""Unit tests for request profiling
+"""
+
+import os
+import pstats
+import shutil
+import tempfile
+import unittest
+
+from pywps import Service, Process, LiteralOutput
+from pywps import configuration
+from pywps import dblog
+from pywps import profiling
+from pywps.tests import client_for, assert_response_success
+
+
+def create_ultimate_question():
+    def handler(request, response):
+        response.outputs['outvalue'].data = '42'
+        return response
+
+    return Process(handler=handler,
+                   identifier='ultimate_question',
+                   title='Ultimate Question',
+                   outputs=[LiteralOutput('outvalue', 'Output Value', data_type='string')])
+
+
+class ProfilingTest(unittest.TestCase):
+    """Profiling test cases"""
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.options = dict(configuration.CONFIG.items('profiling'))
+        configuration.CONFIG.set('profiling', 'enabled', 'true')
+        configuration.CONFIG.set('profiling', 'path', self.tmp_dir)
+
+    def tearDown(self):
+        for option, value in self.options.items():
+            configuration.CONFIG.set('profiling', option, value)
+        shutil.rmtree(self.tmp_dir)
+
+    def test_not_selected(self):
+        with profiling.get_profiler('abc', 'ultimate_question') as profiler:
+            self.assertFalse(profiler.enabled)
+        configuration.CONFIG.set('profiling', 'enabled', 'false')
+        configuration.CONFIG.set('profiling', 'sample_rate', '1')
+        with profiling.get_profiler('abc') as profiler:
+            self.assertFalse(profiler.enabled)
+
+    def test_selection(self):
+        configuration.CONFIG.set('profiling', 'processes', 'foo, ultimate_question')
+        with profiling.get_profiler('abc', 'ultimate_question') as profiler:
+            self.assertTrue(profiler.enabled)
+        with profiling.get_profiler('abc', 'bar') as profiler:
+            self.assertFalse(profiler.enabled)
+        with profiling.get_profiler('abc', headers={'X-PyWPS-Profile': 'true'}) as profiler:
+            self.assertFalse(profiler.enabled)
+        configuration.CONFIG.set('profiling', 'header', 'X-PyWPS-Profile')
+        with profiling.get_profiler('abc', headers={'X-PyWPS-Profile': 'true'}) as profiler:
+            self.assertTrue(profiler.enabled)
+        configuration.CONFIG.set('profiling', 'sample_rate', '1')
+        with profiling.get_profiler('abc') as profiler:
+            self.assertTrue(profiler.enabled)
+
+    def test_shared_profiler(self):
+        with profiling.get_profiler('abc') as profiler:
+            with profiling.get_profiler('abc', 'ultimate_question') as inner:
+                self.assertIs(profiler, inner)
+            self.assertIn('abc', profiling._PROFILERS)
+        self.assertNotIn('abc', profiling._PROFILERS)
+
+    def test_timings(self):
+        profiler = profiling.Profiler('abc')
+        for _ in range(2):
+            with profiler.phase('validate'):
+                pass
+        with profiling.phase('abc', 'store'):
+            pass
+        (time_start, duration, count) = profiler.timings['validate']
+        self.assertEqual(count, 2)
+        self.assertTrue(duration >= 0)
+        self.assertNotIn('store', profiler.timings)
+        self.assertEqual(os.listdir(self.tmp_dir), [])
+
+    def test_stored_timings(self):
+        with profiling.get_profiler('timings-capabilities') as profiler:
+            with profiler.phase('parse'):
+                pass
+        self.assertEqual(dblog.get_timings('timings-capabilities'), {})
+
+        with profiling.get_profiler('timings-execute') as profiler:
+            with profiler.phase('parse'):
+                pass
+            profiler.select('ultimate_question')
+        self.assertIn('parse', dblog.get_timings('timings-execute'))
+
+    def test_phase(self):
+        profiler = profiling.Profiler('abc', enabled=True)
+        with profiler.phase('parse'):
+            with profiler.phase('nested'):
+                sum(range(100))
+        stats_file = os.path.join(self.tmp_dir, 'abc', 'parse.pstats')
+        self.assertTrue(os.path.isfile(stats_file))
+        self.assertTrue(pstats.Stats(stats_file).total_calls > 0)
+        self.assertFalse(os.path.exists(os.path.join(self.tmp_dir, 'abc', 'nested.pstats')))
+
+    def test_default_directory(self):
+        configuration.CONFIG.set('profiling', 'path', '')
+        workdir = configuration.get_config_value('server', 'workdir')
+        configuration.CONFIG.set('server', 'workdir', os.path.join(self.tmp_dir, 'workdir'))
+        try:
+            directory = profiling.Profiler('abc').directory
+        finally:
+            configuration.CONFIG.set('server', 'workdir', workdir)
+        self.assertEqual(directory, os.path.join(self.tmp_dir, 'workdir', 'pywps_profiles', 'abc'))
+
+    def test_retention(self):
+        configuration.CONFIG.set('profiling', 'maxprofiles', '2')
+        for uuid in ['a', 'b', 'c']:
+            with profiling.Profiler(uuid, enabled=True).phase('parse'):
+                pass
+        self.assertEqual(len(os.listdir(self.tmp_dir)), 2)
+
+    def test_service(self):
+        configuration.CONFIG.set('profiling', 'processes', 'ultimate_question')
+        client = client_for(Service(processes=[create_ultimate_question()]))
+        resp = client.get('?service=WPS&Request=Execute&version=1.0.0&identifier=ultimate_question')
+        assert_response_success(resp)
+        (uuid,) = os.listdir(self.tmp_dir)
+        profiles = os.listdir(os.path.join(self.tmp_dir, uuid))
+        self.assertIn('process.pstats', profiles)
+        self.assertIn('serialize.pstats', profiles)
+
+        timings = dblog.get_timings(uuid)
+        for phase in ['parse', 'inputs', 'process', 'handler', 'serialize']:
+            self.assertIn(phase, timings)
+        self.assertNotIn('queue', timings)
+        self.assertTrue(timings['process'] >= timings['handler'])
+        self.assertIn('handler', dblog.get_timings_summary())
+
+
+def load_tests(loader=None, tests=None, pattern=None):
+    """Load local tests
+    """
+    if not loader:
+        loader = unittest.TestLoader()
+    suite_list = [
+        loader.loadTestsFromTestCase(ProfilingTest)
+    ]
+    return unittest.TestSuite(suite_list)
@@ -1,19 +1,41 @@
 import unittest
 import atexit
 import shutil
+import sqlite3
 import tempfile
+from multiprocessing.pool import ThreadPool
 import sqlalchemy
 from sqlalchemy import create_engine, inspect
 from pywps import FORMATS
-from pywps.inout.storage import DummyStorage, STORE_TYPE
-from pywps.inout.storage.file import FileStorage
-from pywps.inout.storage.db.pg import PgStorage
+from pywps.inout.storage import DummyStorage, STORE_TYPE, get_storage, register_storage, STORAGES
+from pywps.inout.storage.file import FileStorage, remove_unreferenced_blobs
+from pywps.inout.storage.db.pg import PgStorage, _get_raster_wkb, _get_band_header
 from pywps.inout.storage.db.sqlite import SQLiteStorage
-from pywps.inout.storage.db import DbStorage
+from pywps.inout.storage.db import DbStorage, CHUNK_SIZE
 from pywps import ComplexOutput
 import os
 from pywps import configuration
+from pywps.exceptions import NoApplicableCode
 
+try:
+    import tracemalloc
+except ImportError:
+    tracemalloc = None
+
+try:
+    from osgeo import gdal
+except ImportError:
+    gdal = None
+
+try:
+    import boto3
+    try:
+        # moto 5 and newer
+        from moto import mock_aws as mock_s3
+    except ImportError:
+        from moto import mock_s3
+except ImportError:
+    boto3 = None
 
 
 TEMP_DIRS=[]
@@ -84,6 +106,45 @@ class DummyStorageTestCase(unittest.TestCase):
         assert not self.storage.store("some data")
 
 
+class StorageRegistryTestCase(unittest.TestCase):
+    """get_storage and register_storage tests
+    """
+
+    def setUp(self):
+        self.store_type = configuration.get_config_value('server', 'store_type')
+        self.storages = dict(STORAGES)
+
+    def tearDown(self):
+        configuration.CONFIG.set('server', 'store_type', self.store_type)
+        STORAGES.clear()
+        STORAGES.update(self.storages)
+
+    def test_default(self):
+        configuration.CONFIG.set('server', 'store_type', '')
+        assert isinstance(get_storage(), FileStorage)
+
+    def test_configured(self):
+        configuration.CONFIG.set('server', 'store_type', 'file')
+        assert isinstance(get_storage(), FileStorage)
+
+    def test_register(self):
+        register_storage('dummy', DummyStorage)
+        configuration.CONFIG.set('server', 'store_type', 'dummy')
+        assert isinstance(get_storage(), DummyStorage)
+
+    def test_dotted_path(self):
+        assert isinstance(get_storage('pywps.inout.storage.DummyStorage'), DummyStorage)
+        register_storage('dummy', 'pywps.inout.storage.DummyStorage')
+        assert isinstance(get_storage('dummy'), DummyStorage)
+
+    def test_unknown(self):
+        from pywps.exceptions import NoApplicableCode
+        with self.assertRaises(NoApplicableCode):
+            get_storage('nosuchstorage')
+        with self.assertRaises(NoApplicableCode):
+            get_storage('pywps.inout.storage.NoSuchStorage')
+
+
 class FileStorageTestCase(unittest.TestCase):
     """FileStorage tests
     """
@@ -94,6 +155,7 @@ class FileStorageTestCase(unittest.TestCase):
         TEMP_DIRS.append(tmp_dir)
 
         self.storage = FileStorage()
+        self.outputpath = configuration.get_config_value('server', 'outputpath')
 
     def tearDown(self):
         pass
@@ -113,6 +175,216 @@ class FileStorageTestCase(unittest.TestCase):
         assert isinstance(store_file[1], str)
         assert isinstance(store_file[2], str)
 
+    def _store_text(self, transfer):
+        global TEMP_DIRS
+        output_dir = tempfile.mkdtemp()
+        TEMP_DIRS.append(output_dir)
+        source_dir = tempfile.mkdtemp()
+        TEMP_DIRS.append(source_dir)
+        source = os.path.join(source_dir, 'output.txt')
+        with open(source, 'w') as f:
+            f.write('foo bar')
+
+        configuration.CONFIG.set('server', 'outputpath', output_dir)
+        configuration.CONFIG.set('server', 'output_transfer', transfer)
+        try:
+            storage = FileStorage()
+        finally:
+            configuration.CONFIG.set('server', 'outputpath', self.outputpath)
+            configuration.CONFIG.set('server', 'output_transfer', 'auto')
+
+        text_output = ComplexOutput('text', 'Text output',
+                                    supported_formats=[FORMATS.TEXT])
+        text_output.uuid = 'transfer'
+        text_output.file = source
+        (store_type, name, url) = storage.store(text_output)
+        stored = os.path.join(output_dir, 'transfer', name)
+        with open(stored) as f:
+            self.assertEqual(f.read(), 'foo bar')
+        # storing again (e.g. status update) does not duplicate the output,
+        # also if the modification time was not kept exactly
+        stored_stat = os.stat(stored)
+        os.utime(stored, (stored_stat.st_atime, int(stored_stat.st_mtime) - 1))
+        self.assertEqual(storage.store(text_output)[2], url)
+        self.assertEqual(os.listdir(os.path.join(output_dir, 'transfer')), ['output.txt'])
+        return (source, stored)
+
+    def test_store_link(self):
+        (source, stored) = self._store_text('auto')
+        if os.stat(source).st_dev == os.stat(stored).st_dev:
+            self.assertTrue(os.path.samefile(source, stored))
+
+    def test_store_copy(self):
+        (source, stored) = self._store_text('copy')
+        self.assertFalse(os.path.samefile(source, stored))
+
+    def test_store_same_names(self):
+        global TEMP_DIRS
+        output_dir = tempfile.mkdtemp()
+        TEMP_DIRS.append(output_dir)
+        configuration.CONFIG.set('server', 'outputpath', output_dir)
+        try:
+            storage = FileStorage()
+        finally:
+            configuration.CONFIG.set('server', 'outputpath', self.outputpath)
+
+        outputs = []
+        for index in range(8):
+            source_dir = tempfile.mkdtemp()
+            TEMP_DIRS.append(source_dir)
+            text_output = ComplexOutput('text{}'.format(index), 'Text output',
+                                        supported_formats=[FORMATS.TEXT])
+            text_output.uuid = 'same_names'
+            text_output.file = os.path.join(source_dir, 'output.txt')
+            with open(text_output.file, 'w') as f:
+                f.write(str(index))
+            outputs.append(text_output)
+
+        pool = ThreadPool(len(outputs))
+        try:
+            names = pool.map(lambda output: storage.store(output)[1], outputs)
+        finally:
+            pool.close()
+            pool.join()
+
+        self.assertEqual(len(set(names)), len(outputs))
+        for (index, name) in enumerate(names):
+            with open(os.path.join(output_dir, 'same_names', name)) as f:
+                self.assertEqual(f.read(), str(index))
+
+    def _deduplicating_storage(self, output_dir, transfer):
+        configuration.CONFIG.set('server', 'outputpath', output_dir)
+        configuration.CONFIG.set('server', 'output_deduplicate', 'true')
+        configuration.CONFIG.set('server', 'output_transfer', transfer)
+        try:
+            return FileStorage()
+        finally:
+            configuration.CONFIG.set('server', 'outputpath', self.outputpath)
+            configuration.CONFIG.set('server', 'output_deduplicate', 'false')
+            configuration.CONFIG.set('server', 'output_transfer', 'auto')
+
+    def test_store_deduplicate_modified(self):
+        global TEMP_DIRS
+        output_dir = tempfile.mkdtemp()
+        TEMP_DIRS.append(output_dir)
+        storage = self._deduplicating_storage(output_dir, 'auto')
+
+        outputs = []
+        for request_uuid in ['first', 'second']:
+            text_output = ComplexOutput('text', 'Text output',
+                                        supported_formats=[FORMATS.TEXT])
+            text_output.uuid = request_uuid
+            text_output.workdir = tempfile.mkdtemp(dir=output_dir)
+            text_output.data = 'foo bar'
+            (store_type, name, url) = storage.store(text_output)
+            outputs.append((text_output, os.path.join(output_dir, request_uuid, name)))
+
+        # the first process rewrites its output in place
+        (text_output, stored) = outputs[0]
+        with open(text_output.file, 'r+') as f:
+            f.write('baz')
+        for (text_output, stored) in outputs:
+            self.assertFalse(os.path.samefile(text_output.file, stored))
+            with open(stored) as f:
+                self.assertEqual(f.read(), 'foo bar')
+
+    def test_store_deduplicate(self):
+        global TEMP_DIRS
+        output_dir = tempfile.mkdtemp()
+        TEMP_DIRS.append(output_dir)
+        storage = self._deduplicating_storage(output_dir, 'copy')
+
+        stored = []
+        for request_uuid in ['first', 'second']:
+            text_output = ComplexOutput('text', 'Text output',
+                                        supported_formats=[FORMATS.TEXT])
+            text_output.uuid = request_uuid
+            text_output.workdir = tempfile.mkdtemp()
+            TEMP_DIRS.append(text_output.workdir)
+            text_output.data = 'foo bar'
+            (store_type, name, url) = storage.store(text_output)
+            self.assertEqual(storage.store(text_output)[2], url)
+            stored.append(os.path.join(output_dir, request_uuid, name))
+
+        self.assertTrue(os.path.samefile(stored[0], stored[1]))
+        self.assertEqual(os.stat(stored[0]).st_nlink, 3)
+        self.assertEqual(len(os.listdir(os.path.join(output_dir, 'first'))), 1)
+
+        shutil.rmtree(os.path.join(output_dir, 'first'))
+        self.assertEqual(remove_unreferenced_blobs(output_dir, min_age=0), 0)
+        shutil.rmtree(os.path.join(output_dir, 'second'))
+        self.assertEqual(remove_unreferenced_blobs(output_dir, min_age=0), 1)
+
+
+@unittest.skipIf(boto3 is None, 'S3 storage tests require boto3 and moto')
+class S3StorageTestCase(unittest.TestCase):
+    """S3Storage tests, against moto mock of S3
+    """
+
+    def setUp(self):
+        self.options = dict(configuration.CONFIG.items('s3'))
+        configuration.CONFIG.set('s3', 'bucket', 'pywps')
+        configuration.CONFIG.set('s3', 'prefix', 'outputs/')
+        configuration.CONFIG.set('s3', 'region', 'us-east-1')
+        configuration.CONFIG.set('s3', 'access_key_id', 'testing')
+        configuration.CONFIG.set('s3', 'secret_access_key', 'testing')
+        configuration.CONFIG.set('s3', 'part_size', '5mb')
+        self.mock = mock_s3()
+        self.mock.start()
+        boto3.client('s3', region_name='us-east-1').create_bucket(Bucket='pywps')
+
+        from pywps.inout.storage.s3 import S3Storage
+        self.storage = S3Storage()
+
+    def tearDown(self):
+        self.mock.stop()
+        for (option, value) in self.options.items():
+            configuration.CONFIG.set('s3', option, value)
+
+    def test_store(self):
+        text_output = ComplexOutput('text', 'Text output',
+                             supported_formats=[FORMATS.TEXT])
+        text_output.file = get_text_file()
+
+        (store_type, key, url) = self.storage.store(text_output)
+        assert store_type == STORE_TYPE.S3
+        assert key.startswith('outputs/')
+        assert key.endswith('/test.txt')
+        assert 'X-Amz-Signature' in url or 'Signature' in url
+
+        obj = self.storage.client.get_object(Bucket='pywps', Key=key)
+        assert obj['ContentType'] == FORMATS.TEXT.mime_type
+        with open(get_text_file(), 'rb') as f:
+            assert obj['Body'].read() == f.read()
+
+        # unchanged output is not uploaded again
+        assert self.storage.store(text_output)[1] == key
+
+    def test_store_multipart(self):
+        global TEMP_DIRS
+        tmp_dir = tempfile.mkdtemp()
+        TEMP_DIRS.append(tmp_dir)
+        file_name = os.path.join(tmp_dir, 'large.txt')
+        with open(file_name, 'wb') as f:
+            for i in range(12):
+                f.write(bytes(bytearray([i])) * 1024 * 1024)
+
+        large_output = ComplexOutput('large', 'Large output',
+                             supported_formats=[FORMATS.TEXT])
+        large_output.file = file_name
+
+        (store_type, key, url) = self.storage.store(large_output)
+        obj = self.storage.client.head_object(Bucket='pywps', Key=key)
+        assert obj['ContentLength'] == 12 * 1024 * 1024
+        # multipart ETag is suffixed by number of parts
+        assert obj['ETag'].strip('"').endswith('-3')
+
+    def test_public_url(self):
+        configuration.CONFIG.set('s3', 'public_url', 'https://outputs.example.com/pywps/')
+        from pywps.inout.storage.s3 import S3Storage
+        storage = S3Storage()
+        assert storage.get_url('outputs/a/b.txt') == 'https://outputs.example.com/pywps/outputs/a/b.txt'
+
 
 class PgStorageTestCase(unittest.TestCase):
     """PgStorage test
@@ -250,6 +522,68 @@ class PgStorageTestCase(unittest.TestCase):
         assert (reference[2] in ins.get_table_names(schema=reference[1]))
 
 
+class UnreadableDataset(object):
+    """Raster dataset failing to read pixels of its bands
+    """
+
+    def __init__(self, dataset):
+        self.dataset = dataset
+        self.RasterCount = dataset.RasterCount
+        self.GetGeoTransform = dataset.GetGeoTransform
+
+    def GetRasterBand(self, number):
+        return UnreadableBand(self.dataset.GetRasterBand(number))
+
+
+class UnreadableBand(object):
+    """Raster band failing to read its pixels
+    """
+
+    def __init__(self, band):
+        self.DataType = band.DataType
+        self.GetNoDataValue = band.GetNoDataValue
+
+    def ReadRaster(self, *args):
+        return None
+
+
+@unittest.skipIf(gdal is None, 'PostGIS raster WKB tests require GDAL')
+class RasterWkbTestCase(unittest.TestCase):
+    """PostGIS raster WKB encoding tests
+    """
+
+    def setUp(self):
+        self.dataset = gdal.GetDriverByName('MEM').Create('', 4, 3, 1, gdal.GDT_Byte)
+        self.dataset.SetGeoTransform((0, 1, 0, 0, 0, -1))
+
+    def test_raster_wkb(self):
+        wkb = _get_raster_wkb(self.dataset, 1, 1, 2, 2, 4326)
+        # header, band flags and nodata, 2x2 pixels
+        assert len(wkb) == 2 * (61 + 2 + 4)
+
+    def test_read_error(self):
+        with self.assertRaises(NoApplicableCode):
+            _get_raster_wkb(UnreadableDataset(self.dataset), 0, 0, 4, 3, 0)
+
+
+class BandHeaderTestCase(unittest.TestCase):
+    """PostGIS raster WKB band header tests
+    """
+
+    def test_nodata(self):
+        assert _get_band_header('<', 4, 'B', None) == b'\x04\x00'
+        assert _get_band_header('<', 4, 'B', 255.0) == b'\x44\xff'
+        assert _get_band_header('<', 5, 'h', -9999.0) == b'\x45\xf1\xd8'
+        assert _get_band_header('<', 10, 'f', -1.5) == b'\x4a\x00\x00\xc0\xbf'
+
+    def test_nodata_out_of_range(self):
+        assert _get_band_header('<', 4, 'B', -9999.0) == b'\x04\x00'
+        assert _get_band_header('<', 6, 'H', 65536.0) == b'\x06\x00\x00'
+        assert _get_band_header('<', 7, 'i', float('nan')) == b'\x07\x00\x00\x00\x00'
+        assert _get_band_header('<', 8, 'I', float('inf')) == b'\x08\x00\x00\x00\x00'
+        assert _get_band_header('<', 10, 'f', 1e300) == b'\x0a\x00\x00\x00\x00'
+
+
 class SQLiteStorageTestCase(unittest.TestCase):
     """SQLiteStorage test
     """
@@ -369,3 +703,74 @@ class SQLiteStorageTestCase(unittest.TestCase):
         ins = inspect(engine)
         assert (reference[1] in ins.get_table_names())
 
+
+    def test_store_other_legacy(self):
+        """ Tables without part column get the output in one row
+        """
+        connection = sqlite3.connect(self.storage.target)
+        try:
+            connection.execute('CREATE TABLE legacy (primary_key INTEGER PRIMARY KEY, uuid VARCHAR(64), '
+                               'data BLOB, timestamp DATETIME)')
+            connection.commit()
+        finally:
+            connection.close()
+
+        legacy_output = ComplexOutput('legacy', 'Legacy output',
+                             supported_formats=[FORMATS.TEXT])
+        legacy_output.file = get_text_file()
+        legacy_output.output_format = FORMATS.TEXT
+        self.storage.store(legacy_output)
+
+        connection = sqlite3.connect(self.storage.target)
+        try:
+            rows = connection.execute('SELECT uuid, data FROM legacy').fetchall()
+        finally:
+            connection.close()
+        with open(get_text_file(), 'rb') as f:
+            assert rows == [(str(legacy_output.uuid), f.read())]
+
+    @unittest.skipIf(tracemalloc is None, 'tracemalloc requires Python 3')
+    def test_store_other_large(self):
+        """ Output is streamed to the database in bounded memory
+        """
+        self._store_other_large(16 * CHUNK_SIZE, 8 * CHUNK_SIZE)
+
+    @unittest.skipIf(tracemalloc is None, 'tracemalloc requires Python 3')
+    @unittest.skipUnless(os.environ.get('PYWPS_LARGE_TESTS'), 'set PYWPS_LARGE_TESTS to write a 1 GB file')
+    def test_store_other_huge(self):
+        """ 1 GB output is split to several rows in bounded memory
+        """
+        self._store_other_large(1000 ** 3, 32 * 1024 * 1024)
+
+    def _store_other_large(self, size, max_peak):
+        global TEMP_DIRS
+        tmp_dir = tempfile.mkdtemp()
+        TEMP_DIRS.append(tmp_dir)
+        file_name = os.path.join(tmp_dir, 'large.txt')
+        with open(file_name, 'wb') as f:
+            f.truncate(size - 4)
+            f.seek(size - 4)
+            f.write(b'last')
+
+        large_output = ComplexOutput('large', 'Large output',
+                             supported_formats=[FORMATS.TEXT])
+        large_output.file = file_name
+        large_output.output_format = FORMATS.TEXT
+
+        tracemalloc.start()
+        try:
+            self.storage.store(large_output)
+            (current, peak) = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        assert peak < max_peak
+
+        connection = sqlite3.connect(self.storage.target)
+        try:
+            parts = connection.execute(
+                'SELECT part, length(data), substr(data, -4) FROM large ORDER BY part').fetchall()
+        finally:
+            connection.close()
+        assert [part for (part, length, last) in parts] == list(range(len(parts)))
+        assert sum(length for (part, length, last) in parts) == size
+        assert parts[-1][2] == b'last'
@@ -0,0 +1,150 @@
+##################################################################
+# Copyright 2018 Open Source Geospatial Foundation and others    #
+# licensed under MIT, Please consult LICENSE.txt for details     #
+##################################################################
+
+"""Unit tests for XML schema catalog
+"""
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from pywps import configuration
+from pywps.validator import catalog
+from pywps.validator.sampling import ValidationBudget
+
+TYPES_XSD = """<?xml version="1.0" encoding="UTF-8"?>
+<xs:schema targetNamespace="http://example.com/base" xmlns:xs="http://www.w3.org/2001/XMLSchema"
+           xmlns:base="http://example.com/base" elementFormDefault="qualified">
+  <xs:include schemaLocation="common.xsd"/>
+  <xs:complexType name="ItemType">
+    <xs:sequence>
+      <xs:element name="value" type="base:PositiveType"/>
+    </xs:sequence>
+  </xs:complexType>
+</xs:schema>
+"""
+
+COMMON_XSD = """<?xml version="1.0" encoding="UTF-8"?>
+<xs:schema targetNamespace="http://example.com/base" xmlns:xs="http://www.w3.org/2001/XMLSchema"
+           elementFormDefault="qualified">
+  <xs:simpleType name="PositiveType">
+    <xs:restriction base="xs:positiveInteger"/>
+  </xs:simpleType>
+</xs:schema>
+"""
+
+APP_XSD = """<?xml version="1.0" encoding="UTF-8"?>
+<xs:schema targetNamespace="http://example.com/app" xmlns:xs="http://www.w3.org/2001/XMLSchema"
+           xmlns:base="http://example.com/base" elementFormDefault="qualified">
+  <xs:import namespace="http://example.com/base" schemaLocation="http://schemas.example.com/base/types.xsd"/>
+  <xs:element name="items">
+    <xs:complexType>
+      <xs:sequence>
+        <xs:element name="item" type="base:ItemType" maxOccurs="unbounded"/>
+      </xs:sequence>
+    </xs:complexType>
+  </xs:element>
+</xs:schema>
+"""
+
+APP_URL = 'http://schemas.example.com/app/app.xsd'
+
+
+def write(path, content):
+    if not os.path.isdir(os.path.dirname(path)):
+        os.makedirs(os.path.dirname(path))
+    with open(path, 'w') as f:
+        f.write(content)
+
+
+class CatalogTest(unittest.TestCase):
+    """XML schema catalog test cases"""
+
+    def setUp(self):
+        self.options = dict(configuration.CONFIG.items('schemas'))
+        self.tmp_dir = tempfile.mkdtemp()
+        self.catalog_dir = os.path.join(self.tmp_dir, 'catalog')
+        self.cache_dir = os.path.join(self.tmp_dir, 'cache')
+        configuration.CONFIG.set('schemas', 'catalog', self.catalog_dir)
+        configuration.CONFIG.set('schemas', 'cache_path', self.cache_dir)
+        configuration.CONFIG.set('schemas', 'download', 'false')
+
+        write(os.path.join(self.catalog_dir, 'schemas.example.com', 'app', 'app.xsd'), APP_XSD)
+        # imported schema is in the cache, its include is resolved
+        # relative to its URL
+        write(os.path.join(self.cache_dir, 'schemas.example.com', 'base', 'types.xsd'), TYPES_XSD)
+        write(os.path.join(self.catalog_dir, 'schemas.example.com', 'base', 'common.xsd'), COMMON_XSD)
+        catalog.clear_schemas()
+
+    def tearDown(self):
+        for (option, value) in self.options.items():
+            configuration.CONFIG.set('schemas', option, value)
+        catalog.clear_schemas()
+        shutil.rmtree(self.tmp_dir)
+
+    def validate(self, values, budget=None):
+        file_name = os.path.join(self.tmp_dir, 'items.xml')
+        items = ''.join('<app:item><value>{}</value></app:item>'.format(value) for value in values)
+        write(file_name, '<app:items xmlns:app="http://example.com/app" xmlns="http://example.com/base">'
+                         '{}</app:items>'.format(items))
+        return catalog.validate(file_name, catalog.get_schema(APP_URL), budget)
+
+    def test_find_schema(self):
+        self.assertEqual(catalog.find_schema(APP_URL),
+                         os.path.join(self.catalog_dir, 'schemas.example.com', 'app', 'app.xsd'))
+        self.assertEqual(catalog.find_schema('http://schemas.example.com/base/types.xsd'),
+                         os.path.join(self.cache_dir, 'schemas.example.com', 'base', 'types.xsd'))
+        self.assertIsNone(catalog.find_schema('http://schemas.example.com/../../etc/passwd'))
+        self.assertIsNone(catalog.find_schema('http://schemas.example.com/missing.xsd'))
+
+    def test_validate(self):
+        self.assertTrue(self.validate(range(1, 1000)))
+        self.assertFalse(self.validate([1, -1, 2]))
+        self.assertFalse(self.validate([]))
+
+    def test_sampled(self):
+        values = list(range(1, 10000)) + [-1]
+        self.assertFalse(self.validate(values, ValidationBudget()))
+
+        options = dict(configuration.CONFIG.items('validation'))
+        configuration.CONFIG.set('validation', 'sample_features', '100')
+        try:
+            budget = ValidationBudget()
+            self.assertTrue(self.validate(values, budget))
+            self.assertTrue(budget.sampled)
+
+            budget = ValidationBudget()
+            self.assertTrue(self.validate(range(1, 10), budget))
+            self.assertFalse(budget.sampled)
+        finally:
+            for (option, value) in options.items():
+                configuration.CONFIG.set('validation', option, value)
+
+    def test_missing_schema(self):
+        with self.assertRaises(IOError):
+            catalog.get_schema('http://schemas.example.com/missing.xsd')
+
+        os.remove(os.path.join(self.catalog_dir, 'schemas.example.com', 'base', 'common.xsd'))
+        from lxml import etree
+        with self.assertRaises(etree.XMLSchemaParseError):
+            catalog.get_schema(APP_URL)
+
+    def test_cache(self):
+        configuration.CONFIG.set('schemas', 'max_schemas', '1')
+        schema = catalog.get_schema(APP_URL)
+        self.assertIs(catalog.get_schema(APP_URL), schema)
+
+        catalog.get_schema('http://schemas.example.com/base/types.xsd')
+        self.assertIsNot(catalog.get_schema(APP_URL), schema)
+
+
+def load_tests(loader=None, tests=None, pattern=None):
+    if not loader:
+        loader = unittest.TestLoader()
+    suite_list = [
+        loader.loadTestsFromTestCase(CatalogTest)
+    ]
+    return unittest.TestSuite(suite_list)
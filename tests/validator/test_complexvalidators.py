@@ -7,11 +7,19 @@
 """
 
 import unittest
+import shutil
 import sys
+import threading
 from pywps.validator.complexvalidator import *
 from pywps.inout.formats import FORMATS
 import tempfile
+import json
 import os
+from pywps.validator import complexvalidator
+from pywps.validator.complexvalidator import _validate_geojson_schema, _get_geojson_validator, _get_zip_members, \
+    _keep_dataset, _validate_raster_blocks, Probe
+from pywps.validator.sampling import ValidationBudget
+from pywps import configuration
 
 try:
     import osgeo
@@ -20,6 +28,11 @@ except ImportError:
 else:
     WITH_GDAL = True
 
+try:
+    import ijson
+except ImportError:
+    ijson = None
+
 def get_input(name, schema, mime_type):
 
     class FakeFormat(object):
@@ -69,6 +82,8 @@ class ValidateTest(unittest.TestCase):
         self.assertTrue(validategml(gml_input, MODE.SIMPLE), 'SIMPLE validation')
         if WITH_GDAL:
             self.assertTrue(validategml(gml_input, MODE.STRICT), 'STRICT validation')
+            self.assertEqual(gml_input.probe.driver, 'GML')
+            self.assertEqual(gml_input.probe.features, 1)
             self.assertTrue(validategml(gml_input, MODE.VERYSTRICT), 'VERYSTRICT validation')
         gml_input.stream.close()
 
@@ -81,9 +96,116 @@ class ValidateTest(unittest.TestCase):
         self.assertTrue(validategeojson(geojson_input, MODE.SIMPLE), 'SIMPLE validation')
         if WITH_GDAL:
             self.assertTrue(validategeojson(geojson_input, MODE.STRICT), 'STRICT validation')
+            self.assertEqual(geojson_input.probe.driver, 'GeoJSON')
+            self.assertEqual(geojson_input.probe.layers, 1)
+            self.assertIsNotNone(geojson_input.dataset)
             self.assertTrue(validategeojson(geojson_input, MODE.VERYSTRICT), 'VERYSTRICT validation')
         geojson_input.stream.close()
 
+    def test_geojson_schema(self):
+        """Test GeoJSON schema validation
+        """
+        self.assertTrue(_validate_geojson_schema(
+            os.path.join(os.path.dirname(__file__), '..', 'data', 'json', 'point.geojson')))
+        self.assertIs(_get_geojson_validator(), _get_geojson_validator())
+
+        feature = {"type": "Feature", "properties": {},
+                   "geometry": {"type": "Point", "coordinates": [8.5, 22.8]}}
+        tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp_dir)
+        file_name = os.path.join(tmp_dir, 'collection.geojson')
+        for (collection, valid) in [
+                ({"type": "FeatureCollection", "features": [feature, feature]}, True),
+                ({"type": "FeatureCollection", "features": [feature, {"type": "Feature"}]}, False),
+                ({"type": "FeatureCollection", "bbox": "none", "features": [feature]}, False),
+                ({"type": "FeatureCollection", "features": [feature, 1, [], None]}, True)]:
+            with open(file_name, 'w') as f:
+                json.dump(collection, f)
+            self.assertEqual(_validate_geojson_schema(file_name), valid)
+
+        with open(file_name, 'w') as f:
+            f.write('{"type": "FeatureCollection", "features": [')
+        self.assertFalse(_validate_geojson_schema(file_name))
+
+    def test_geojson_schema_error(self):
+        """Unresolvable references of the schema do not pass the validation
+        """
+        import jsonschema
+
+        _get_geojson_validator()
+        if complexvalidator._get_geojson_registry() is not None:
+            validators = complexvalidator._GEOJSON_VALIDATORS
+        else:
+            validators = complexvalidator._LEGACY_GEOJSON_VALIDATORS.validators
+        validator = validators[None]
+        validators[None] = jsonschema.Draft4Validator({"$ref": "#/definitions/missing"})
+        try:
+            self.assertFalse(_validate_geojson_schema(
+                os.path.join(os.path.dirname(__file__), '..', 'data', 'json', 'point.geojson')))
+        finally:
+            validators[None] = validator
+
+    def test_geojson_validator_threads(self):
+        """Validators resolving references by registry are shared by the
+        threads
+        """
+        validators = []
+        thread = threading.Thread(target=lambda: validators.append(_get_geojson_validator('feature')))
+        thread.start()
+        thread.join()
+        if complexvalidator._get_geojson_registry() is not None:
+            self.assertIs(validators[0], _get_geojson_validator('feature'))
+        else:
+            self.assertIsNot(validators[0], _get_geojson_validator('feature'))
+
+    @unittest.skipIf(ijson is None, 'streaming validation requires ijson')
+    def test_geojson_schema_streaming(self):
+        """Features are validated one by one, stopping at the first invalid
+        one
+        """
+        from pywps.validator.complexvalidator import _validate_geojson_stream
+
+        tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp_dir)
+        file_name = os.path.join(tmp_dir, 'collection.geojson')
+        feature = json.dumps({"type": "Feature", "properties": {"value": 1},
+                              "geometry": {"type": "Point", "coordinates": [8.5, 22.8]}})
+        with open(file_name, 'w') as f:
+            f.write('{"type": "FeatureCollection", "features": [')
+            f.write(', '.join([feature] * 10000))
+            f.write(']}')
+        with open(file_name, 'rb') as f:
+            self.assertTrue(_validate_geojson_stream(ijson, f))
+
+        # features beyond the validation budget are not read
+        options = dict(configuration.CONFIG.items('validation'))
+        configuration.CONFIG.set('validation', 'sample_features', '100')
+        try:
+            with open(file_name, 'w') as f:
+                f.write('{"type": "FeatureCollection", "features": [')
+                f.write(', '.join([feature] * 1000))
+                f.write(', not JSON')
+            budget = ValidationBudget(file_name)
+            with open(file_name, 'rb') as f:
+                self.assertTrue(_validate_geojson_stream(ijson, f, budget))
+            self.assertTrue(budget.sampled)
+        finally:
+            for (option, value) in options.items():
+                configuration.CONFIG.set('validation', option, value)
+
+        # broken JSON after the invalid feature is never read
+        with open(file_name, 'w') as f:
+            f.write('{"type": "FeatureCollection", "features": [{"type": "Feature"}, ')
+            f.write('not JSON')
+        self.assertFalse(_validate_geojson_schema(file_name))
+
+        # type not preceding the features
+        with open(file_name, 'w') as f:
+            f.write('{"features": [], "type": "FeatureCollection"}')
+        with open(file_name, 'rb') as f:
+            self.assertIsNone(_validate_geojson_stream(ijson, f))
+        self.assertTrue(_validate_geojson_schema(file_name))
+
     def test_shapefile_validator(self):
         """Test ESRI Shapefile validator
         """
@@ -93,7 +215,68 @@ class ValidateTest(unittest.TestCase):
         self.assertTrue(validateshapefile(shapefile_input, MODE.SIMPLE), 'SIMPLE validation')
         if WITH_GDAL:
             self.assertTrue(validateshapefile(shapefile_input, MODE.STRICT), 'STRICT validation')
+            self.assertEqual(shapefile_input.probe.driver, 'ESRI Shapefile')
+            self.assertEqual(shapefile_input.probe.features, 1)
+        shapefile_input.stream.close()
+
+    @unittest.skipIf(not WITH_GDAL, 'shapefile validation requires GDAL')
+    def test_shapefile_without_extension(self):
+        """Zipped shapefile is read also from file without .zip extension
+        """
+        tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp_dir)
+        shapefile_input = get_input('shp/point.shp.zip', None, FORMATS.SHP.mime_type)
         shapefile_input.stream.close()
+        file_name = os.path.join(tmp_dir, 'input')
+        shutil.copy(shapefile_input.file, file_name)
+        shapefile_input.file = file_name
+        self.assertTrue(validateshapefile(shapefile_input, MODE.STRICT), 'STRICT validation')
+
+    def test_zip_members(self):
+        """Test limits of zipped inputs
+        """
+        file_name = os.path.join(os.path.dirname(__file__), '..', 'data', 'shp', 'point.shp.zip')
+        options = dict(configuration.CONFIG.items('server'))
+        try:
+            self.assertEqual(sorted(_get_zip_members(file_name)), ['point.shp', 'point.shx', 'point.xsd'])
+            configuration.CONFIG.set('server', 'maxzipmembers', '2')
+            self.assertIsNone(_get_zip_members(file_name))
+            configuration.CONFIG.set('server', 'maxzipmembers', '0')
+            configuration.CONFIG.set('server', 'maxzipsize', '1kb')
+            self.assertIsNone(_get_zip_members(file_name))
+            configuration.CONFIG.set('server', 'maxzipsize', '2kb')
+            self.assertEqual(len(_get_zip_members(file_name)), 3)
+        finally:
+            for option in ['maxzipmembers', 'maxzipsize']:
+                configuration.CONFIG.set('server', option, options[option])
+
+        self.assertIsNone(_get_zip_members(os.path.join(os.path.dirname(__file__), '..', 'data', 'point.xsd')))
+
+    def test_keep_dataset(self):
+        """Probe is attached to the input, dataset if configured
+        """
+        class FakeInput(object):
+            dataset = None
+            probe = None
+
+        def probe(dataset):
+            return Probe('Fake', 1, 10, (0, 0, 1, 1), None, None, 'EPSG:4326')
+
+        dataset = object()
+        fake_input = FakeInput()
+        _keep_dataset(fake_input, dataset, probe)
+        self.assertIs(fake_input.dataset, dataset)
+        self.assertEqual(fake_input.probe.features, 10)
+
+        keep_datasets = configuration.get_config_value('server', 'keep_datasets')
+        configuration.CONFIG.set('server', 'keep_datasets', 'false')
+        try:
+            fake_input = FakeInput()
+            _keep_dataset(fake_input, dataset, probe)
+            self.assertIsNone(fake_input.dataset)
+            self.assertEqual(fake_input.probe.crs, 'EPSG:4326')
+        finally:
+            configuration.CONFIG.set('server', 'keep_datasets', str(keep_datasets).lower())
 
     def test_geotiff_validator(self):
         """Test GeoTIFF validator
@@ -105,8 +288,56 @@ class ValidateTest(unittest.TestCase):
         if not WITH_GDAL:
             self.testSkipp('GDAL Not Installed')
         self.assertTrue(validategeotiff(geotiff_input, MODE.STRICT), 'STRICT validation')
+        self.assertEqual(geotiff_input.probe.driver, 'GTiff')
+        self.assertEqual(geotiff_input.probe.bands, 1)
+        self.assertEqual(len(geotiff_input.probe.size), 2)
         geotiff_input.stream.close()
 
+    def test_raster_blocks(self):
+        """Only the first block of rasters is read by default
+        """
+        class FakeBand(object):
+            XSize = 1000
+            YSize = 500
+            reads = 0
+
+            def GetBlockSize(self):
+                return (10, 10)
+
+            def ReadRaster(self, xoff, yoff, xsize, ysize):
+                FakeBand.reads += 1
+                return b'x' * xsize * ysize
+
+        class FakeDataset(object):
+            RasterCount = 2
+
+            def GetRasterBand(self, number):
+                return FakeBand()
+
+        budget = ValidationBudget()
+        self.assertTrue(_validate_raster_blocks(FakeDataset(), budget))
+        self.assertEqual(FakeBand.reads, 1)
+        self.assertTrue(budget.sampled)
+
+        options = dict(configuration.CONFIG.items('validation'))
+        configuration.CONFIG.set('validation', 'sample_blocks', '1000')
+        try:
+            FakeBand.reads = 0
+            budget = ValidationBudget()
+            self.assertTrue(_validate_raster_blocks(FakeDataset(), budget))
+            self.assertEqual(FakeBand.reads, 1000)
+            self.assertTrue(budget.sampled)
+
+            configuration.CONFIG.set('validation', 'sample_blocks', '0')
+            FakeBand.reads = 0
+            budget = ValidationBudget()
+            self.assertTrue(_validate_raster_blocks(FakeDataset(), budget))
+            self.assertEqual(FakeBand.reads, 2 * 100 * 50)
+            self.assertFalse(budget.sampled)
+        finally:
+            for (option, value) in options.items():
+                configuration.CONFIG.set('validation', option, value)
+
     def test_fail_validator(self):
         fake_input = get_input('point.xsd', 'point.xsd', FORMATS.SHP.mime_type)
         self.assertFalse(validategml(fake_input, MODE.SIMPLE), 'SIMPLE validation invalid')